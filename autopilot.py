@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""自动驾驶，用于演示和展台模式。
+
+每帧在固定的时间预算内为 SnakeEngine 选一个方向：
+先按“到食物的距离场”挑离食物最近的方向，再用有限的洪水填充确认走过去之后还有足够的活动空间，
+都不安全时退而选择活动空间最大的方向（跟着尾巴绕圈）。
+
+距离场以食物为起点做广度优先搜索，只把边界图标当作障碍（蛇身会移动，不计入）。
+它只在食物换位置时重建，而且可以分摊到多帧完成：搜索状态（距离数组和队列）跨帧保留，
+每帧只用一半的预算继续扩展，还没覆盖到的格子暂时用曼哈顿距离估计。
+因此即使棋盘很大、蛇很长，单帧的决策时间也不会超过预算太多。
+"""
+import time
+from array import array
+from collections import deque
+
+from board import BORDER, EMPTY, FOOD, SNAKE
+from engine import DOWN, LEFT, RIGHT, UP
+
+DIRECTIONS = (UP, DOWN, LEFT, RIGHT)
+DEFAULT_BUDGET = 0.002  # 每帧的决策预算（秒）
+CHECK_EVERY = 64  # 每访问这么多个格子检查一次时间
+UNREACHABLE = 1 << 30
+
+PASSABLE = [False] * 256  # 按格子状态查表，空格和食物可以通过
+PASSABLE[EMPTY] = PASSABLE[FOOD] = True
+
+
+class Autopilot:
+    """为 engine 选方向。每帧调用一次 decide()，返回新的方向，保持当前方向时返回 None。"""
+
+    def __init__(self, engine, budget=DEFAULT_BUDGET, clock=time.perf_counter):
+        self.engine = engine
+        self.budget = budget
+        self.clock = clock
+        self.cols = engine.cols
+        size = engine.cols * engine.rows
+
+        # 每个格子在四个方向上的相邻格子（出界为 -1），与引擎共用
+        self.steps = engine.steps
+        self.neighbours = [
+            tuple(c for c in (self.steps[d][cell] for d in DIRECTIONS) if c >= 0)
+            for cell in range(size)
+        ]
+
+        # 到食物的距离场，跨帧保留
+        self.target = None
+        self.distance = array("i")
+        self.frontier = deque()
+        self.field_complete = False
+
+        # 洪水填充的访问标记：标记值等于当前代数即已访问，避免每次清零
+        self.marks = array("i", [0]) * size
+        self.generation = 0
+
+        self.timeouts = 0  # 超出预算、提前给出决策的次数
+
+    def reset_field(self, food):
+        self.target = food
+        self.distance = array("i", [-1]) * len(self.marks)
+        self.frontier.clear()
+        self.field_complete = food is None
+        if food is not None:
+            cell = food[1] * self.cols + food[0]
+            self.distance[cell] = 0
+            self.frontier.append(cell)
+
+    def grow_field(self, deadline):
+        """继续扩展距离场直到完成或到达 deadline，返回是否已完成。"""
+        cells = self.engine.board.cells
+        distance = self.distance
+        frontier = self.frontier
+        neighbours = self.neighbours
+        clock = self.clock
+        visited = 0
+        while frontier:
+            cell = frontier.popleft()
+            d = distance[cell] + 1
+            for neighbour in neighbours[cell]:
+                if distance[neighbour] < 0 and cells[neighbour] != BORDER:
+                    distance[neighbour] = d
+                    frontier.append(neighbour)
+            visited += 1
+            if visited % CHECK_EVERY == 0 and clock() >= deadline:
+                return False
+        self.field_complete = True
+        return True
+
+    def food_distance(self, cell):
+        d = self.distance[cell]
+        if d >= 0:
+            return d
+        if self.field_complete:
+            return UNREACHABLE
+        # 距离场还没覆盖到这里，用曼哈顿距离估计
+        fx, fy = self.target
+        y, x = divmod(cell, self.cols)
+        return abs(x - fx) + abs(y - fy)
+
+    def open_space(self, start, limit, tail, deadline):
+        """从 start 出发能到达的空格数，数到 limit 或者挨到蛇尾就停止。
+
+        返回 (数量, 是否安全)。到达 deadline 时按安全处理，保证不超出预算。
+        """
+        self.generation += 1
+        generation = self.generation
+        marks = self.marks
+        cells = self.engine.board.cells
+        neighbours = self.neighbours
+        clock = self.clock
+        marks[start] = generation
+        stack = [start]
+        count = 0
+        while stack:
+            cell = stack.pop()
+            count += 1
+            if count >= limit:
+                return count, True
+            for neighbour in neighbours[cell]:
+                if neighbour == tail:
+                    # 尾巴每帧都会让出位置，跟着它走总有路
+                    return count, True
+                if marks[neighbour] != generation and PASSABLE[cells[neighbour]]:
+                    marks[neighbour] = generation
+                    stack.append(neighbour)
+            if count % CHECK_EVERY == 0 and clock() >= deadline:
+                self.timeouts += 1
+                return count, True
+        return count, False
+
+    def decide(self):
+        engine = self.engine
+        if engine.game_over:
+            return None
+        start = self.clock()
+        deadline = start + self.budget
+        if engine.food_grid_pos != self.target:
+            self.reset_field(engine.food_grid_pos)
+        if not self.field_complete:
+            self.grow_field(start + self.budget / 2)
+
+        cells = engine.board.cells
+        head = engine.body.head_cell()
+        tail = engine.body.tail_cell()
+        current = engine.direction
+
+        candidates = []
+        for direction in DIRECTIONS:
+            if direction[0] == -current[0] and direction[1] == -current[1]:
+                continue
+            cell = self.steps[direction][head]
+            # 引擎在移动尾巴之前做碰撞检测，所以尾巴所在的格子也不能走
+            if cell < 0 or cells[cell] == BORDER or cells[cell] == SNAKE:
+                continue
+            candidates.append((self.food_distance(cell), direction, cell))
+        if not candidates:
+            return None  # 无路可走
+        candidates.sort()
+
+        limit = engine.length + 1
+        best_space = -1
+        fallback = candidates[0][1]
+        for _, direction, cell in candidates:
+            space, safe = self.open_space(cell, limit, tail, deadline)
+            if safe:
+                return None if direction == current else direction
+            if space > best_space:
+                best_space, fallback = space, direction
+        return None if fallback == current else fallback
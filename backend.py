@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""桌面后端接口。
+
+游戏循环只通过 DesktopBackend 读写图标：win32_desktop.Win32Desktop 操作真实桌面，
+MemoryDesktop 操作内存中的模拟 ListView，便于在 Linux 上运行和测量。
+"""
+import time
+from typing import Iterable, Protocol, Tuple
+
+from listview import (
+    LVM_GETITEMSPACING,
+    FrameWriter,
+    IconPositionReader,
+    SimulatedListView,
+    iter_points,
+)
+from scheduler import TickScheduler
+
+LAYOUT_FRAME_INTERVAL = 1 / 60  # 分帧布置时每帧的间隔（秒）
+LAYOUT_RETRIES = 3  # 布局写入超时后最多重试的次数
+
+
+class DesktopBackend(Protocol):
+    def icon_count(self) -> int:
+        """当前桌面图标数量。"""
+
+    def read_positions(self):
+        """读取全部图标坐标，格式同 IconPositionReader.read_all_positions。"""
+
+    def read_identities(self, first: int = 0, count: int = None):
+        """读取索引从 first 开始的 count 个（默认到最后）图标的标识（由名称得到），
+        格式同 IconPositionReader.read_all_identities。"""
+
+    def write_positions(self, moves: Iterable[Tuple[int, int, int]]) -> int:
+        """把 (图标编号, 像素 x, 像素 y) 作为一帧写入，返回实际写入数量。"""
+
+    def pending_writes(self) -> int:
+        """因写入超时还没有写进去、等待下一帧重试的移动数。"""
+
+    def remap_indices(self, mapping) -> None:
+        """图标索引变化后，把按旧索引缓存的状态搬到新索引，mapping[旧索引] 为新索引或 -1。"""
+
+    def screen_metrics(self) -> Tuple[int, int]:
+        """屏幕宽高（像素）。"""
+
+    def dpi(self) -> int:
+        """桌面所在显示器的 DPI，96 为 100% 缩放。"""
+
+    def item_spacing(self) -> Tuple[int, int]:
+        """ListView 报告的图标间距（像素）。"""
+
+    def close(self) -> None:
+        """释放后端持有的资源。"""
+
+
+class ListViewDesktop:
+    """基于“远程 ListView”接口的后端实现，读写都走批量路径。
+
+    send_timeout 见 FrameWriter。
+    """
+
+    def __init__(self, listview, screen_size, send_timeout=None):
+        self.listview = listview
+        self.screen_size = screen_size
+        self.reader = None
+        self.writer = FrameWriter(listview, send_timeout=send_timeout)
+
+    def icon_count(self):
+        return self.listview.item_count()
+
+    def open_reader(self):
+        if self.reader is None:
+            self.reader = IconPositionReader(self.listview)
+        return self.reader
+
+    def read_positions(self):
+        positions = self.open_reader().read_all_positions()
+        # 读到的就是桌面上的实际位置，写入时据此跳过无效移动；
+        # 之前超时还没写进去的移动是按旧布局排的，丢掉，不能混进之后的写入
+        self.writer.current = {i: (x, y) for i, x, y in iter_points(positions)}
+        self.writer.pending.clear()
+        return positions
+
+    def read_identities(self, first=0, count=None):
+        if count is None:
+            count = self.listview.item_count() - first
+        return self.open_reader().read_identities(first, count)
+
+    def write_positions(self, moves):
+        for index, x, y in moves:
+            self.writer.move(index, x, y)
+        return self.writer.flush()
+
+    def pending_writes(self):
+        return len(self.writer.pending)
+
+    def remap_indices(self, mapping):
+        self.writer.remap(mapping)
+
+    def screen_metrics(self):
+        return self.screen_size
+
+    def dpi(self):
+        return 96
+
+    def item_spacing(self):
+        spacing = self.listview.send_message(LVM_GETITEMSPACING, 0, 0)
+        return spacing & 0xFFFF, (spacing >> 16) & 0xFFFF
+
+    def close(self):
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+
+
+class MemoryDesktop(ListViewDesktop):
+    """内存中的桌面，positions 为各图标的初始像素坐标，其余参数见 SimulatedListView。"""
+
+    def __init__(
+        self,
+        positions,
+        screen_size=(1920, 1080),
+        texts=None,
+        latency=0.0,
+        memory_latency=0.0,
+        spacing=(96, 104),
+        dpi=96,
+        send_timeout=None,
+    ):
+        super().__init__(
+            SimulatedListView(positions, texts, latency, memory_latency, spacing),
+            screen_size,
+            send_timeout,
+        )
+        self.dpi_value = dpi
+
+    def dpi(self):
+        return self.dpi_value
+
+
+def column_layout(count, screen_size, spacing):
+    """桌面默认的竖向排列：从左上角开始逐列排满，返回 count 个图标的像素坐标。"""
+    size_x, size_y = spacing
+    rows = max(1, screen_size[1] // size_y)
+    return [((i // rows) * size_x, (i % rows) * size_y) for i in range(count)]
+
+
+def synthetic_desktop(count, screen_size=(1920, 1080), spacing=(96, 104), **kwargs):
+    """按 column_layout 摆好 count 个图标的 MemoryDesktop。"""
+    positions = column_layout(count, screen_size, spacing)
+    return MemoryDesktop(positions, screen_size, spacing=spacing, **kwargs)
+
+
+def write_layout(
+    backend,
+    moves,
+    frames=1,
+    interval=LAYOUT_FRAME_INTERVAL,
+    retries=LAYOUT_RETRIES,
+    scheduler=None,
+):
+    """把一整套布局写入 backend，返回统计 dict。
+
+    frames 为 1 时作为一帧一次写完（暂停重绘，只刷新一次）；
+    大于 1 时把移动均分成 frames 帧、每隔 interval 秒写一帧，呈现图标依次就位的动画。
+    写完后因超时没写进去的移动最多再重试 retries 次，剩下的数量见 pending。
+    """
+    moves = list(moves)
+    start = time.perf_counter()
+    frames = max(1, min(frames, len(moves)))
+    bounds = [len(moves) * i // frames for i in range(frames + 1)]
+    chunks = [moves[bounds[i] : bounds[i + 1]] for i in range(frames)]
+    if len(chunks) > 1:
+        scheduler = scheduler or TickScheduler()
+        scheduler.start(interval)
+    writes = 0
+    for i, chunk in enumerate(chunks):
+        if i:
+            scheduler.wait(interval)
+        writes += backend.write_positions(chunk)
+    for _ in range(retries):
+        if not backend.pending_writes():
+            break
+        writes += backend.write_positions(())
+    return {
+        "moves": len(moves),
+        "writes": writes,
+        "frames": len(chunks),
+        "pending": backend.pending_writes(),
+        "elapsed_ms": (time.perf_counter() - start) * 1000,
+    }
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""用进程池批量运行无头对局，统计成千上万局的结果。
+
+每一局只由 (棋盘参数, 策略, 种子) 决定：食物位置来自引擎的种子，
+random 策略的转向来自同一个种子的独立随机数，autopilot 策略默认不设时间预算，
+所以同一份种子列表无论分给几个进程、以什么顺序完成，每局的结果都完全相同。
+
+种子按块分发给 ProcessPoolExecutor，每块完成后立即把其中每一局的结果流式返回，
+再由 Aggregate 逐个合并为汇总统计。
+
+用法:
+    python batch.py --games 2000 --policy autopilot --cols 32 --rows 18 --icons 60
+    python batch.py --games 10000 --policy random --jsonl results.jsonl
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from autopilot import Autopilot
+from engine import (
+    BOARD_FULL,
+    DOWN,
+    INITIAL_SNAKE_LEN,
+    LEFT,
+    RIGHT,
+    UP,
+    WON,
+    SnakeEngine,
+    tick_interval,
+)
+
+POLICIES = ("autopilot", "random")
+RANDOM_ACTIONS = (None, None, None, UP, DOWN, LEFT, RIGHT)
+
+
+def play_game(
+    seed, cols=32, rows=18, icons=60, policy="autopilot", max_ticks=20000
+):
+    """运行一局，返回结果 dict。score 为吃到的食物数，game_s 为按游戏节奏折算的时长。"""
+    engine = SnakeEngine(cols, rows, range(icons), seed=seed)
+    if policy == "autopilot":
+        # 不设预算，决策与机器快慢无关，结果可以复现
+        decide = Autopilot(engine, budget=float("inf")).decide
+    elif policy == "random":
+        rng = random.Random(seed)
+
+        def decide():
+            return rng.choice(RANDOM_ACTIONS)
+
+    else:
+        raise ValueError(f"未知的策略: {policy}")
+
+    game_s = 0.0
+    while not engine.game_over and engine.ticks < max_ticks:
+        game_s += tick_interval(engine.length)
+        engine.advance(decide())
+    return {
+        "seed": seed,
+        "score": engine.length - INITIAL_SNAKE_LEN,
+        "ticks": engine.ticks,
+        "game_over": engine.game_over or "timeout",
+        "game_s": game_s,
+    }
+
+
+def play_games(seeds, params):
+    """进程池中执行的单位：按顺序运行一块种子。"""
+    return [play_game(seed, **params) for seed in seeds]
+
+
+def run_batch(seeds, workers=None, chunk_size=16, **params):
+    """运行 seeds 中的每一局，按完成顺序逐个产出结果。params 传给 play_game。
+
+    workers 为 1 时直接在当前进程中运行，便于调试和作为对比基准。
+    """
+    seeds = list(seeds)
+    chunks = [seeds[i : i + chunk_size] for i in range(0, len(seeds), chunk_size)]
+    if workers == 1:
+        for chunk in chunks:
+            yield from play_games(chunk, params)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(play_games, chunk, params) for chunk in chunks]
+        for future in as_completed(futures):
+            yield from future.result()
+
+
+class Aggregate:
+    """逐局合并的汇总统计。"""
+
+    def __init__(self):
+        self.games = 0
+        self.wins = 0
+        self.causes = Counter()
+        self.score_total = 0
+        self.score_max = 0
+        self.ticks_total = 0
+        self.game_s_total = 0.0
+
+    def add(self, result):
+        self.games += 1
+        self.wins += result["game_over"] in (WON, BOARD_FULL)
+        self.causes[result["game_over"]] += 1
+        self.score_total += result["score"]
+        self.score_max = max(self.score_max, result["score"])
+        self.ticks_total += result["ticks"]
+        self.game_s_total += result["game_s"]
+
+    def summary(self):
+        games = max(1, self.games)
+        return {
+            "games": self.games,
+            "win_rate": self.wins / games,
+            "mean_score": self.score_total / games,
+            "max_score": self.score_max,
+            "mean_ticks": self.ticks_total / games,
+            "mean_game_s": self.game_s_total / games,
+            "causes": dict(self.causes),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量运行无头贪吃蛇对局")
+    parser.add_argument("--games", type=int, default=1000, help="对局数（默认 1000）")
+    parser.add_argument("--seed", type=int, default=0, help="第一局的种子，之后依次加一")
+    parser.add_argument("--workers", type=int, help="进程数，默认为 CPU 核数")
+    parser.add_argument("--chunk-size", type=int, default=16, help="每次分发的对局数")
+    parser.add_argument("--cols", type=int, default=32)
+    parser.add_argument("--rows", type=int, default=18)
+    parser.add_argument("--icons", type=int, default=60)
+    parser.add_argument("--policy", choices=POLICIES, default="autopilot")
+    parser.add_argument(
+        "--max-ticks", type=int, default=20000, help="超过这么多帧按超时结束"
+    )
+    parser.add_argument("--jsonl", help="把每一局的结果按完成顺序逐行写入这个文件")
+    args = parser.parse_args()
+
+    seeds = range(args.seed, args.seed + args.games)
+    params = {
+        "cols": args.cols,
+        "rows": args.rows,
+        "icons": args.icons,
+        "policy": args.policy,
+        "max_ticks": args.max_ticks,
+    }
+    aggregate = Aggregate()
+    output = open(args.jsonl, "w", encoding="utf-8") if args.jsonl else None
+    start = time.perf_counter()
+    try:
+        for result in run_batch(seeds, args.workers, args.chunk_size, **params):
+            aggregate.add(result)
+            if output is not None:
+                output.write(json.dumps(result) + "\n")
+            if aggregate.games % 100 == 0:
+                print(f"\r已完成 {aggregate.games}/{args.games} 局", end="", flush=True)
+    finally:
+        if output is not None:
+            output.close()
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"\r已完成 {aggregate.games}/{args.games} 局，用时 {elapsed:.2f} s "
+        f"（{aggregate.games / elapsed:.1f} 局/秒，{args.workers or os.cpu_count()} 个进程）"
+    )
+    print(json.dumps(aggregate.summary(), ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1395 @@
+# -*- coding: utf-8 -*-
+"""基于模拟桌面的性能测试套件，不需要 Windows 环境。
+
+所有桌面操作都走 SimulatedListView，可以用 --latency-us 给每条消息加上固定耗时，
+模拟繁忙的 Explorer。结果可以保存为 JSON，并与之前保存的结果对比。
+
+用法:
+    python benchmarks.py                       # 运行全部测试
+    python benchmarks.py --quick               # 缩小规模快速运行
+    python benchmarks.py --only scan,tick      # 只运行部分测试
+    python benchmarks.py --json after.json --compare before.json
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from array import array
+from collections import deque
+
+import snake
+from autopilot import Autopilot
+from backend import MemoryDesktop, column_layout, synthetic_desktop, write_layout
+from batch import run_batch
+from board import SNAKE, Board
+from calibrate import lattice_grid, neighbour_grid
+from engine import (
+    BOARD_FULL,
+    DOWN,
+    LEFT,
+    RIGHT,
+    UP,
+    WON,
+    SnakeBody,
+    SnakeEngine,
+    grid_to_pixel,
+    pixel_table,
+)
+from identity import IconTracker
+from layout import plan_layout
+from listview import (
+    LVM_GETITEMPOSITION,
+    LVM_SETITEMPOSITION,
+    POINT_SIZE,
+    FrameWriter,
+    IconPositionReader,
+    SimulatedListView,
+    make_lparam,
+)
+from multisnake import MultiSnakeEngine
+from recording import DIRECTIONS, Recorder, load_recording, replay
+from render import RenderThread
+from scheduler import FakeClock, TickScheduler
+from snapshot import HEADER, RECORD, load_snapshot, restore_snapshot, save_snapshot
+from spectator import BoardMirror, GameServer
+from terminal import TerminalView
+from tracing import Tracer, instrument_backend
+
+try:
+    from vector_engine import VectorEngine, greedy_actions
+except ImportError:  # VectorEngine 需要 NumPy
+    VectorEngine = None
+
+ICON_COUNTS = (5, 50, 500, 5000, 10000)
+BOARD_FILLS = (0.0, 0.25, 0.5, 0.75, 0.99)
+
+
+def synthetic_positions(count, cols=40, size_x=96, size_y=104):
+    """生成按列排布的合成图标坐标（与桌面默认的竖向排列一致）。"""
+    rows = max(1, count // cols + 1)
+    return [((i // rows) * size_x, (i % rows) * size_y) for i in range(count)]
+
+
+def read_positions_per_icon(listview, count):
+    """旧实现的调用模式：每个图标都单独打开进程并分配远程内存。"""
+    positions = []
+    for i in range(count):
+        h_process = listview.open_process()
+        p_buffer = listview.alloc(h_process, POINT_SIZE)
+        listview.send_message(LVM_GETITEMPOSITION, i, p_buffer)
+        positions.append(listview.read(h_process, p_buffer, POINT_SIZE))
+        listview.free(h_process, p_buffer)
+        listview.close(h_process)
+    return positions
+
+
+def bench_scan(counts=ICON_COUNTS, latency=0.0):
+    """对比逐个读取和批量读取一次完整扫描的耗时与调用次数。"""
+    results = []
+    for count in counts:
+        positions = synthetic_positions(count)
+
+        listview = SimulatedListView(positions, latency=latency)
+        start = time.perf_counter()
+        read_positions_per_icon(listview, count)
+        per_icon_time = time.perf_counter() - start
+        per_icon_calls = listview.syscalls
+
+        listview = SimulatedListView(positions, latency=latency)
+        start = time.perf_counter()
+        with IconPositionReader(listview, count) as reader:
+            reader.read_all_positions(count)
+        batched_time = time.perf_counter() - start
+        batched_calls = listview.syscalls
+
+        results.append(
+            {
+                "case": f"icons={count}",
+                "per_icon_s": per_icon_time,
+                "per_icon_calls": per_icon_calls,
+                "batched_s": batched_time,
+                "batched_calls": batched_calls,
+            }
+        )
+    return results
+
+
+def bench_frame_writes(
+    moves_per_tick=(1, 3, 10, 50), ticks=200, icons=200, latency=0.0
+):
+    """对比逐个直接写入和按帧合并写入的消息数与重绘次数。
+
+    每帧的移动里有一半会被同帧的后续移动覆盖，模拟食物重生和边界收缩。
+    """
+    results = []
+    for moves in moves_per_tick:
+        frames = [
+            [((t * moves + m // 2) % icons, t + m, m) for m in range(moves)]
+            for t in range(ticks)
+        ]
+
+        listview = SimulatedListView(synthetic_positions(icons), latency=latency)
+        for frame in frames:
+            for index, x, y in frame:
+                listview.send_message(LVM_SETITEMPOSITION, index, make_lparam(x, y))
+        direct = (listview.calls["SendMessage"], listview.repaints)
+
+        listview = SimulatedListView(synthetic_positions(icons), latency=latency)
+        writer = FrameWriter(listview)
+        for frame in frames:
+            for index, x, y in frame:
+                writer.move(index, x, y)
+            writer.flush()
+        stats = writer.stats()
+
+        results.append(
+            {
+                "case": f"moves_per_tick={moves}",
+                "direct_messages": direct[0],
+                "direct_repaints": direct[1],
+                "batched_messages": listview.calls["SendMessage"],
+                "batched_repaints": listview.repaints,
+                "writes_per_tick": stats["writes_per_tick"],
+                "mean_flush_ms": stats["mean_flush_ms"],
+            }
+        )
+    return results
+
+
+def bench_board(fills=BOARD_FILLS, cols=100, rows=100, ops=20000):
+    """在不同填充率下测量一次“碰撞检测 + 移动 + 放置食物”的平均耗时。"""
+    results = []
+    rng = random.Random(0)
+    for fill in fills:
+        board = Board(cols, rows)
+        board.update_food_zone()
+        cells = list(range(cols * rows))
+        rng.shuffle(cells)
+        occupied = cells[: int(len(cells) * fill)]
+        for cell in occupied:
+            board.occupy(*board.position(cell), SNAKE)
+
+        start = time.perf_counter()
+        for i in range(ops):
+            x, y = board.position(occupied[i % len(occupied)] if occupied else 0)
+            board.get(x, y)
+            food = board.place_food(rng)
+            board.release(*food)
+        elapsed = time.perf_counter() - start
+        results.append({"case": f"fill={fill}", "op_us": elapsed / ops * 1e6})
+    return results
+
+
+def bench_engine(cols=40, rows=20, icons=200, ticks=100000, seed=0):
+    """无界面运行引擎，统计每秒能推进多少帧。输入为带种子的随机转向，死亡后重新开局。"""
+    rng = random.Random(seed)
+    actions = [None, None, None, UP, DOWN, LEFT, RIGHT]
+    engine = SnakeEngine(cols, rows, range(icons), seed=seed)
+    games = 1
+    start = time.perf_counter()
+    for _ in range(ticks):
+        if engine.step(rng.choice(actions)).game_over:
+            games += 1
+            engine = SnakeEngine(cols, rows, range(icons), seed=seed + games)
+    elapsed = time.perf_counter() - start
+    return [{"case": f"{cols}x{rows}", "games": games, "ticks_per_s": ticks / elapsed}]
+
+
+def bench_scheduler(interval=0.05, ticks=2000, work=0.004, oversleep=0.001):
+    """用假时钟对比旧的 10 ms 轮询循环和截止时间调度的节拍误差与唤醒次数。"""
+    clock = FakeClock(oversleep=oversleep)
+    wakeups = 0
+    last_move_time = clock()
+    intervals = []
+    while len(intervals) < ticks:
+        wakeups += 1
+        current_time = clock()
+        if current_time - last_move_time >= interval:
+            intervals.append(current_time - last_move_time)
+            last_move_time = current_time
+            clock.work(work)
+        clock.sleep(0.01)
+    legacy_error = sum(abs(i - interval) for i in intervals) / ticks
+
+    clock = FakeClock(oversleep=oversleep)
+    sleeps = [0]
+
+    def counting_sleep(seconds):
+        sleeps[0] += 1
+        clock.sleep(seconds)
+
+    scheduler = TickScheduler(clock=clock, sleep=counting_sleep)
+    scheduler.start(interval)
+    times = []
+    while len(times) < ticks:
+        scheduler.wait(interval)
+        times.append(clock())
+        clock.work(work)
+    errors = [abs(b - a - interval) for a, b in zip(times, times[1:])]
+    return [{
+        "case": f"interval={interval}",
+        "legacy_mean_error_ms": legacy_error * 1000,
+        "legacy_wakeups": wakeups,
+        "scheduled_mean_error_ms": sum(errors) / len(errors) * 1000,
+        "scheduled_wakeups": sleeps[0],
+        "scheduled_drift_ms": (times[-1] - times[0] - (ticks - 1) * interval) * 1000,
+        **scheduler.stats(),
+    }]
+
+
+def calibration_inputs(
+    count, size_x=96, size_y=104, origin=(21, 2), strays=0.01, seed=0
+):
+    """生成 count 个落在网格上的随机图标坐标，其中 strays 比例的图标随意摆放。"""
+    rng = random.Random(seed)
+    side = int((count * 2) ** 0.5) + 2
+    cells = rng.sample(range(side * side), count)
+    points = [
+        (origin[0] + (c % side) * size_x, origin[1] + (c // side) * size_y)
+        for c in cells
+    ]
+    for i in range(int(count * strays)):
+        points[i] = (rng.randrange(side * size_x), rng.randrange(side * size_y))
+    screen = (origin[0] + side * size_x, origin[1] + side * size_y)
+    return array("i", [v for p in points for v in p]), screen
+
+
+def bench_calibration(counts=(50, 500, 5000), repeat=5):
+    """在同样的输入上对比新旧两种网格推算的耗时和结果是否正确。"""
+    results = []
+    for count in counts:
+        positions, screen = calibration_inputs(count)
+        row = {"case": f"icons={count}"}
+        for name, fit in (("neighbour", neighbour_grid), ("lattice", lattice_grid)):
+            start = time.perf_counter()
+            try:
+                for _ in range(repeat):
+                    grid_info = fit(positions, *screen)
+                correct = (grid_info["size_x"], grid_info["size_y"]) == (96, 104)
+            except ValueError:
+                grid_info, correct = None, False
+            row[f"{name}_ms"] = (time.perf_counter() - start) / repeat * 1000
+            row[f"{name}_correct"] = correct
+        row["confidence"] = grid_info["confidence"] if grid_info else 0.0
+        results.append(row)
+    return results
+
+
+def cycle_path(cols, rows):
+    """覆盖整个棋盘的哈密顿回路（rows 须为偶数），沿着它走的蛇永远不会撞到自己。"""
+    path = [(x, 0) for x in range(cols)]
+    for y in range(1, rows):
+        xs = range(cols - 1, 0, -1) if y % 2 else range(1, cols)
+        path.extend((x, y) for x in xs)
+    path.extend((0, y) for y in range(rows - 1, 0, -1))
+    return path
+
+
+def filled_engine(cols, rows, fill, seed=0):
+    """构造一个蛇身占满棋盘 fill 比例的引擎，蛇沿 cycle_path 排列，没有边界图标。
+
+    返回 (engine, path, 蛇头在 path 中的下标)。
+    """
+    path = cycle_path(cols, rows)
+    length = min(len(path) - 1, max(3, int(len(path) * fill)))
+    engine = SnakeEngine(cols, rows, range(5), seed=seed)
+    board = engine.board = Board(cols, rows)
+    body = engine.body = SnakeBody(cols * rows)
+    # 蛇头在 path[length - 1]，图标编号从蛇头开始为 0, 1, ...
+    for icon_idx in reversed(range(length)):
+        x, y = path[length - 1 - icon_idx]
+        board.occupy(x, y, SNAKE)
+        body.push_head(board.cell(x, y), icon_idx)
+    board.update_food_zone()
+    engine.food_index = length
+    engine.waiting_icons = deque(range(length + 1, length + 1 + len(path)))
+    engine.respawn_food()
+    (x0, y0), (x1, y1) = path[length - 2], path[length - 1]
+    engine.direction = (x1 - x0, y1 - y0)
+    return engine, path, length - 1
+
+
+def cycle_actions(path):
+    """沿 path 前进时每一步的方向，actions[i] 为从 path[i] 走到下一格的方向。"""
+    return [
+        (x1 - x0, y1 - y0)
+        for (x0, y0), (x1, y1) in zip(path, path[1:] + path[:1])
+    ]
+
+
+def bench_tick(fills=BOARD_FILLS, cols=64, rows=36, ticks=5000, seed=0):
+    """不同填充率下单次 engine.step 和 engine.advance 的耗时。
+
+    蛇沿哈密顿回路前进，中途吃到食物照常变长。
+    """
+    results = []
+    for fill in fills:
+        result = {"case": f"fill={fill}"}
+        for name in ("step", "advance"):
+            engine, path, head = filled_engine(cols, rows, fill, seed)
+            actions = cycle_actions(path)
+            samples = []
+            for _ in range(ticks):
+                action = actions[head]
+                step = getattr(engine, name)
+                start = time.perf_counter()
+                step(action)
+                samples.append(time.perf_counter() - start)
+                if engine.game_over:
+                    engine, path, head = filled_engine(cols, rows, fill, seed)
+                else:
+                    head = (head + 1) % len(path)
+            samples.sort()
+            result[f"mean_{name}_us"] = sum(samples) / len(samples) * 1e6
+            result[f"p99_{name}_us"] = samples[int(len(samples) * 0.99)] * 1e6
+        results.append(result)
+    return results
+
+
+def bench_body(fills=BOARD_FILLS, cols=64, rows=36, ticks=5000, seed=0):
+    """不同蛇长下引擎的内存占用，以及连续 advance 时的内存分配（tracemalloc）。
+
+    蛇沿哈密顿回路前进，去掉食物后蛇长保持不变，测的是最常见的“只移动不变长”的帧。
+    retained_bytes_per_tick 为 ticks 帧之后净增的内存，tick_peak_bytes 为期间的峰值增量。
+    """
+    results = []
+    for fill in fills:
+        tracemalloc.start()
+        engine, path, head = filled_engine(cols, rows, fill, seed)
+        engine_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        engine.food_cell = -1  # 不吃食物，蛇长保持不变
+        actions = cycle_actions(path)
+        advance = engine.advance
+        length = len(path)
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        for _ in range(ticks):
+            advance(actions[head])
+            head += 1
+            if head == length:
+                head = 0
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results.append(
+            {
+                "case": f"fill={fill}",
+                "snake_len": engine.length,
+                "engine_bytes": engine_bytes,
+                "retained_bytes_per_tick": (current - before) / ticks,
+                "tick_peak_bytes": peak - before,
+                "game_over": engine.game_over,
+            }
+        )
+    return results
+
+
+def arena_grid(count, rows=36, size_x=96, size_y=104):
+    """能容纳 count 个边界图标外加游戏区域的网格参数。"""
+    cols = max(16, count // rows + 12)
+    return {
+        "size_x": size_x,
+        "size_y": size_y,
+        "origin_x": 0,
+        "origin_y": 0,
+        "cols": cols,
+        "rows": rows,
+    }
+
+
+def bench_setup(counts=ICON_COUNTS, latency=0.0):
+    """布置场地：构造引擎后逐个写入初始布局（旧做法）和用 write_layout 一次写完的对比。
+
+    旧做法在每次移动后还会 sleep(0.01)，这部分等待单独列为 per_icon_sleep_s，不计入 per_icon_s。
+    """
+    results = []
+    for count in counts:
+        grid_info = arena_grid(count)
+        engine = SnakeEngine(grid_info["cols"], grid_info["rows"], range(count), seed=0)
+        layout = [
+            (icon_idx, *grid_to_pixel(grid_x, grid_y, grid_info))
+            for icon_idx, grid_x, grid_y in engine.setup_moves
+        ]
+
+        per_icon = MemoryDesktop(synthetic_positions(count), latency=latency)
+        per_icon.read_positions()
+        start = time.perf_counter()
+        for move in layout:
+            per_icon.write_positions([move])
+        per_icon_time = time.perf_counter() - start
+
+        bulk = MemoryDesktop(synthetic_positions(count), latency=latency)
+        bulk.read_positions()
+        start = time.perf_counter()
+        engine = SnakeEngine(grid_info["cols"], grid_info["rows"], range(count), seed=0)
+        write_layout(
+            bulk,
+            (
+                (icon_idx, *grid_to_pixel(grid_x, grid_y, grid_info))
+                for icon_idx, grid_x, grid_y in engine.setup_moves
+            ),
+        )
+        bulk_time = time.perf_counter() - start
+
+        results.append(
+            {
+                "case": f"icons={count}",
+                "per_icon_s": per_icon_time,
+                "per_icon_sleep_s": len(layout) * 0.01,
+                "per_icon_messages": per_icon.listview.calls["SendMessage"],
+                "per_icon_repaints": per_icon.listview.repaints,
+                "setup_s": bulk_time,
+                "setup_messages": bulk.listview.calls["SendMessage"],
+                "setup_repaints": bulk.listview.repaints,
+                "identical": bulk.listview.positions == per_icon.listview.positions,
+            }
+        )
+    return results
+
+
+def restore_after_timeout(count, moved=10):
+    """游戏的最后一帧写入超时（移动留在 pending 里）之后恢复桌面，
+    返回恢复后不在快照位置上的图标数，应为 0。
+    """
+    stall = [0.0]
+    desktop = MemoryDesktop(
+        synthetic_positions(count), latency=lambda: stall[0], send_timeout=0.001
+    )
+    positions = desktop.read_positions()
+    identities = desktop.read_identities()
+    records = [
+        (i, identities[i], positions[2 * i], positions[2 * i + 1]) for i in range(count)
+    ]
+    stall[0] = 0.002
+    desktop.write_positions((i, 1, 1) for i in range(0, count, max(1, count // moved)))
+    assert desktop.pending_writes()
+    stall[0] = 0.0
+    restore_snapshot(desktop, records)
+    placed = desktop.listview.positions
+    return sum(placed[i] != [x, y] for i, _, x, y in records)
+
+
+def bench_snapshot(counts=ICON_COUNTS, latency=0.0, path=None):
+    """保存、读取快照以及恢复桌面（其中三分之一的图标被移动过）的耗时。"""
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = path or os.path.join(directory, "snapshot.bin")
+        for count in counts:
+            desktop = MemoryDesktop(synthetic_positions(count), latency=latency)
+            positions = desktop.read_positions()
+            identities = desktop.read_identities()
+            records = [
+                (i, identities[i], positions[2 * i], positions[2 * i + 1])
+                for i in range(count)
+            ]
+
+            start = time.perf_counter()
+            save_snapshot(records, path)
+            save_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            records = load_snapshot(path)
+            load_time = time.perf_counter() - start
+
+            desktop.write_positions((i, 1, 1) for i in range(0, count, 3))
+            start = time.perf_counter()
+            moved = restore_snapshot(desktop, records)
+            restore_time = time.perf_counter() - start
+            misplaced = restore_after_timeout(count)
+            assert not misplaced, f"写入超时后恢复桌面，{misplaced} 个图标不在快照位置上"
+
+            results.append(
+                {
+                    "case": f"icons={count}",
+                    "save_s": save_time,
+                    "load_s": load_time,
+                    "restore_s": restore_time,
+                    "restored_icons": moved,
+                    "misplaced_after_timeout": misplaced,
+                    "file_bytes": HEADER.size + RECORD.size * count,
+                }
+            )
+    return results
+
+
+def bench_memory(counts=ICON_COUNTS):
+    """读取布局并构造引擎时的内存峰值。"""
+    results = []
+    for count in counts:
+        grid_info = arena_grid(count)
+        desktop = MemoryDesktop(synthetic_positions(count))
+        tracemalloc.start()
+        desktop.read_positions()
+        desktop.read_identities()
+        engine = SnakeEngine(grid_info["cols"], grid_info["rows"], range(count), seed=0)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del engine
+        results.append(
+            {
+                "case": f"icons={count}",
+                "peak_bytes": peak,
+                "retained_bytes": current,
+            }
+        )
+    return results
+
+
+def traced_ticks(tracer, ticks, latency, seed=0):
+    """按 snake.main 的方式运行 ticks 帧（引擎 + 模拟桌面写入），返回每帧平均耗时。"""
+    grid_info = arena_grid(200)
+    desktop = MemoryDesktop(synthetic_positions(200), latency=latency)
+    instrument_backend(tracer, desktop)
+    desktop.read_positions()
+    rng = random.Random(seed)
+    actions = [None, None, None, UP, DOWN, LEFT, RIGHT]
+
+    def new_engine(n):
+        return SnakeEngine(grid_info["cols"], grid_info["rows"], range(200), seed=n)
+
+    engine = new_engine(seed)
+    start = time.perf_counter()
+    for n in range(ticks):
+        with tracer.span("tick"):
+            with tracer.span("engine.step"):
+                events = engine.step(rng.choice(actions))
+            desktop.write_positions(
+                (icon_idx, *grid_to_pixel(grid_x, grid_y, grid_info))
+                for icon_idx, grid_x, grid_y in events.moves
+            )
+        if events.game_over:
+            engine = new_engine(seed + n + 1)
+    return (time.perf_counter() - start) / ticks
+
+
+def bench_tracing(ticks=20000, latency=0.0):
+    """同样的帧在关闭和打开耗时统计时的平均耗时。"""
+    disabled = traced_ticks(Tracer(enabled=False), ticks, latency)
+    tracer = Tracer(enabled=True)
+    enabled = traced_ticks(tracer, ticks, latency)
+    return [
+        {
+            "case": f"ticks={ticks}",
+            "disabled_tick_us": disabled * 1e6,
+            "enabled_tick_us": enabled * 1e6,
+            "spans": sum(stats.count for stats in tracer.spans.values()),
+        }
+    ]
+
+
+def bench_startup(counts=(50, 500, 5000), latency=0.0, repeat=3):
+    """冷启动（读取桌面、计算网格并写入缓存）和热启动（读取桌面、抽查缓存的网格）的耗时，
+    以及 `python snake.py --help` 整个进程的耗时（不应加载 Win32 相关模块、NumPy 和 asyncio）。
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for count in counts:
+            path = os.path.join(directory, f"profile-{count}.json")
+            screen_size = (max(1920, (count // 10 + 1) * 96), 1080)
+            timings = {"cold": [], "warm": []}
+            for _ in range(repeat):
+                for kind in ("cold", "warm"):
+                    if kind == "cold" and os.path.exists(path):
+                        os.remove(path)
+                    desktop = synthetic_desktop(count, screen_size, latency=latency)
+                    timer = snake.StartupTimer(start=time.perf_counter())
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        _, _, _, warm = snake.load_grid(
+                            desktop, timer, profile_path=path
+                        )
+                    assert warm == (kind == "warm")
+                    timings[kind].append(timer.total())
+            results.append(
+                {
+                    "case": f"icons={count}",
+                    "cold_s": min(timings["cold"]),
+                    "warm_s": min(timings["warm"]),
+                }
+            )
+
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "snake.py")
+    elapsed = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, script, "--help"], check=True, stdout=subprocess.DEVNULL
+        )
+        elapsed.append(time.perf_counter() - start)
+    heavy = ("win32gui", "numpy", "asyncio")
+    probe = (
+        "import runpy, sys\n"
+        "sys.argv = [sys.argv[1], '--help']\n"
+        "try:\n"
+        "    runpy.run_path(sys.argv[0], run_name='__main__')\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        f"print(*(name for name in {heavy!r} if name in sys.modules))\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", probe, script],
+        check=True,
+        capture_output=True,
+        cwd=os.path.dirname(script),
+        text=True,
+    ).stdout
+    loaded = output.splitlines()[-1].split() if output.strip() else []
+    assert not loaded, f"snake.py --help 加载了 {loaded}"
+    results.append(
+        {
+            "case": "help",
+            "process_s": min(elapsed),
+            "win32_imported": "win32gui" in loaded,
+            "numpy_imported": "numpy" in loaded,
+            "asyncio_imported": "asyncio" in loaded,
+        }
+    )
+    return results
+
+
+def recorded_games(ticks, directory=None, cols=40, rows=20, icons=200, seed=0):
+    """带种子的随机转向连续玩 ticks 帧，directory 不为空时每局录制一个文件。
+
+    返回 (耗时, 录像文件列表)。
+    """
+    rng = random.Random(seed)
+    actions = [None, None, None, UP, DOWN, LEFT, RIGHT]
+    grid_info = arena_grid(icons, rows)
+    grid_info["cols"] = cols
+    paths = []
+
+    def new_game(n):
+        engine = SnakeEngine(cols, rows, range(icons), seed=n)
+        if directory is None:
+            return engine, None
+        paths.append(os.path.join(directory, f"game-{n}.dsr"))
+        return engine, Recorder(paths[-1], n, grid_info, range(icons))
+
+    engine, recorder = new_game(seed)
+    start = time.perf_counter()
+    for n in range(ticks):
+        action = rng.choice(actions)
+        events = engine.step(action)
+        if recorder is not None:
+            recorder.record(engine, action)
+        if events.game_over:
+            engine, recorder = new_game(seed + n + 1)
+    if recorder is not None:
+        recorder.close(engine)
+    return time.perf_counter() - start, paths
+
+
+def bench_replay(ticks=50000):
+    """录制对局的额外开销、录像大小，以及无头全速回放（含摘要核对）的速度。"""
+    plain, _ = recorded_games(ticks)
+    with tempfile.TemporaryDirectory() as directory:
+        recorded, paths = recorded_games(ticks, directory)
+        size = sum(os.path.getsize(path) for path in paths)
+        recordings = [load_recording(path) for path in paths]
+
+    start = time.perf_counter()
+    results = [replay(recording) for recording in recordings]
+    elapsed = time.perf_counter() - start
+    replayed = sum(result["ticks"] for result in results)
+    return [
+        {
+            "case": f"ticks={ticks}",
+            "games": len(paths),
+            "plain_tick_us": plain / ticks * 1e6,
+            "recorded_tick_us": recorded / ticks * 1e6,
+            "file_bytes_per_tick": size / ticks,
+            "replay_ticks_per_s": replayed / elapsed,
+            "replays_matching": sum(result["matches"] for result in results),
+        }
+    ]
+
+
+def bench_autopilot(
+    boards=((16, 10, 20), (32, 18, 60), (64, 36, 200)),
+    games=3,
+    budget=0.002,
+    max_ticks=50000,
+):
+    """自动驾驶在不同棋盘（列, 行, 图标数）上的胜率和每帧决策耗时的分位数。"""
+    results = []
+    for cols, rows, icons in boards:
+        latencies = []
+        wins = 0
+        ticks = 0
+        timeouts = 0
+        for game in range(games):
+            engine = SnakeEngine(cols, rows, range(icons), seed=game)
+            autopilot = Autopilot(engine, budget)
+            while not engine.game_over and engine.ticks < max_ticks:
+                start = time.perf_counter()
+                action = autopilot.decide()
+                latencies.append(time.perf_counter() - start)
+                engine.step(action)
+            wins += engine.game_over in (WON, BOARD_FULL)
+            ticks += engine.ticks
+            timeouts += autopilot.timeouts
+        latencies.sort()
+        results.append(
+            {
+                "case": f"{cols}x{rows} icons={icons}",
+                "games": games,
+                "win_rate": wins / games,
+                "ticks_per_game": ticks / games,
+                "decide_p50_us": latencies[len(latencies) // 2] * 1e6,
+                "decide_p99_us": latencies[int(len(latencies) * 0.99)] * 1e6,
+                "decide_max_us": latencies[-1] * 1e6,
+                "budget_us": budget * 1e6,
+                "timeouts": timeouts,
+            }
+        )
+    return results
+
+
+def bench_batch(games=256, worker_counts=None, cols=16, rows=10, icons=20):
+    """进程池批量对局的吞吐量随进程数的变化，并检查不同进程数下每局结果完全一致。"""
+    if worker_counts is None:
+        cpus = os.cpu_count() or 1
+        worker_counts = sorted({1, 2, 4, cpus})
+    params = {"cols": cols, "rows": rows, "icons": icons, "policy": "autopilot"}
+    results = []
+    baseline = None
+    single = None
+    for workers in worker_counts:
+        start = time.perf_counter()
+        games_played = sorted(
+            run_batch(range(games), workers, **params), key=lambda r: r["seed"]
+        )
+        elapsed = time.perf_counter() - start
+        if baseline is None:
+            baseline, single = games_played, elapsed
+        results.append(
+            {
+                "case": f"workers={workers}",
+                "games_per_s": games / elapsed,
+                "speedup": single / elapsed,
+                "identical": games_played == baseline,
+            }
+        )
+    return results
+
+
+def bench_vector(counts=(100, 1000, 5000), cols=32, rows=18, icons=60, ticks=200):
+    """VectorEngine 与逐局运行 SnakeEngine 的吞吐量（每秒推进的“局 x 帧”，只计未结束的局）。
+
+    输入由 greedy_actions 整批算出并记录下来，SnakeEngine 用同样的输入重放，
+    最后逐局比对局面摘要。
+    """
+    if VectorEngine is None:
+        return []
+    results = []
+    for count in counts:
+        seeds = range(count)
+        vector = VectorEngine(cols, rows, range(icons), seeds)
+        recorded = []
+        board_ticks = 0
+        start = time.perf_counter()
+        for _ in range(ticks):
+            board_ticks += int((vector.game_over == 0).sum())
+            actions = greedy_actions(vector)
+            recorded.append(actions)
+            vector.step(actions)
+        vector_time = time.perf_counter() - start
+
+        engines = [SnakeEngine(cols, rows, range(icons), seed) for seed in seeds]
+        recorded = [
+            [None if code < 0 else DIRECTIONS[code] for code in actions.tolist()]
+            for actions in recorded
+        ]
+        start = time.perf_counter()
+        for actions in recorded:
+            for engine, action in zip(engines, actions):
+                if not engine.game_over:
+                    engine.step(action)
+        scalar_time = time.perf_counter() - start
+
+        results.append(
+            {
+                "case": f"boards={count}",
+                "vector_board_ticks_per_s": board_ticks / vector_time,
+                "scalar_board_ticks_per_s": board_ticks / scalar_time,
+                "speedup": scalar_time / vector_time,
+                "identical": all(
+                    engine.state_hash() == vector.state_hash(b)
+                    for b, engine in enumerate(engines)
+                ),
+            }
+        )
+    return results
+
+
+def spiky_latency(spike=0.03, base=0.00002, rate=0.05, seed=0):
+    """大多数消息耗时 base，rate 比例的消息卡顿 spike 秒，模拟忙于重绘或建索引的 Explorer。"""
+    rng = random.Random(seed)
+
+    def latency():
+        return spike if rng.random() < rate else base
+
+    return latency
+
+
+def bench_render(ticks=100, interval=0.02, icons=200, send_timeout=0.005, seed=0):
+    """Explorer 偶尔卡顿时，游戏线程直接写桌面和交给 RenderThread 写的节拍误差对比。
+
+    每个 case 都按实际节奏运行 ticks 帧（间隔 interval 秒），桌面消息的耗时来自 spiky_latency。
+    stale_frames 为被后续帧合并、没有单独写入的帧数，superseded_moves 为因此省掉的写入。
+    """
+    grid_info = arena_grid(icons)
+    # 先用不限预算的自动驾驶走一遍，三个 case 重放同样的输入
+    engine = SnakeEngine(grid_info["cols"], grid_info["rows"], range(icons), seed)
+    pilot = Autopilot(engine, budget=float("inf"))
+    plan = []
+    while len(plan) < ticks and not engine.game_over:
+        plan.append(pilot.decide())
+        engine.step(plan[-1])
+    results = []
+    for case, threaded, timeout in (
+        ("sync", False, None),
+        ("render_thread", True, None),
+        ("render_thread+timeout", True, send_timeout),
+    ):
+        desktop = MemoryDesktop(
+            synthetic_positions(icons),
+            latency=spiky_latency(seed=seed),
+            send_timeout=timeout,
+        )
+        engine = SnakeEngine(grid_info["cols"], grid_info["rows"], range(icons), seed)
+        desktop.write_positions(
+            (icon_idx, *grid_to_pixel(grid_x, grid_y, grid_info))
+            for icon_idx, grid_x, grid_y in engine.setup_moves
+        )
+        renderer = RenderThread(desktop) if threaded else None
+        if renderer is not None:
+            renderer.start()
+            write = renderer.publish
+        else:
+            write = desktop.write_positions
+        scheduler = TickScheduler()
+        scheduler.start(interval)
+        for action in plan:
+            scheduler.wait(interval)
+            events = engine.step(action)
+            write(
+                [
+                    (icon_idx, *grid_to_pixel(grid_x, grid_y, grid_info))
+                    for icon_idx, grid_x, grid_y in events.moves
+                ]
+            )
+            if events.game_over:
+                break
+        if renderer is not None:
+            renderer.stop()
+        stats = scheduler.stats()
+        render_stats = renderer.stats() if renderer is not None else {}
+        results.append(
+            {
+                "case": case,
+                "ticks": stats["ticks"],
+                "p99_late_ms": stats["p99_late_ms"],
+                "max_late_ms": stats["max_late_ms"],
+                "skipped_ticks": stats["skipped"],
+                "stale_frames": render_stats.get("stale", 0),
+                "superseded_moves": render_stats.get("superseded", 0),
+                "max_render_lag_ms": render_stats.get("max_lag_ms", 0.0),
+                "timeouts": desktop.writer.timeouts,
+            }
+        )
+    return results
+
+
+def bench_identity(counts=(500, 5000, 10000), changes=20, seed=0):
+    """游戏中桌面插入或删除一个图标后，IconTracker 增量同步与完整重读全部标识的开销。
+
+    每个 case 做 changes 次随机的单个插入或删除，每次之后调用一次 check()，
+    最后核对每个开局图标都映射到了名称相同的当前索引。
+    """
+    rng = random.Random(seed)
+    results = []
+    for count in counts:
+        desktop = synthetic_desktop(count)
+        listview = desktop.listview
+        texts = list(listview.texts)
+        tracker = IconTracker(desktop, desktop.read_identities(), full_every=0)
+
+        calls = 0
+        elapsed = 0.0
+        for n in range(changes):
+            if n % 2:
+                listview.delete_item(rng.randrange(len(listview.texts)))
+            else:
+                index = rng.randrange(len(listview.texts) + 1)
+                listview.insert_item(index, f"新建文件 {n}.txt", 0, 0)
+            before = listview.syscalls
+            start = time.perf_counter()
+            tracker.check()
+            elapsed += time.perf_counter() - start
+            calls += listview.syscalls - before
+
+        before = listview.syscalls
+        start = time.perf_counter()
+        desktop.read_identities()
+        full_time = time.perf_counter() - start
+        full_calls = listview.syscalls - before
+
+        results.append(
+            {
+                "case": f"icons={count}",
+                "resync_ms": elapsed / changes * 1000,
+                "resync_calls": calls / changes,
+                "full_read_ms": full_time * 1000,
+                "full_read_calls": full_calls,
+                "full_resyncs": tracker.full_resyncs,
+                "correct": all(
+                    (listview.texts[index] == texts[icon])
+                    if index >= 0
+                    else texts[icon] not in listview.texts
+                    for icon, index in enumerate(tracker.current)
+                ),
+            }
+        )
+    return results
+
+
+def bench_multi(counts=(1, 2, 4, 8, 16), cols=64, rows=36, icons=1200, ticks=2000):
+    """多蛇模式下每帧 MultiSnakeEngine.step 的耗时随蛇的数量的变化（只计 step，不计自动驾驶）。
+
+    各条蛇由 Autopilot 控制，同一个种子，最多 ticks 帧。
+    deque_check_us 为旧做法（对每条蛇的 deque 做 in 检查）判定同样的蛇头所需的时间，
+    它随蛇的数量乘以蛇长增长，step 只随蛇的数量增长。
+    """
+    results = []
+    for count in counts:
+        engine = MultiSnakeEngine(cols, rows, range(icons), 0, snakes=count)
+        pilots = [
+            Autopilot(engine.snake_view(k), budget=float("inf")) for k in range(count)
+        ]
+        step_time = check_time = 0.0
+        snake_ticks = lengths = 0
+        while not engine.game_over and engine.ticks < ticks:
+            actions = [
+                None if engine.dead[k] else pilot.decide()
+                for k, pilot in enumerate(pilots)
+            ]
+            bodies = [deque(c for c, _ in body.segments()) for body in engine.bodies]
+            heads = [
+                engine.steps[action or engine.directions[k]][body.head_cell()]
+                for k, (action, body) in enumerate(zip(actions, engine.bodies))
+                if not engine.dead[k]
+            ]
+            alive = engine.alive
+            start = time.perf_counter()
+            for head in heads:
+                any(head in body for body in bodies)
+            check_time += time.perf_counter() - start
+            start = time.perf_counter()
+            engine.step(actions)
+            step_time += time.perf_counter() - start
+            snake_ticks += alive
+            lengths += sum(len(body) for body in bodies)
+        results.append(
+            {
+                "case": f"snakes={count}",
+                "ticks": engine.ticks,
+                "mean_total_length": lengths / engine.ticks,
+                "step_us": step_time / engine.ticks * 1e6,
+                "step_us_per_snake": step_time / snake_ticks * 1e6,
+                "deque_check_us": check_time / engine.ticks * 1e6,
+                "game_over": engine.game_over,
+            }
+        )
+    return results
+
+
+class NullStream:
+    """只统计字节数（UTF-8）的输出流。"""
+
+    def __init__(self):
+        self.bytes = 0
+
+    def write(self, data):
+        self.bytes += len(data.encode())
+
+    def flush(self):
+        pass
+
+
+def bench_terminal(boards=((80, 24), (200, 60), (400, 120)), fill=0.5, frames=2000):
+    """终端后端每帧只重画变化的格子与每帧整屏重画的耗时和输出量对比。
+
+    棋盘填满 fill 比例的图标，每帧把 3 个图标移到随机的空格（相当于蛇头、蛇尾和食物）。
+    """
+    results = []
+    size_x, size_y = 96, 104
+    for cols, rows in boards:
+        rng = random.Random(0)
+        icons = int(cols * rows * fill)
+        cells = rng.sample(range(cols * rows), icons)
+        free = sorted(set(range(cols * rows)) - set(cells))
+        plan = []
+        for _ in range(frames):
+            frame = []
+            for icon in rng.sample(range(icons), 3):
+                k = rng.randrange(len(free))
+                cell, free[k] = free[k], cells[icon]
+                cells[icon] = cell
+                frame.append((icon, cell % cols * size_x, cell // cols * size_y))
+            plan.append(frame)
+
+        timings = {}
+        for mode in ("diff", "full"):
+            stream = NullStream()
+            view = TerminalView((size_x, size_y), (cols, rows), stream)
+            view.update(
+                (icon, cell % cols * size_x, cell // cols * size_y)
+                for icon, cell in enumerate(cells)
+            )
+            view.open()
+            start_bytes = stream.bytes
+            start = time.perf_counter()
+            for frame in plan:
+                view.update(frame)
+                if mode == "full":
+                    view.redraw()
+            timings[mode] = (
+                (time.perf_counter() - start) / frames,
+                (stream.bytes - start_bytes) / frames,
+            )
+        results.append(
+            {
+                "case": f"{cols}x{rows}",
+                "diff_frame_us": timings["diff"][0] * 1e6,
+                "full_frame_us": timings["full"][0] * 1e6,
+                "diff_frame_bytes": timings["diff"][1],
+                "full_frame_bytes": timings["full"][1],
+                "max_fps": 1 / timings["diff"][0],
+            }
+        )
+    return results
+
+
+def bench_layout(counts=(500, 2000, 5000), seed=0):
+    """布局规划与按编号顺序分配角色的对比：布置场地时移动的图标数、总位移（像素）和规划耗时。
+
+    desktop 为桌面默认的竖向排列；relaid 为图标已经按同一局的布局摆好、但索引被打乱
+    （例如上一局没有恢复就被 Explorer 重新排序），此时规划后不需要移动任何图标。
+    """
+    results = []
+    for count in counts:
+        grid_info = arena_grid(count)
+        cols, rows = grid_info["cols"], grid_info["rows"]
+
+        def make_engine(icons):
+            return SnakeEngine(cols, rows, icons, seed)
+
+        icons = list(range(count))
+        spacing = (grid_info["size_x"], grid_info["size_y"])
+        desktop = column_layout(count, (cols * spacing[0], rows * spacing[1]), spacing)
+        relaid = dict(enumerate(desktop))
+        for icon_idx, grid_x, grid_y in make_engine(icons).setup_moves:
+            relaid[icon_idx] = grid_to_pixel(grid_x, grid_y, grid_info)
+        shuffled = icons[:]
+        random.Random(seed).shuffle(shuffled)
+        relaid = [relaid[icon_idx] for icon_idx in shuffled]
+
+        for name, positions in (("desktop", desktop), ("relaid", relaid)):
+            _, plan = plan_layout(make_engine, icons, positions, grid_info)
+            results.append(
+                {
+                    "case": f"{name} icons={count}",
+                    "plan_ms": plan["elapsed_ms"],
+                    "moves": plan["moves"],
+                    "baseline_moves": plan["baseline_moves"],
+                    "kept": plan["kept"],
+                    "displacement": plan["displacement"],
+                    "baseline_displacement": plan["baseline_displacement"],
+                    "exact": plan["exact"],
+                }
+            )
+    return results
+
+
+class SpectatorClient(asyncio.Protocol):
+    """只统计收到的行数的观战客户端，slow 为 True 时从不读取（模拟卡住的客户端）。"""
+
+    def __init__(self, slow):
+        self.slow = slow
+        self.lines = 0
+
+    def connection_made(self, transport):
+        if self.slow:
+            transport.pause_reading()
+
+    def data_received(self, data):
+        self.lines += data.count(b"\n")
+
+
+class SpectatorClients:
+    """在单独的线程和事件循环里连接 count 个观战客户端，其中 slow 比例的客户端从不读取。"""
+
+    def __init__(self, port, count, slow):
+        self.port = port
+        self.count = count
+        self.slow = slow
+        self.clients = []
+        self.transports = []
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+
+    async def connect(self):
+        for i in range(self.count):
+            slow = i < self.count * self.slow
+            transport, client = await self.loop.create_connection(
+                lambda: SpectatorClient(slow), "127.0.0.1", self.port
+            )
+            self.transports.append(transport)
+            self.clients.append(client)
+
+    def __enter__(self):
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(self.connect(), self.loop).result()
+        return self
+
+    def close(self):
+        for transport in self.transports:
+            transport.abort()
+        self.loop.stop()
+
+    def __exit__(self, *exc_info):
+        self.loop.call_soon_threadsafe(self.close)
+        self.thread.join()
+        return False
+
+
+def bench_spectator(
+    counts=(0, 100, 300), ticks=300, interval=0.02, slow=0.1, cols=64, rows=36
+):
+    """观战服务器的负载测试：连上不同数量的客户端时游戏的节拍误差和 publish 的耗时。
+
+    蛇沿哈密顿回路前进（占满半个棋盘），每帧 publish 一次，每 10 帧一个关键帧；
+    slow 比例的客户端从不读取，它们的帧由背压丢弃。
+    节拍误差（late）与客户端数量无关；单核上广播紧接在 publish 之后、游戏线程本来要睡眠的时候进行，
+    publish 的耗时里包含等待事件循环线程交还 GIL 的时间。
+    """
+    results = []
+    grid_info = {
+        "size_x": 96,
+        "size_y": 104,
+        "origin_x": 0,
+        "origin_y": 0,
+        "cols": cols,
+        "rows": rows,
+    }
+    pixel_xs, pixel_ys = pixel_table(grid_info)
+    for count in counts:
+        engine, path, head = filled_engine(cols, rows, 0.5)
+        actions = cycle_actions(path)
+        placed = [
+            (icon_idx, *engine.board.position(cell))
+            for cell, icon_idx in engine.body.segments()
+        ]
+        placed.append((engine.food_index, *engine.food_grid_pos))
+        server = GameServer(
+            ("tcp", "127.0.0.1", 0),
+            BoardMirror(engine.board, grid_info, placed),
+            keyframe_interval=10,
+        )
+        server.start()
+        with SpectatorClients(server.address[2], count, slow) as clients:
+            deadline = time.perf_counter() + 5
+            while len(server.clients) < count and time.perf_counter() < deadline:
+                time.sleep(0.01)
+            scheduler = TickScheduler()
+            scheduler.start(interval)
+            samples = []
+            for _ in range(ticks):
+                scheduler.wait(interval)
+                engine.advance(actions[head])
+                head = (head + 1) % len(path)
+                moves = []
+                if engine.moved_icon >= 0:
+                    cell = engine.moved_cell
+                    moves.append((engine.moved_icon, pixel_xs[cell], pixel_ys[cell]))
+                start = time.perf_counter()
+                server.publish(engine.ticks, moves, (engine.body.head_cell(),))
+                samples.append(time.perf_counter() - start)
+            time.sleep(0.2)
+            received = sorted(
+                client.lines for client in clients.clients if not client.slow
+            )
+        server.stop()
+        samples.sort()
+        late = scheduler.stats()
+        stats = server.stats()
+        results.append(
+            {
+                "case": f"clients={count}",
+                "clients": stats["peak_clients"],
+                "mean_publish_us": sum(samples) / len(samples) * 1e6,
+                "p99_publish_us": samples[int(len(samples) * 0.99)] * 1e6,
+                "mean_late_ms": late["mean_late_ms"],
+                "p99_late_ms": late["p99_late_ms"],
+                "skipped": late["skipped"],
+                "min_lines_received": received[0] if received else 0,
+                "sent_bytes": stats["bytes_sent"],
+                "dropped": stats["dropped"],
+                "resyncs": stats["resyncs"],
+            }
+        )
+    return results
+
+
+# 名称 -> (函数, 是否接受 latency 参数, --quick 时的参数)
+SUITE = {
+    "scan": (bench_scan, True, {"counts": (5, 50, 500)}),
+    "frame_writes": (bench_frame_writes, True, {"ticks": 50}),
+    "board": (bench_board, False, {"ops": 2000}),
+    "tick": (bench_tick, False, {"ticks": 500}),
+    "body": (bench_body, False, {"ticks": 500}),
+    "engine": (bench_engine, False, {"ticks": 10000}),
+    "scheduler": (bench_scheduler, False, {"ticks": 200}),
+    "calibration": (bench_calibration, False, {"counts": (50, 500)}),
+    "setup": (bench_setup, True, {"counts": (5, 50, 500)}),
+    "snapshot": (bench_snapshot, True, {"counts": (5, 50, 500)}),
+    "memory": (bench_memory, False, {"counts": (5, 50, 500)}),
+    "tracing": (bench_tracing, True, {"ticks": 2000}),
+    "startup": (bench_startup, True, {"counts": (50, 500), "repeat": 1}),
+    "replay": (bench_replay, False, {"ticks": 5000}),
+    "autopilot": (
+        bench_autopilot,
+        False,
+        {"boards": ((16, 10, 20), (32, 18, 60)), "games": 1},
+    ),
+    "batch": (bench_batch, False, {"games": 32}),
+    "vector": (bench_vector, False, {"counts": (100, 1000), "ticks": 100}),
+    "render": (bench_render, False, {"ticks": 50}),
+    "identity": (bench_identity, False, {"counts": (500, 5000)}),
+    "multi": (bench_multi, False, {"counts": (1, 4, 16), "ticks": 300}),
+    "terminal": (bench_terminal, False, {"frames": 200}),
+    "layout": (bench_layout, False, {"counts": (500, 2000)}),
+    "spectator": (bench_spectator, False, {"counts": (0, 100), "ticks": 100}),
+}
+
+
+def run_suite(names=None, quick=False, latency=0.0):
+    results = {}
+    for name, (bench, takes_latency, quick_kwargs) in SUITE.items():
+        if names and name not in names:
+            continue
+        kwargs = dict(quick_kwargs) if quick else {}
+        if takes_latency:
+            kwargs["latency"] = latency
+        results[name] = bench(**kwargs)
+    return results
+
+
+LOWER_IS_BETTER = ("_s", "_ms", "_us", "_bytes", "_calls", "_messages", "_repaints")
+
+
+def metric_direction(name):
+    """指标越小越好返回 1，越大越好返回 -1，不是性能指标返回 0。"""
+    if name.endswith("_per_s"):
+        return -1
+    if name.endswith(LOWER_IS_BETTER):
+        return 1
+    return 0
+
+
+def compare(results, baseline, threshold):
+    """与基准结果对比，返回变差超过 threshold 比例的指标列表。"""
+    regressions = []
+    for name, rows in results.items():
+        base_rows = {row["case"]: row for row in baseline.get(name, [])}
+        for row in rows:
+            base = base_rows.get(row["case"])
+            if base is None:
+                continue
+            for metric, value in row.items():
+                direction = metric_direction(metric)
+                old = base.get(metric)
+                if not direction or not old or not isinstance(value, (int, float)):
+                    continue
+                change = (value - old) / old * direction
+                if change > threshold:
+                    regressions.append((name, row["case"], metric, old, value, change))
+    return regressions
+
+
+def format_value(value):
+    if isinstance(value, float):
+        return f"{value:.4g}"
+    return str(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="贪吃蛇性能测试")
+    parser.add_argument("--quick", action="store_true", help="缩小规模快速运行")
+    parser.add_argument("--only", help="只运行这些测试，逗号分隔：" + ",".join(SUITE))
+    parser.add_argument(
+        "--latency-us", type=float, default=0.0, help="每条模拟消息的额外耗时（微秒）"
+    )
+    parser.add_argument("--json", help="把结果保存到这个 JSON 文件")
+    parser.add_argument("--compare", help="与之前保存的 JSON 结果对比")
+    parser.add_argument(
+        "--threshold", type=float, default=0.2, help="变差超过这个比例视为退化（默认 0.2）"
+    )
+    args = parser.parse_args()
+
+    names = set(args.only.split(",")) if args.only else None
+    results = run_suite(names, args.quick, args.latency_us / 1e6)
+
+    for name, rows in results.items():
+        print(f"[{name}]")
+        for row in rows:
+            fields = ", ".join(
+                f"{key}={format_value(value)}"
+                for key, value in row.items()
+                if key != "case"
+            )
+            print(f"  {row['case']}: {fields}")
+
+    if args.json:
+        document = {
+            "meta": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "latency_us": args.latency_us,
+                "quick": args.quick,
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            },
+            "results": results,
+        }
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(document, f, ensure_ascii=False, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for name, case, metric, old, new, change in regressions:
+            print(
+                f"退化: {name} {case} {metric}: {format_value(old)} -> {format_value(new)} "
+                f"(+{change:.0%})"
+            )
+        if regressions:
+            return 1
+        print("没有发现退化。")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
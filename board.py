@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""游戏棋盘的占用网格和空闲格索引。
+
+碰撞检测、边界跟踪和食物放置都走这里，每个操作都是 O(1)（边界推进按均摊计），
+从空棋盘到几乎填满的棋盘每帧开销保持不变。
+"""
+from array import array
+
+# 格子状态
+EMPTY = 0
+SNAKE = 1
+BORDER = 2
+FOOD = 3
+
+FOOD_MARGIN = 3  # 食物与最左侧边界列之间至少空出的列数
+
+
+class FreeCellSet:
+    """支持 O(1) 插入、删除和均匀随机抽样的格子集合。
+
+    cells 紧凑存放集合中的格子编号，slots 记录每个格子在 cells 中的下标（不在集合中为 -1），
+    删除时用最后一个元素填补空位。
+    """
+
+    __slots__ = ("cells", "slots")
+
+    def __init__(self, size):
+        self.cells = array("i")
+        self.slots = array("i", [-1]) * size
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __contains__(self, cell):
+        return self.slots[cell] >= 0
+
+    def add(self, cell):
+        if self.slots[cell] < 0:
+            self.slots[cell] = len(self.cells)
+            self.cells.append(cell)
+
+    def discard(self, cell):
+        slot = self.slots[cell]
+        if slot < 0:
+            return
+        last = self.cells.pop()
+        if last != cell:
+            self.cells[slot] = last
+            self.slots[last] = slot
+        self.slots[cell] = -1
+
+    def sample(self, rng):
+        """均匀随机取一个格子，集合为空时返回 None。"""
+        if not self.cells:
+            return None
+        return self.cells[rng.randrange(len(self.cells))]
+
+
+class Board:
+    """cols x rows 的占用网格，格子编号为 y * cols + x。
+
+    free 只包含“食物区”内的空格，即 x <= max_food_x 的列。
+    边界图标从右往左逐列摆放，只会按摆放的逆序被取走，
+    所以最左侧边界列只会右移，食物区也只会扩大。
+    """
+
+    def __init__(self, cols, rows):
+        self.cols = cols
+        self.rows = rows
+        self.cells = bytearray(cols * rows)
+        self.border_stack = []  # 按摆放顺序记录的边界格子
+        self.border_counts = array("i", [0]) * (cols + 1)
+        self.border_x_boundary = cols  # 最左侧有边界图标的列，没有边界时为 cols
+        self.max_food_x = -1
+        self.free = FreeCellSet(cols * rows)
+
+    def cell(self, x, y):
+        return y * self.cols + x
+
+    def position(self, cell):
+        y, x = divmod(cell, self.cols)
+        return x, y
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.cols and 0 <= y < self.rows
+
+    def get(self, x, y):
+        return self.cells[y * self.cols + x]
+
+    def occupy(self, x, y, kind):
+        self.occupy_cell(y * self.cols + x, kind)
+
+    def release(self, x, y):
+        self.release_cell(y * self.cols + x)
+
+    def occupy_cell(self, cell, kind):
+        self.cells[cell] = kind
+        self.free.discard(cell)
+
+    def release_cell(self, cell):
+        self.cells[cell] = EMPTY
+        if cell % self.cols <= self.max_food_x:
+            self.free.add(cell)
+
+    def push_border(self, x, y):
+        self.occupy(x, y, BORDER)
+        self.border_stack.append((x, y))
+        self.border_counts[x] += 1
+        if x < self.border_x_boundary:
+            self.border_x_boundary = x
+
+    def pop_border(self):
+        """取走最后摆放的边界格子并更新边界列，没有边界时返回 None。"""
+        if not self.border_stack:
+            return None
+        x, y = self.border_stack.pop()
+        self.release(x, y)
+        self.border_counts[x] -= 1
+        while (
+            self.border_x_boundary < self.cols
+            and self.border_counts[self.border_x_boundary] == 0
+        ):
+            self.border_x_boundary += 1
+        return x, y
+
+    def update_food_zone(self):
+        """按当前边界重新计算食物区，把新纳入的列中的空格加入 free。返回 max_food_x。"""
+        max_food_x = min(self.cols - 1, max(0, self.border_x_boundary - FOOD_MARGIN))
+        for x in range(self.max_food_x + 1, max_food_x + 1):
+            for y in range(self.rows):
+                cell = y * self.cols + x
+                if self.cells[cell] == EMPTY:
+                    self.free.add(cell)
+        self.max_food_x = max(self.max_food_x, max_food_x)
+        return self.max_food_x
+
+    def place_food(self, rng):
+        """在食物区随机选一个空格放置食物，返回 (x, y)；没有空格时返回 None。"""
+        cell = self.place_food_cell(rng)
+        return None if cell < 0 else self.position(cell)
+
+    def place_food_cell(self, rng):
+        """同 place_food，但返回格子编号，没有空格时返回 -1。"""
+        cell = self.free.sample(rng)
+        if cell is None:
+            return -1
+        self.cells[cell] = FOOD
+        self.free.discard(cell)
+        return cell
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""根据桌面图标坐标推算网格参数。
+
+lattice_grid 用 NumPy 从全部图标坐标拟合网格：先把各轴坐标聚成列/行，
+再从相邻列（行）的间距中找出最常见的间距并用最小二乘细化，
+缺少邻居、图标摆放零散或桌面很大都不影响，并给出 0~1 的置信度。
+没有安装 NumPy 时退回到 neighbour_grid，即原来基于左上角图标近邻的算法。
+失败时两者都抛出 ValueError，消息可以直接展示给用户。
+"""
+from listview import MISSING, iter_points
+
+try:
+    import numpy as np
+except ImportError:  # NumPy 是可选依赖
+    np = None
+
+MIN_PITCH = 16  # 图标间距下限（像素），更近的坐标视为同一列/行
+INLIER_TOLERANCE = 0.2  # 与网格点的偏差不超过间距的这个比例即视为落在网格上
+
+
+def make_grid_info(
+    size_x, size_y, origin_x, origin_y, screen_width, screen_height, confidence
+):
+    return {
+        "size_x": size_x,
+        "size_y": size_y,
+        "origin_x": origin_x,
+        "origin_y": origin_y,
+        "cols": (screen_width - origin_x) // size_x,
+        "rows": (screen_height - origin_y) // size_y,
+        "confidence": confidence,
+    }
+
+
+def neighbour_grid(positions, screen_width, screen_height):
+    """原来的算法：以最靠左上的图标为起点，取它正右方和正下方最近的图标算间距。"""
+    all_icon_pos = [(x, y) for i, x, y in iter_points(positions)]
+    if len(all_icon_pos) < 4:
+        raise ValueError("桌面上可识别的图标少于4个。")
+
+    sorted_by_topleft = sorted(all_icon_pos, key=lambda p: p[0] + p[1])
+    pos0 = sorted_by_topleft[0]
+    origin_x, origin_y = pos0
+
+    pos1 = None
+    pos2 = None
+    min_dx = float("inf")
+    min_dy = float("inf")
+
+    for x, y in all_icon_pos:
+        if x == origin_x and y == origin_y:
+            continue
+        dx = x - origin_x
+        dy = y - origin_y
+        if abs(dy) < 20 and 0 < dx < min_dx:
+            min_dx = dx
+            pos1 = (x, y)
+        if abs(dx) < 20 and 0 < dy < min_dy:
+            min_dy = dy
+            pos2 = (x, y)
+
+    if not pos1 or not pos2:
+        raise ValueError(
+            "无法自动确定网格大小。\n请确保在左上角图标的 正右方 和 正下方 紧邻的位置有其他图标。"
+        )
+
+    grid_size_x = pos1[0] - pos0[0]
+    grid_size_y = pos2[1] - pos0[1]
+    if grid_size_x <= 0 or grid_size_y <= 0:
+        raise ValueError("网格计算失败。请检查参考图标位置。")
+
+    return make_grid_info(
+        grid_size_x, grid_size_y, origin_x, origin_y, screen_width, screen_height, 1.0
+    )
+
+
+def cluster_coordinates(values, tolerance):
+    """把一个轴上的坐标聚成若干列（行），返回升序排列的各簇中心。
+
+    图标数明显少于一般列（行）的簇视为零散摆放的图标，不参与拟合。
+    """
+    values = np.sort(values)
+    labels = np.concatenate(([0], np.cumsum(np.diff(values) > tolerance)))
+    counts = np.bincount(labels)
+    centers = np.bincount(labels, weights=values) / counts
+    return centers[counts >= np.median(counts) / 4]
+
+
+def fit_pitch(centers):
+    """从相邻簇的间距估计网格间距，返回 (间距, 内点比例)；无法估计时返回 (None, 0.0)。"""
+    gaps = np.diff(centers)
+    gaps = gaps[gaps >= MIN_PITCH]
+    if gaps.size == 0:
+        return None, 0.0
+    # 最常见的间距作为初值，并列时取较小的
+    values, counts = np.unique(np.rint(gaps), return_counts=True)
+    pitch = values[np.argmax(counts)]
+    # 缺失的列表现为整数倍的间距，一并用于最小二乘细化
+    multiples = np.maximum(np.rint(gaps / pitch), 1)
+    inliers = np.abs(gaps - multiples * pitch) <= INLIER_TOLERANCE * pitch
+    pitch = gaps[inliers].sum() / multiples[inliers].sum()
+    return pitch, inliers.mean()
+
+
+def fit_origin(centers, pitch):
+    """网格在该轴上的起点：把最靠前的簇沿网格往回推到屏幕边缘内的第一格。"""
+    first = centers[0]
+    return first - np.floor(first / pitch) * pitch
+
+
+def lattice_grid(positions, screen_width, screen_height):
+    """用全部图标坐标拟合网格。positions 为 read_all_positions 的结果。"""
+    points = np.frombuffer(positions, dtype=np.int32).reshape(-1, 2)
+    points = points[points[:, 0] != MISSING].astype(np.float64)
+    if len(points) < 4:
+        raise ValueError("桌面上可识别的图标少于4个。")
+
+    tolerance = MIN_PITCH / 2
+    centers_x = cluster_coordinates(points[:, 0], tolerance)
+    centers_y = cluster_coordinates(points[:, 1], tolerance)
+    pitch_x, score_x = fit_pitch(centers_x)
+    pitch_y, score_y = fit_pitch(centers_y)
+
+    # 所有图标都在同一列（行）时只能借用另一个轴的间距，置信度减半
+    if pitch_x is None and pitch_y is None:
+        raise ValueError("无法自动确定网格大小。\n请确保桌面上至少有两行或两列图标。")
+    if pitch_x is None:
+        pitch_x, score_x = pitch_y, score_y / 2
+    if pitch_y is None:
+        pitch_y, score_y = pitch_x, score_x / 2
+
+    origin_x = fit_origin(centers_x, pitch_x)
+    origin_y = fit_origin(centers_y, pitch_y)
+
+    # 置信度：落在网格点附近的图标比例，再乘以两个轴间距拟合的内点比例
+    offsets = (points - (origin_x, origin_y)) / (pitch_x, pitch_y)
+    on_grid = np.all(np.abs(offsets - np.rint(offsets)) <= INLIER_TOLERANCE, axis=1)
+    confidence = float(on_grid.mean() * score_x * score_y)
+
+    return make_grid_info(
+        int(round(pitch_x)),
+        int(round(pitch_y)),
+        int(round(origin_x)),
+        int(round(origin_y)),
+        screen_width,
+        screen_height,
+        round(confidence, 3),
+    )
+
+
+def calibrate(positions, screen_width, screen_height):
+    """推算网格参数，有 NumPy 时用 lattice_grid，否则用 neighbour_grid。"""
+    if np is None:
+        return neighbour_grid(positions, screen_width, screen_height)
+    return lattice_grid(positions, screen_width, screen_height)
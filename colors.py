@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+"""终端颜色（ANSI 转义序列），控制台输出和终端后端共用。"""
+
+
+# --- 颜色定义 ---
+class Colors:
+    HEADER = "\033[95m"
+    OKBLUE = "\033[94m"
+    OKCYAN = "\033[96m"
+    OKGREEN = "\033[92m"
+    WARNING = "\033[93m"
+    FAIL = "\033[91m"
+    ENDC = "\033[0m"
+    BOLD = "\033[1m"
+    UNDERLINE = "\033[4m"
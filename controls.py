@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""事件驱动的输入层。
+
+输入源把按键事件推入 InputQueue，游戏循环每帧取出一个方向：
+两次很快的转向会在相邻两帧依次生效，不会合并成一次；
+180 度掉头在出队时才判断，与当时蛇的实际方向比较。
+ESC 也走同一个队列，设置 stopped 标志。
+"""
+import os
+import select
+import sys
+import threading
+from collections import deque
+
+from engine import DOWN, LEFT, RIGHT, UP
+
+KEY_DIRECTIONS = {
+    "w": UP,
+    "up": UP,
+    "s": DOWN,
+    "down": DOWN,
+    "a": LEFT,
+    "left": LEFT,
+    "d": RIGHT,
+    "right": RIGHT,
+}
+# 多人模式下每个玩家的按键：玩家 1 用 WASD，玩家 2 用方向键
+PLAYER_KEYS = (
+    {"w": UP, "s": DOWN, "a": LEFT, "d": RIGHT},
+    {"up": UP, "down": DOWN, "left": LEFT, "right": RIGHT},
+)
+STOP_KEY = "esc"
+# 终端输入的按键序列 -> 按键名（方向键是转义序列，单独的 ESC 和 q 都表示退出）
+TERMINAL_KEYS = {
+    "\x1b[A": "up",
+    "\x1b[B": "down",
+    "\x1b[C": "right",
+    "\x1b[D": "left",
+    "\x1b": STOP_KEY,
+    "q": STOP_KEY,
+}
+
+
+class InputQueue:
+    """有界的方向队列，可以在键盘钩子线程里 push，在游戏线程里取出。
+
+    keys 为这个队列响应的按键表，默认 WASD 和方向键都可以。
+    """
+
+    def __init__(self, capacity=3, keys=KEY_DIRECTIONS):
+        self.capacity = capacity
+        self.keys = keys
+        self.directions = deque()
+        self.stopped = False
+        self.dropped = 0
+
+    def push(self, direction):
+        # 队列满时丢弃新的输入，保证先按的键先生效
+        if self.directions and self.directions[-1] == direction:
+            return
+        if len(self.directions) >= self.capacity:
+            self.dropped += 1
+            return
+        self.directions.append(direction)
+
+    def push_key(self, name):
+        """按键名对应的输入，不相关的按键被忽略。"""
+        name = name.lower()
+        if name == STOP_KEY:
+            self.request_stop()
+            return
+        direction = self.keys.get(name)
+        if direction:
+            self.push(direction)
+
+    def request_stop(self):
+        self.stopped = True
+
+    def next_direction(self, current):
+        """取出本帧的新方向；跳过与 current 相同或相反的输入，没有可用输入时返回 None。"""
+        while self.directions:
+            direction = self.directions.popleft()
+            if direction == current:
+                continue
+            if direction[0] == -current[0] and direction[1] == -current[1]:
+                self.dropped += 1
+                continue
+            return direction
+        return None
+
+    def clear(self):
+        self.directions.clear()
+
+
+class PlayerInputs:
+    """多人模式下每个玩家一个 InputQueue，按键按 PLAYER_KEYS 分给各自的队列。
+
+    接口与 InputQueue 的输入端相同，可以直接交给 KeyboardInput 或 ScriptedInput；
+    只有一个玩家时 WASD 和方向键都给这个玩家。
+    """
+
+    def __init__(self, players, capacity=3):
+        if players == 1:
+            self.queues = [InputQueue(capacity)]
+        else:
+            self.queues = [InputQueue(capacity, keys) for keys in PLAYER_KEYS[:players]]
+        self.stopped = False
+
+    def push_key(self, name):
+        if name.lower() == STOP_KEY:
+            self.request_stop()
+            return
+        for queue in self.queues:
+            queue.push_key(name)
+
+    def request_stop(self):
+        self.stopped = True
+
+
+class KeyboardInput:
+    """用 keyboard 库的全局钩子采集按键。"""
+
+    def __init__(self, queue):
+        self.queue = queue
+        self.hook = None
+
+    def start(self):
+        import keyboard
+
+        self.hook = keyboard.on_press(self._on_press)
+
+    def _on_press(self, event):
+        if event.name:
+            self.queue.push_key(event.name)
+
+    def poll(self, tick):
+        pass
+
+    def stop(self):
+        if self.hook is not None:
+            import keyboard
+
+            keyboard.unhook(self.hook)
+            self.hook = None
+
+
+class TerminalInput:
+    """从终端读取按键（POSIX），用于终端后端，不需要 keyboard 库和管理员权限。
+
+    读取线程把终端切换到 cbreak 模式，stop() 时恢复原来的设置。
+    """
+
+    def __init__(self, queue, stream=None):
+        self.queue = queue
+        self.fd = (stream or sys.stdin).fileno()
+        self.saved = None
+        self.thread = None
+        self.stopping = threading.Event()
+
+    def start(self):
+        import termios
+        import tty
+
+        self.saved = termios.tcgetattr(self.fd)
+        tty.setcbreak(self.fd)
+        self.thread = threading.Thread(
+            target=self.run, name="terminal-input", daemon=True
+        )
+        self.thread.start()
+
+    def run(self):
+        while not self.stopping.is_set():
+            ready, _, _ = select.select([self.fd], [], [], 0.1)
+            if ready:
+                data = os.read(self.fd, 64).decode("utf-8", "ignore")
+                for name in parse_terminal_keys(data):
+                    self.queue.push_key(name)
+
+    def poll(self, tick):
+        pass
+
+    def stop(self):
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        if self.saved is not None:
+            import termios
+
+            termios.tcsetattr(self.fd, termios.TCSADRAIN, self.saved)
+            self.saved = None
+
+
+def parse_terminal_keys(data):
+    """把一次读到的终端输入拆成按键名，例如 "w\x1b[A" -> ["w", "up"]。"""
+    names = []
+    i = 0
+    while i < len(data):
+        if data.startswith("\x1b[", i) and i + 2 < len(data):
+            key = data[i : i + 3]
+            i += 3
+        else:
+            key = data[i]
+            i += 1
+        names.append(TERMINAL_KEYS.get(key, key))
+    return names
+
+
+class ScriptedInput:
+    """按帧回放的输入源，script 为 {帧号: [按键名, ...]}，用于测试和性能测试。"""
+
+    def __init__(self, queue, script):
+        self.queue = queue
+        self.script = script
+
+    def start(self):
+        pass
+
+    def poll(self, tick):
+        for name in self.script.get(tick, ()):
+            self.queue.push_key(name)
+
+    def stop(self):
+        pass
@@ -0,0 +1,330 @@
+# -*- coding: utf-8 -*-
+"""与 Win32 无关的贪吃蛇规则引擎。
+
+SnakeEngine 只处理网格坐标和图标编号，不读键盘、不看时钟、不碰桌面：
+每次 step(action) 推进一帧并返回本帧的 Events，由调用方负责把移动写到桌面。
+随机数来自带种子的 random.Random，同样的种子和输入总能得到同样的对局。
+
+蛇身存放在 SnakeBody 的两个定长数组里（格子编号和图标编号），移动方向预先算成
+“格子 -> 相邻格子”的查表，所以 advance() 在不吃到食物的帧里不创建任何对象；
+step() 在它的基础上生成 Events。
+"""
+import hashlib
+import random
+from array import array
+from collections import deque
+
+from board import BORDER, SNAKE, Board
+
+UP = (0, -1)
+DOWN = (0, 1)
+LEFT = (-1, 0)
+RIGHT = (1, 0)
+
+INITIAL_SNAKE_LEN = 3
+MIN_FOOD_X = 5  # 食物区至少要延伸到这一列，否则场地太窄
+
+# 结束原因
+WALL = "wall"
+SELF = "self"
+BORDER_HIT = "border"
+WON = "won"
+BOARD_FULL = "full"
+
+GAME_OVER_MESSAGES = {
+    WALL: "游戏结束：撞到墙了！",
+    SELF: "游戏结束：撞到自己了！",
+    BORDER_HIT: "游戏结束：撞到边界图标了！",
+    WON: "恭喜你吃完了所有图标，游戏胜利！",
+    BOARD_FULL: "棋盘已经没有空位了，游戏胜利！",
+}
+
+
+def grid_to_pixel(grid_x, grid_y, grid_info):
+    """将网格坐标转换为屏幕像素坐标。"""
+    pixel_x = grid_info["origin_x"] + grid_x * grid_info["size_x"]
+    pixel_y = grid_info["origin_y"] + grid_y * grid_info["size_y"]
+    return pixel_x, pixel_y
+
+
+def pixel_table(grid_info):
+    """按格子编号预先算好的像素坐标 (xs, ys)，热路径上代替逐次调用 grid_to_pixel。"""
+    cols, rows = grid_info["cols"], grid_info["rows"]
+    size_x, size_y = grid_info["size_x"], grid_info["size_y"]
+    origin_x, origin_y = grid_info["origin_x"], grid_info["origin_y"]
+    xs = array("i", (origin_x + (cell % cols) * size_x for cell in range(cols * rows)))
+    ys = array("i", (origin_y + (cell // cols) * size_y for cell in range(cols * rows)))
+    return xs, ys
+
+
+def tick_interval(snake_len):
+    """蛇越长走得越快，最快每 0.05 秒一步。"""
+    base_speed = 0.3
+    speed_increase = snake_len * 0.005
+    return max(0.05, base_speed - speed_increase)
+
+
+class Events:
+    """一帧的结果：moves 为 (图标编号, 网格 x, 网格 y) 列表。"""
+
+    __slots__ = ("moves", "ate", "game_over")
+
+    def __init__(self):
+        self.moves = []
+        self.ate = False
+        self.game_over = None  # 结束原因，见 GAME_OVER_MESSAGES
+
+    @property
+    def won(self):
+        return self.game_over in (WON, BOARD_FULL)
+
+
+class SnakeBody:
+    """蛇身的环形缓冲区，从蛇头到蛇尾依次为 length 个 (格子编号, 图标编号)。
+
+    cells 和 icons 是容量为整个棋盘的定长数组，head 为蛇头所在的槽位，
+    蛇头前进时向前占用一个槽位，蛇尾收缩时只减少 length，都不移动其他元素。
+    """
+
+    __slots__ = ("cells", "icons", "head", "length", "capacity")
+
+    def __init__(self, capacity):
+        self.cells = array("i", [0]) * capacity
+        self.icons = array("i", [0]) * capacity
+        self.head = 0
+        self.length = 0
+        self.capacity = capacity
+
+    def __len__(self):
+        return self.length
+
+    def head_cell(self):
+        return self.cells[self.head]
+
+    def tail_slot(self):
+        slot = self.head + self.length - 1
+        return slot - self.capacity if slot >= self.capacity else slot
+
+    def tail_cell(self):
+        return self.cells[self.tail_slot()]
+
+    def push_head(self, cell, icon):
+        head = self.head - 1 if self.head else self.capacity - 1
+        self.cells[head] = cell
+        self.icons[head] = icon
+        self.head = head
+        self.length += 1
+
+    def pop_tail(self):
+        self.length -= 1
+
+    def segments(self):
+        """从蛇头到蛇尾依次产出 (格子编号, 图标编号)。"""
+        cells, icons, capacity = self.cells, self.icons, self.capacity
+        for i in range(self.head, self.head + self.length):
+            slot = i - capacity if i >= capacity else i
+            yield cells[slot], icons[slot]
+
+
+class SnakeEngine:
+    """贪吃蛇状态机。
+
+    icons 为参与游戏的图标编号：前三个组成蛇，其余的从最右一列开始
+    逐列排成边界，每吃掉一个食物就从边界取走一个图标作为新的食物。
+    构造后 setup_moves 给出布置场地所需的全部移动。
+    """
+
+    __slots__ = (
+        "cols",
+        "rows",
+        "seed",
+        "rng",
+        "board",
+        "direction",
+        "ticks",
+        "game_over",
+        "overflow",
+        "steps",
+        "body",
+        "waiting_icons",
+        "setup_moves",
+        "food_index",
+        "food_cell",
+        "food_grid_pos",
+        "ate",
+        "moved_icon",
+        "moved_cell",
+    )
+
+    def __init__(self, cols, rows, icons, seed=None):
+        icons = list(icons)
+        if len(icons) < INITIAL_SNAKE_LEN + 2:
+            raise ValueError("没有足够的图标来开始游戏（需要至少5个）。")
+        self.cols = cols
+        self.rows = rows
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.board = Board(cols, rows)
+        self.direction = RIGHT
+        self.ticks = 0
+        self.game_over = None
+        self.overflow = 0  # 放不进边界的图标数量
+        # 上一帧的结果，见 advance()
+        self.ate = False
+        self.moved_icon = -1
+        self.moved_cell = -1
+
+        # 每个格子在四个方向上的相邻格子，出界为 -1
+        self.steps = {
+            (dx, dy): array(
+                "i",
+                (
+                    (y + dy) * cols + x + dx
+                    if 0 <= x + dx < cols and 0 <= y + dy < rows
+                    else -1
+                    for y in range(rows)
+                    for x in range(cols)
+                ),
+            )
+            for dx, dy in (UP, DOWN, LEFT, RIGHT)
+        }
+
+        # 蛇头在 (INITIAL_SNAKE_LEN - 1, 0)，从蛇尾开始依次压入
+        self.body = SnakeBody(cols * rows)
+        for i in reversed(range(INITIAL_SNAKE_LEN)):
+            self.body.push_head(INITIAL_SNAKE_LEN - 1 - i, icons[i])
+        self.waiting_icons = deque(icons[INITIAL_SNAKE_LEN:])
+        self.setup_moves = []
+
+        # 右侧边界
+        current_col = cols - 1
+        current_row = 0
+        for i, icon_idx in enumerate(reversed(self.waiting_icons)):
+            if current_col < 0:
+                self.overflow = len(self.waiting_icons) - i
+                break
+            self.board.push_border(current_col, current_row)
+            self.setup_moves.append((icon_idx, current_col, current_row))
+            current_row += 1
+            if current_row >= rows:
+                current_row = 0
+                current_col -= 1
+
+        # 贪吃蛇
+        for cell, icon_idx in self.body.segments():
+            self.board.occupy_cell(cell, SNAKE)
+            self.setup_moves.append((icon_idx, *self.board.position(cell)))
+
+        # 食物
+        self.food_index = self.waiting_icons.popleft()
+        self.board.pop_border()
+        if self.board.update_food_zone() < MIN_FOOD_X:
+            raise ValueError("游戏区域太窄，无法安全放置食物。")
+        self.respawn_food()
+        self.setup_moves.append((self.food_index, *self.food_grid_pos))
+
+    @property
+    def length(self):
+        return self.body.length
+
+    @property
+    def won(self):
+        return self.game_over in (WON, BOARD_FULL)
+
+    @property
+    def snake_grid_pos(self):
+        """蛇身各节的 (x, y)，从蛇头到蛇尾。每次调用都新建列表，热路径上请用 body。"""
+        position = self.board.position
+        return [position(cell) for cell, _ in self.body.segments()]
+
+    @property
+    def snake_indices(self):
+        """蛇身各节的图标编号，从蛇头到蛇尾。"""
+        return [icon_idx for _, icon_idx in self.body.segments()]
+
+    def tick_interval(self):
+        return tick_interval(self.body.length)
+
+    def respawn_food(self):
+        """在食物区随机放置食物，没有空位时返回 False。"""
+        cell = self.food_cell = self.board.place_food_cell(self.rng)
+        self.food_grid_pos = None if cell < 0 else self.board.position(cell)
+        return cell >= 0
+
+    def state_hash(self):
+        """当前局面（帧号、方向、食物、蛇身位置和图标）的 64 位摘要，用于比对回放。"""
+        state = array("i", (self.ticks, *self.direction, self.food_index))
+        state.extend(self.food_grid_pos or (-1, -1))
+        cols = self.cols
+        for cell, icon_idx in self.body.segments():
+            state.extend((cell % cols, cell // cols, icon_idx))
+        digest = hashlib.blake2b(state.tobytes(), digest_size=8).digest()
+        return int.from_bytes(digest, "little")
+
+    def advance(self, action=None):
+        """推进一帧，返回结束原因，没有结束时返回 None。action 同 step()。
+
+        本帧的结果放在 ate、moved_icon、moved_cell 中：moved_icon 为本帧需要移动的图标，
+        moved_cell 为它的目标格子，没有需要移动的图标时 moved_icon 为 -1。
+        没有吃到食物的帧里不创建任何对象。
+        """
+        self.ate = False
+        self.moved_icon = -1
+        if self.game_over:
+            return self.game_over
+        self.ticks += 1
+
+        direction = self.direction
+        if action and (action[0] != -direction[0] or action[1] != -direction[1]):
+            direction = self.direction = action
+
+        body = self.body
+        cell = self.steps[direction][body.cells[body.head]]
+        if cell < 0:
+            return self._finish(WALL)
+        board = self.board
+        cell_state = board.cells[cell]
+        if cell_state == SNAKE:
+            return self._finish(SELF)
+        if cell_state == BORDER:
+            return self._finish(BORDER_HIT)
+
+        if cell == self.food_cell:
+            board.occupy_cell(cell, SNAKE)
+            body.push_head(cell, self.food_index)
+            self.ate = True
+
+            if not self.waiting_icons:
+                return self._finish(WON)
+
+            self.food_index = self.waiting_icons.popleft()
+            board.pop_border()
+            board.update_food_zone()
+            if not self.respawn_food():
+                return self._finish(BOARD_FULL)
+            self.moved_icon = self.food_index
+            self.moved_cell = self.food_cell
+        else:
+            tail = body.tail_slot()
+            tail_icon_index = body.icons[tail]
+            board.release_cell(body.cells[tail])
+            body.pop_tail()
+            board.occupy_cell(cell, SNAKE)
+            body.push_head(cell, tail_icon_index)
+            self.moved_icon = tail_icon_index
+            self.moved_cell = cell
+        return None
+
+    def step(self, action=None):
+        """推进一帧。action 为新的方向，None 表示保持当前方向；180 度掉头会被忽略。"""
+        events = Events()
+        events.game_over = self.advance(action)
+        events.ate = self.ate
+        if self.moved_icon >= 0:
+            cell = self.moved_cell
+            events.moves.append((self.moved_icon, cell % self.cols, cell // self.cols))
+        return events
+
+    def _finish(self, reason):
+        self.game_over = reason
+        return reason
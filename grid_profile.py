@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""缓存的网格参数。
+
+网格只取决于屏幕分辨率、DPI 缩放和 ListView 的图标间距，这三者不变时上一次计算出的网格仍然有效。
+因此每次计算成功后把结果按这三项存到 JSON 文件里；下次启动时只要抽查一两个图标确实落在缓存的网格上，
+就可以跳过网格计算和启动时的操作提示。
+"""
+import json
+import os
+
+from calibrate import INLIER_TOLERANCE
+from listview import iter_points
+
+DEFAULT_PATH = os.path.join(
+    os.path.expanduser("~"), ".desktop_snake", "grid_profile.json"
+)
+VERIFY_SAMPLES = 2
+GRID_KEYS = ("size_x", "size_y", "origin_x", "origin_y", "cols", "rows")
+
+
+def profile_key(screen_size, dpi, spacing):
+    """缓存的键，例如 "3840x2160@144/spacing=113x120"。"""
+    return f"{screen_size[0]}x{screen_size[1]}@{dpi}/spacing={spacing[0]}x{spacing[1]}"
+
+
+def read_profiles(path=DEFAULT_PATH):
+    """读取全部缓存，文件不存在或已损坏时返回空 dict。"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            profiles = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return profiles if isinstance(profiles, dict) else {}
+
+
+def load_profile(key, path=DEFAULT_PATH):
+    """返回 key 对应的网格参数，没有缓存或缓存不完整时返回 None。"""
+    grid_info = read_profiles(path).get(key)
+    if not isinstance(grid_info, dict) or not all(k in grid_info for k in GRID_KEYS):
+        return None
+    return grid_info
+
+
+def save_profile(key, grid_info, path=DEFAULT_PATH):
+    """保存网格参数；先写临时文件再原子替换，其他键下的缓存保持不变。"""
+    profiles = read_profiles(path)
+    profiles[key] = grid_info
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(profiles, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def on_grid(grid_info, x, y):
+    """坐标是否落在网格点附近，且在游戏区域之内。"""
+    offset_x = (x - grid_info["origin_x"]) / grid_info["size_x"]
+    offset_y = (y - grid_info["origin_y"]) / grid_info["size_y"]
+    return (
+        -INLIER_TOLERANCE <= offset_x
+        and -INLIER_TOLERANCE <= offset_y
+        and abs(offset_x - round(offset_x)) <= INLIER_TOLERANCE
+        and abs(offset_y - round(offset_y)) <= INLIER_TOLERANCE
+        and round(offset_x) < grid_info["cols"]
+        and round(offset_y) < grid_info["rows"]
+    )
+
+
+def verify_profile(grid_info, positions, samples=VERIFY_SAMPLES):
+    """抽查前 samples 个图标是否都落在缓存的网格上。"""
+    checked = 0
+    for i, x, y in iter_points(positions):
+        if not on_grid(grid_info, x, y):
+            return False
+        checked += 1
+        if checked == samples:
+            return True
+    return checked > 0
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""游戏进行中跟踪图标索引的变化。
+
+游戏里的图标编号是开局时的 ListView 索引，但桌面上新增、删除文件或 Explorer 重新排序后，
+同一个图标的索引会变。IconTracker 记住每个索引上图标的标识（见 listview.item_identity），
+定时用两次很便宜的探测检查桌面有没有变化：图标数量（一条消息），以及轮流抽查一个索引上的标识。
+
+发现变化后只重新读取变化的那一段：单次插入、删除或改名时，变化点之前的图标索引不变，
+之后的图标整体平移，用二分查找定位前后两段不变的部分（每一步只读一个标识），
+再一次读回中间一段。之后抽查几个其他索引，对不上（例如重新排序）时退回到完整重读。
+数量不变的变化只能靠轮流抽查发现，可能要过几次探测，所以每隔 full_every 次探测
+还会完整核对一次，并按开局时的标识重建映射，保证最终一定正确。
+同步后把旧索引到新索引的对应关系交给 backend.remap_indices，并更新“开局编号 -> 当前索引”的表，
+游戏照常用开局编号，写入前由 translate() 换成当前索引。
+"""
+import time
+from array import array
+from collections import defaultdict, deque
+
+DEFAULT_INTERVAL = 0.5  # 两次探测之间的最短间隔（秒）
+FULL_CHECK_EVERY = 60  # 每隔这么多次探测完整核对一次
+VERIFY_SAMPLES = 8  # 增量同步后额外抽查的索引数
+
+
+def match_identities(old, new, old_first=0, new_first=0):
+    """按标识把 old 中的每个位置对应到 new 中，返回 {old_first + i: new_first + j}。
+
+    同一个标识出现多次时按出现顺序一一对应。
+    """
+    slots = defaultdict(deque)
+    for j, identity in enumerate(new):
+        slots[identity].append(new_first + j)
+    return {
+        old_first + i: slots[identity].popleft()
+        for i, identity in enumerate(old)
+        if slots.get(identity)
+    }
+
+
+class IconTracker:
+    """开局编号到当前 ListView 索引的映射，桌面变化时增量同步。
+
+    identities 为开局时每个索引上图标的标识。poll() 每帧调用即可，实际探测按 interval 限速。
+    """
+
+    def __init__(
+        self,
+        backend,
+        identities,
+        interval=DEFAULT_INTERVAL,
+        full_every=FULL_CHECK_EVERY,
+        clock=time.monotonic,
+    ):
+        self.backend = backend
+        self.original = array("I", identities)  # 开局编号 -> 标识
+        self.identities = array("I", identities)  # 当前每个索引上的标识
+        self.current = array("i", range(len(self.identities)))  # 开局编号 -> 当前索引
+        self.interval = interval
+        self.full_every = full_every
+        self.clock = clock
+        self.next_check = clock() + interval
+        self.probe = 0  # 下一次抽查的索引
+
+        self.checks = 0
+        self.resyncs = 0
+        self.full_resyncs = 0
+        self.identity_reads = 0  # 探测和同步时读取的标识数
+        self.lost = 0  # 已经不在桌面上的开局图标数
+
+    def read(self, first, count):
+        self.identity_reads += count
+        return self.backend.read_identities(first, count)
+
+    def read_one(self, index):
+        return self.read(index, 1)[0]
+
+    def poll(self):
+        """到了探测时间就检查一次，返回索引是否发生了变化。"""
+        now = self.clock()
+        if now < self.next_check:
+            return False
+        self.next_check = now + self.interval
+        return self.check()
+
+    def check(self):
+        """立即检查桌面是否变化，变化时同步并返回 True。"""
+        self.checks += 1
+        if self.full_every and self.checks % self.full_every == 0:
+            return self.full_check()
+        count = self.backend.icon_count()
+        changed = count != len(self.identities)
+        if not changed and count:
+            self.probe %= count
+            changed = self.read_one(self.probe) != self.identities[self.probe]
+            self.probe += 1
+        if changed:
+            self.resync(count)
+        return changed
+
+    def full_check(self):
+        """完整读取一遍标识并核对，映射有误时按开局时的标识重建，返回是否有变化。"""
+        return self.rebuild(self.read(0, self.backend.icon_count()))
+
+    def rebuild(self, new):
+        """按完整读到的标识重建全部映射，返回映射是否有变化。"""
+        current = array("i", [-1]) * len(self.original)
+        for icon, index in match_identities(self.original, new).items():
+            current[icon] = index
+        if new == self.identities and current == self.current:
+            return False
+        self.full_resyncs += 1
+        mapping = array("i", [-1]) * len(self.identities)
+        for i, j in match_identities(self.identities, new).items():
+            mapping[i] = j
+        self.commit(new, current, mapping)
+        return True
+
+    def commit(self, new, current, mapping):
+        self.identities = new
+        self.current = current
+        self.lost = current.count(-1)
+        self.probe = 0
+        self.resyncs += 1
+        self.backend.remap_indices(mapping)
+
+    def resync(self, count=None):
+        """重新建立索引映射，尽量只读取变化的一段。"""
+        if count is None:
+            count = self.backend.icon_count()
+        old = self.identities
+        old_count = len(old)
+        limit = min(count, old_count)
+
+        # 前缀：索引不变的部分
+        lo, hi = 0, limit
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.read_one(mid) == old[mid]:
+                lo = mid + 1
+            else:
+                hi = mid
+        prefix = lo
+        # 后缀：整体平移了 count - old_count 的部分
+        lo, hi = 0, limit - prefix
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.read_one(count - 1 - mid) == old[old_count - 1 - mid]:
+                lo = mid + 1
+            else:
+                hi = mid
+        suffix = lo
+
+        middle = self.read(prefix, count - prefix - suffix)
+        new = old[:prefix] + middle + old[old_count - suffix :]
+        if not self.verify(new, prefix, count - suffix):
+            # 不是单段变化（例如重新排序），完整重读
+            self.rebuild(self.read(0, count))
+            return
+
+        mapping = array("i", range(prefix))
+        mapping.extend([-1] * (old_count - prefix - suffix))
+        mapping.extend(range(count - suffix, count))
+        shifted = match_identities(
+            old[prefix : old_count - suffix], middle, prefix, prefix
+        )
+        for i, j in shifted.items():
+            mapping[i] = j
+        current = array("i", self.current)
+        for icon, index in enumerate(current):
+            if index >= 0:
+                current[icon] = mapping[index]
+        self.commit(new, current, mapping)
+
+    def verify(self, new, start, end):
+        """抽查变化段以外的几个索引，确认变化确实只有 [start, end) 这一段。"""
+        outside = len(new) - (end - start)
+        for k in range(min(VERIFY_SAMPLES, outside)):
+            i = outside * k // VERIFY_SAMPLES
+            index = i if i < start else i + end - start
+            if self.read_one(index) != new[index]:
+                return False
+        return True
+
+    def translate(self, moves):
+        """把 (开局编号, x, y) 换成 (当前索引, x, y)，跳过已经不在桌面上的图标。"""
+        current = self.current
+        for icon, x, y in moves:
+            index = current[icon]
+            if index >= 0:
+                yield index, x, y
+
+    def stats(self):
+        return {
+            "checks": self.checks,
+            "resyncs": self.resyncs,
+            "full_resyncs": self.full_resyncs,
+            "identity_reads": self.identity_reads,
+            "lost": self.lost,
+        }
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""桌面后端的延迟画像。
+
+test_winapi.py 测量各个 Win32 原语（查找窗口、取图标数量、逐个和批量读取坐标、
+设置坐标、远程内存分配和释放）的往返耗时，按负载分别统计分位数后写入 JSON 文件。
+recommend() 由画像算出游戏的几个参数：写入消息的超时、场地布置分几帧写完，
+以及调度器落后时最多追赶几帧。snake.py 启动时读取画像并采用这些参数（命令行显式指定的除外）。
+"""
+import json
+import math
+import os
+import time
+
+DEFAULT_PATH = os.path.join(
+    os.path.expanduser("~"), ".desktop_snake", "latency_profile.json"
+)
+PROFILE_VERSION = 1
+
+MIN_TICK_MS = 50  # 游戏最快的节奏（见 engine.tick_interval）
+SETUP_FRAME_BUDGET_MS = 100  # 布置场地时每帧最多占用 Explorer 的时间
+SEND_TIMEOUT_RANGE_MS = (5, 200)
+CATCH_UP_RANGE = (2, 5)
+
+
+def summarize(samples):
+    """一组耗时（秒）的统计，单位微秒。"""
+    ordered = sorted(samples)
+    count = len(ordered)
+    if not count:
+        return {"count": 0}
+
+    def pick(fraction):
+        return ordered[min(count - 1, int(count * fraction))] * 1e6
+
+    return {
+        "count": count,
+        "mean_us": sum(ordered) / count * 1e6,
+        "p50_us": pick(0.5),
+        "p90_us": pick(0.9),
+        "p99_us": pick(0.99),
+        "max_us": ordered[-1] * 1e6,
+    }
+
+
+def worst(loads, primitive, key):
+    """所有负载下 primitive 的 key 统计中最大的一个。"""
+    return max(stats[primitive][key] for stats in loads.values())
+
+
+def clamp(value, bounds):
+    low, high = bounds
+    return max(low, min(high, value))
+
+
+def recommend(loads, icons, frame_moves):
+    """按最坏的负载给出游戏参数。
+
+    send_timeout_ms: 单次设置坐标 p99 的 4 倍，偶尔的卡顿不会被误判为超时；
+    setup_frames: 按批量写入每次移动的平均耗时估算整个场地的写入时间，分成每帧不超过
+    SETUP_FRAME_BUDGET_MS 的若干帧；
+    max_catch_up: 一帧写入的 p99 超过最快的节奏时，游戏线程可能被拖慢，允许多追赶几帧；
+    scan_speedup: 批量读取全部坐标相对逐个读取的加速比，在同一负载下计算，取最小的一个
+    （小于 1 表示批量读取更慢）。
+    """
+    set_p99_ms = worst(loads, "set_position", "p99_us") / 1000
+    frame_p99_ms = worst(loads, "set_position_frame", "p99_us") / 1000
+    move_us = worst(loads, "set_position_frame", "mean_us") / frame_moves
+    layout_ms = icons * move_us / 1000
+    catch_up = 1 + math.ceil(frame_p99_ms / MIN_TICK_MS)
+    return {
+        "send_timeout_ms": clamp(math.ceil(4 * set_p99_ms), SEND_TIMEOUT_RANGE_MS),
+        "setup_frames": max(1, math.ceil(layout_ms / SETUP_FRAME_BUDGET_MS)),
+        "max_catch_up": clamp(catch_up, CATCH_UP_RANGE),
+        "layout_ms": layout_ms,
+        "frame_p99_ms": frame_p99_ms,
+        "scan_speedup": min(
+            stats["read_position"]["mean_us"]
+            * icons
+            / max(stats["read_all_positions"]["mean_us"], 1e-3)
+            for stats in loads.values()
+        ),
+    }
+
+
+def make_profile(backend, loads, icons, samples, frame_moves):
+    """loads 为 {负载线程数: {原语: summarize 的结果}}。"""
+    return {
+        "version": PROFILE_VERSION,
+        "backend": backend,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "icons": icons,
+        "samples": samples,
+        "frame_moves": frame_moves,
+        "loads": {str(threads): stats for threads, stats in loads.items()},
+        "recommended": recommend(loads, icons, frame_moves),
+    }
+
+
+def save_profile(profile, path=DEFAULT_PATH):
+    """先写临时文件再原子替换。"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(profile, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def load_profile(path=DEFAULT_PATH):
+    """读取画像，文件不存在、已损坏或版本不符时返回 None。"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            profile = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (
+        not isinstance(profile, dict)
+        or profile.get("version") != PROFILE_VERSION
+        or not isinstance(profile.get("recommended"), dict)
+    ):
+        return None
+    return profile
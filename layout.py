@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""开局布局规划：按图标现在的位置给它们分配蛇、食物和边界的格子，让布置场地时移动的图标尽量少、尽量近。
+
+引擎按图标编号的顺序分配角色（前三个组成蛇，其余的从最右一列开始排成边界），
+而场地的形状只由棋盘大小和种子决定，与图标编号无关。plan_layout 先用占位编号构造一次引擎，
+得到每个位置上的图标最终要去的格子，再求一个最小代价指派（代价为像素的曼哈顿距离），
+最后按指派结果把图标排好顺序，用这个顺序构造的引擎布置出同样的场地：
+    已经正好在某个目标格子上的图标留在那里，不移动；
+    其余的目标格子不多于 EXACT_LIMIT 个时用最短增广路求精确解（需要 NumPy）；
+    更多时把目标格子和图标都按坐标排序后切成若干块，逐块求精确解，几千个图标也不到一秒；
+    没有 NumPy 时按排序后的顺序逐块配对。
+放不进边界的图标没有目标格子，分到这些位置的图标留在原地。
+"""
+import time
+
+try:
+    import numpy as np
+except ImportError:  # NumPy 是可选依赖
+    np = None
+
+from engine import grid_to_pixel
+
+EXACT_LIMIT = 256  # 一次精确求解的目标格子数上限，更多时分块
+
+
+def slot_targets(engine, count, grid_info):
+    """engine 由占位编号 range(count) 构造，返回每个占位编号最终所在的像素坐标，没有目标时为 None。"""
+    targets = [None] * count
+    for icon_idx, grid_x, grid_y in engine.setup_moves:
+        targets[icon_idx] = grid_to_pixel(grid_x, grid_y, grid_info)
+    return targets
+
+
+def distance(a, b):
+    return abs(a[0] - b[0]) + abs(a[1] - b[1])
+
+
+def solve_assignment(cost):
+    """cost 为 行数 x 列数（行数不多于列数）的代价矩阵，返回每行分到的列，总代价最小。
+
+    最短增广路算法：每次从一个未分配的行出发，用 Dijkstra 找到一个未分配的列，
+    沿路径调整分配并更新对偶变量。距离相同的列优先选未分配的，尽早结束这一轮搜索。
+    """
+    rows, cols = cost.shape
+    u = np.zeros(rows)
+    v = np.zeros(cols)
+    col_of_row = np.full(rows, -1)
+    row_of_col = np.full(cols, -1)
+    for start in range(rows):
+        shortest = np.full(cols, np.inf)
+        path = np.full(cols, -1)
+        remaining = np.ones(cols, dtype=bool)
+        visited_rows = []
+        visited_cols = []
+        min_value = 0.0
+        row = start
+        sink = -1
+        while sink < 0:
+            visited_rows.append(row)
+            reduced = min_value + cost[row] - u[row] - v
+            better = remaining & (reduced < shortest)
+            shortest[better] = reduced[better]
+            path[better] = row
+            candidates = np.where(remaining, shortest, np.inf)
+            min_value = candidates.min()
+            ties = np.flatnonzero(candidates == min_value)
+            free = ties[row_of_col[ties] < 0]
+            col = int(free[0] if free.size else ties[0])
+            remaining[col] = False
+            visited_cols.append(col)
+            if row_of_col[col] < 0:
+                sink = col
+            else:
+                row = row_of_col[col]
+
+        u[start] += min_value
+        for row in visited_rows[1:]:
+            u[row] += min_value - shortest[col_of_row[row]]
+        visited_cols = np.array(visited_cols)
+        v[visited_cols] -= min_value - shortest[visited_cols]
+        col = sink
+        while True:
+            row = path[col]
+            row_of_col[col] = row
+            col_of_row[row], col = col, col_of_row[row]
+            if row == start:
+                break
+    return col_of_row.tolist()
+
+
+def pair_block(slots, points, rows, cols):
+    """给 rows 中的每个目标格子分配 cols 中的一个图标，返回 {目标下标: 图标下标}。"""
+    if np is not None:
+        targets = np.array([slots[i] for i in rows], dtype=float)
+        sources = np.array([points[j] for j in cols], dtype=float)
+        cost = np.abs(targets[:, None, 0] - sources[None, :, 0]) + np.abs(
+            targets[:, None, 1] - sources[None, :, 1]
+        )
+        chosen = solve_assignment(cost)
+    else:
+        # 两边都按坐标排好序，按比例均匀地配对
+        chosen = [k * len(cols) // len(rows) for k in range(len(rows))]
+    return {row: cols[k] for row, k in zip(rows, chosen)}
+
+
+def assign(slots, points, limit=EXACT_LIMIT):
+    """给 slots 中的每个目标坐标分配 points 中不同的一个坐标（points 不少于 slots）。
+
+    返回 (每个目标分到的 points 下标, 是否为精确解)。
+    """
+    count = len(slots)
+    if not count:
+        return [], True
+    slot_order = sorted(range(count), key=slots.__getitem__)
+    point_order = sorted(range(len(points)), key=points.__getitem__)
+    blocks = -(-count // limit)
+    exact = np is not None and blocks == 1
+    result = [0] * count
+    spare = []  # 前面的块没用上的图标
+    for b in range(blocks):
+        rows = slot_order[count * b // blocks : count * (b + 1) // blocks]
+        cols = point_order[
+            len(points) * b // blocks : len(points) * (b + 1) // blocks
+        ]
+        if len(cols) < len(rows):
+            cols = sorted(spare + cols, key=points.__getitem__)
+            spare = []
+        chosen = pair_block(slots, points, rows, cols)
+        for row, col in chosen.items():
+            result[row] = col
+        used = set(chosen.values())
+        spare.extend(col for col in cols if col not in used)
+    return result, exact
+
+
+def plan_layout(make_engine, icons, positions, grid_info):
+    """按图标的当前位置重新排列 icons，使 make_engine(排列后的 icons) 布置场地时的移动最少。
+
+    make_engine(icons) 构造引擎（SnakeEngine 或 MultiSnakeEngine），positions[k] 为 icons[k]
+    当前的像素坐标。返回 (排列后的 icons, 统计 dict)，统计中的 baseline_* 为按原来的顺序布置时的值。
+    """
+    start = time.perf_counter()
+    icons = list(icons)
+    positions = [tuple(pos) for pos in positions]
+    count = len(icons)
+    targets = slot_targets(make_engine(range(count)), count, grid_info)
+
+    # 已经在目标格子上的图标不动
+    waiting = {}
+    for k in range(count):
+        waiting.setdefault(positions[k], []).append(k)
+    order = [-1] * count
+    open_slots = []
+    for slot, target in enumerate(targets):
+        if target is None:
+            continue
+        here = waiting.get(target)
+        if here:
+            order[slot] = here.pop()
+        else:
+            open_slots.append(slot)
+    kept = count - len(open_slots) - targets.count(None)
+
+    placed = set(order)
+    rest = [k for k in range(count) if k not in placed]
+    chosen, exact = assign(
+        [targets[slot] for slot in open_slots], [positions[k] for k in rest]
+    )
+    for slot, j in zip(open_slots, chosen):
+        order[slot] = rest[j]
+    # 剩下的图标放进没有目标格子的位置，留在原地
+    placed = set(order)
+    staying = iter(k for k in rest if k not in placed)
+    for slot in range(count):
+        if order[slot] < 0:
+            order[slot] = next(staying)
+
+    moves = displacement = baseline_moves = baseline_displacement = 0
+    for slot, target in enumerate(targets):
+        if target is None:
+            continue
+        gap = distance(positions[order[slot]], target)
+        moves += gap > 0
+        displacement += gap
+        gap = distance(positions[slot], target)
+        baseline_moves += gap > 0
+        baseline_displacement += gap
+    return [icons[k] for k in order], {
+        "moves": moves,
+        "kept": kept,
+        "displacement": displacement,
+        "baseline_moves": baseline_moves,
+        "baseline_displacement": baseline_displacement,
+        "exact": exact,
+        "elapsed_ms": (time.perf_counter() - start) * 1000,
+    }
+
+
+def layout_moves(setup_moves, positions, grid_info):
+    """把引擎的 setup_moves 换成像素坐标，每个图标只保留最终位置（食物会先排进边界再移走），
+    并去掉最终位置就是当前位置的图标。
+
+    positions 为 {图标编号: 当前像素坐标}。
+    """
+    final = {}
+    for icon_idx, grid_x, grid_y in setup_moves:
+        final[icon_idx] = grid_to_pixel(grid_x, grid_y, grid_info)
+    return [
+        (icon_idx, *pos)
+        for icon_idx, pos in final.items()
+        if tuple(positions.get(icon_idx, ())) != pos
+    ]
@@ -0,0 +1,481 @@
+# -*- coding: utf-8 -*-
+"""桌面 ListView 的跨进程访问层。
+
+IconPositionReader 只打开一次 Explorer 进程、复用一块远程内存，
+一次 ReadProcessMemory 取回全部图标坐标（图标名称也按块批量读取）；FrameWriter 把一帧内的图标移动
+合并后在暂停重绘的情况下一次写入。它们只依赖一个“远程 ListView”接口，
+win32_desktop.Win32ListView 是真实实现，SimulatedListView 是内存中的替身，
+因此扫描和写入成本在 Linux 上也能测量。
+"""
+import ctypes
+import struct
+import time
+import zlib
+from array import array
+from collections import Counter
+
+# --- 消息常量 ---
+# 与 commctrl / win32con 中的值一致，写死在这里以便在非 Windows 平台导入
+LVM_FIRST = 0x1000
+LVM_GETITEMCOUNT = LVM_FIRST + 4
+LVM_SETITEMPOSITION = LVM_FIRST + 15
+LVM_GETITEMPOSITION = LVM_FIRST + 16
+LVM_GETITEMSPACING = LVM_FIRST + 51
+LVM_GETITEMTEXTW = LVM_FIRST + 115
+WM_SETREDRAW = 0x000B
+
+POINT_SIZE = 8  # sizeof(POINT)，两个 LONG
+MISSING = -(2**31)  # 读取失败的图标坐标用此值标记
+TEXT_CHARS = 260  # 每个图标名称的缓冲区长度（宽字符）
+TEXT_CHUNK = 256  # 读取名称时每批的图标数
+
+
+class LVITEMW(ctypes.Structure):
+    _fields_ = [
+        ("mask", ctypes.c_uint),
+        ("iItem", ctypes.c_int),
+        ("iSubItem", ctypes.c_int),
+        ("state", ctypes.c_uint),
+        ("stateMask", ctypes.c_uint),
+        ("pszText", ctypes.c_void_p),
+        ("cchTextMax", ctypes.c_int),
+        ("iImage", ctypes.c_int),
+        ("lParam", ctypes.c_ssize_t),
+        ("iIndent", ctypes.c_int),
+        ("iGroupId", ctypes.c_int),
+        ("cColumns", ctypes.c_uint),
+        ("puColumns", ctypes.c_void_p),
+        ("piColFmt", ctypes.c_void_p),
+        ("iGroup", ctypes.c_int),
+    ]
+
+
+LVITEM_SIZE = ctypes.sizeof(LVITEMW)
+TEXT_SIZE = TEXT_CHARS * 2
+
+
+def item_identity(text):
+    """由图标名称得到的 32 位标识，索引变化后仍可据此找回同一个图标。"""
+    return zlib.crc32(text.encode("utf-16-le"))
+
+
+class IconPositionReader:
+    """持久化的图标位置读取会话。
+
+    listview 需要提供 item_count / send_message / open_process / alloc /
+    read / write / free / close 这几个方法（见 SimulatedListView）。
+    """
+
+    def __init__(self, listview, capacity=0):
+        self.listview = listview
+        self.h_process = listview.open_process()
+        if not self.h_process:
+            raise OSError("无法打开桌面进程")
+        self.p_arena = None
+        self.capacity = 0
+        self.p_text_arena = None
+        self.reserve(max(1, capacity))
+
+    def reserve(self, count):
+        """确保远程内存至少能容纳 count 个 POINT，不够时按倍数扩容。"""
+        if count <= self.capacity:
+            return
+        new_capacity = max(count, self.capacity * 2)
+        p_arena = self.listview.alloc(self.h_process, new_capacity * POINT_SIZE)
+        if not p_arena:
+            raise OSError("远程内存分配失败")
+        if self.p_arena:
+            self.listview.free(self.h_process, self.p_arena)
+        self.p_arena = p_arena
+        self.capacity = new_capacity
+
+    def read_all_positions(self, count=None):
+        """读取全部图标坐标，返回 array('i')：[x0, y0, x1, y1, ...]。
+
+        读取失败的图标两个坐标都为 MISSING。
+        """
+        if count is None:
+            count = self.listview.item_count()
+        positions = array("i")
+        if count <= 0:
+            return positions
+        self.reserve(count)
+        send_message = self.listview.send_message
+        failed = []
+        for i in range(count):
+            p_point = self.p_arena + i * POINT_SIZE
+            if send_message(LVM_GETITEMPOSITION, i, p_point) == 0:
+                failed.append(i)
+        positions.frombytes(
+            self.listview.read(self.h_process, self.p_arena, count * POINT_SIZE)
+        )
+        for i in failed:
+            positions[2 * i] = positions[2 * i + 1] = MISSING
+        return positions
+
+    def read_all_texts(self, count=None):
+        """读取全部图标名称。"""
+        if count is None:
+            count = self.listview.item_count()
+        return self.read_texts(0, count)
+
+    def read_texts(self, first, count):
+        """读取索引从 first 开始的 count 个图标的名称。
+
+        每批 TEXT_CHUNK 个图标：一次 WriteProcessMemory 写入全部 LVITEMW，
+        逐个发送 LVM_GETITEMTEXTW，再一次 ReadProcessMemory 取回全部名称。
+        """
+        if count <= 0:
+            return []
+        if not self.p_text_arena:
+            self.p_text_arena = self.listview.alloc(
+                self.h_process, TEXT_CHUNK * (LVITEM_SIZE + TEXT_SIZE)
+            )
+            if not self.p_text_arena:
+                raise OSError("远程内存分配失败")
+        p_texts = self.p_text_arena + TEXT_CHUNK * LVITEM_SIZE
+        items = (LVITEMW * TEXT_CHUNK)()
+        for i, item in enumerate(items):
+            item.pszText = p_texts + i * TEXT_SIZE
+            item.cchTextMax = TEXT_CHARS
+        items = bytes(items)
+
+        send_message = self.listview.send_message
+        texts = []
+        end = first + count
+        for start in range(first, end, TEXT_CHUNK):
+            size = min(TEXT_CHUNK, end - start)
+            self.listview.write(
+                self.h_process, self.p_text_arena, items[: size * LVITEM_SIZE]
+            )
+            lengths = [
+                send_message(
+                    LVM_GETITEMTEXTW, start + i, self.p_text_arena + i * LVITEM_SIZE
+                )
+                for i in range(size)
+            ]
+            data = self.listview.read(self.h_process, p_texts, size * TEXT_SIZE)
+            for i, length in enumerate(lengths):
+                offset = i * TEXT_SIZE
+                texts.append(data[offset : offset + length * 2].decode("utf-16-le"))
+        return texts
+
+    def read_all_identities(self, count=None):
+        """读取全部图标的标识，返回 array('I')。"""
+        return array("I", map(item_identity, self.read_all_texts(count)))
+
+    def read_identities(self, first, count):
+        """读取索引从 first 开始的 count 个图标的标识。"""
+        return array("I", map(item_identity, self.read_texts(first, count)))
+
+    def close(self):
+        if self.p_arena:
+            self.listview.free(self.h_process, self.p_arena)
+            self.p_arena = None
+        if self.p_text_arena:
+            self.listview.free(self.h_process, self.p_text_arena)
+            self.p_text_arena = None
+        if self.h_process:
+            self.listview.close(self.h_process)
+            self.h_process = None
+        self.capacity = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def make_lparam(x, y):
+    """等价于 win32api.MAKELONG(x, y)。"""
+    return (int(x) & 0xFFFF) | ((int(y) & 0xFFFF) << 16)
+
+
+class FrameWriter:
+    """按帧合并图标移动的写入器。
+
+    move() 只记录目标位置：同一帧内被覆盖的移动和不改变位置的移动都会被丢弃。
+    flush() 把剩下的移动一次写入；多于一个写入时先用 WM_SETREDRAW 暂停重绘，
+    写完后恢复并只刷新一次。
+    send_timeout 不为 None 时每条消息最多等待这么多秒（listview.send_message_timeout），
+    超时的移动留到下一次 flush 重试。
+    """
+
+    def __init__(self, listview, known_positions=None, send_timeout=None):
+        self.listview = listview
+        self.send_timeout = send_timeout
+        # 每个图标最后一次写入（或已知）的位置
+        self.current = dict(known_positions or {})
+        self.pending = {}
+        self.ticks = 0
+        self.writes = 0
+        self.max_writes = 0
+        self.dropped = 0
+        self.timeouts = 0
+        self.flush_time = 0.0
+        self.max_flush_time = 0.0
+
+    def remap(self, mapping):
+        """图标索引变化后把按旧索引记录的位置搬到新索引，mapping[旧索引] 为新索引或 -1（已删除）。"""
+        size = len(mapping)
+        for name in ("current", "pending"):
+            old = getattr(self, name)
+            setattr(
+                self,
+                name,
+                {
+                    mapping[i]: pos
+                    for i, pos in old.items()
+                    if i < size and mapping[i] >= 0
+                },
+            )
+
+    def move(self, index, x, y):
+        if index in self.pending:
+            self.dropped += 1
+        self.pending[index] = (int(x), int(y))
+
+    def flush(self):
+        """写入本帧的全部移动，返回实际写入的数量。"""
+        start = time.perf_counter()
+        writes = []
+        for index, pos in self.pending.items():
+            if self.current.get(index) == pos:
+                self.dropped += 1
+            else:
+                writes.append((index, pos))
+        self.pending.clear()
+
+        timeouts = 0
+        if writes:
+            send_message = self.listview.send_message
+            if self.send_timeout is None:
+                send = send_message
+            else:
+                timeout = self.send_timeout
+                send_message_timeout = self.listview.send_message_timeout
+
+                def send(msg, wparam, lparam):
+                    return send_message_timeout(msg, wparam, lparam, timeout)
+
+            batched = len(writes) > 1
+            if batched:
+                send(WM_SETREDRAW, 0, 0)
+            try:
+                for index, (x, y) in writes:
+                    lparam = make_lparam(x, y)
+                    if send(LVM_SETITEMPOSITION, index, lparam) is None:
+                        # 超时：位置未知，下一次 flush 再写
+                        timeouts += 1
+                        self.pending[index] = (x, y)
+                    else:
+                        self.current[index] = (x, y)
+            finally:
+                if batched:
+                    # 恢复重绘不能超时放弃，否则桌面会一直停在关闭重绘的状态
+                    send_message(WM_SETREDRAW, 1, 0)
+                    self.listview.invalidate()
+
+        elapsed = time.perf_counter() - start
+        written = len(writes) - timeouts
+        self.ticks += 1
+        self.writes += written
+        self.timeouts += timeouts
+        self.max_writes = max(self.max_writes, written)
+        self.flush_time += elapsed
+        self.max_flush_time = max(self.max_flush_time, elapsed)
+        return written
+
+    def stats(self):
+        ticks = max(1, self.ticks)
+        return {
+            "ticks": self.ticks,
+            "writes": self.writes,
+            "dropped": self.dropped,
+            "timeouts": self.timeouts,
+            "writes_per_tick": self.writes / ticks,
+            "max_writes_per_tick": self.max_writes,
+            "mean_flush_ms": self.flush_time / ticks * 1000,
+            "max_flush_ms": self.max_flush_time * 1000,
+        }
+
+
+def iter_points(positions):
+    """把 read_all_positions 的结果展开为 (index, x, y)，跳过读取失败的图标。"""
+    for i in range(len(positions) // 2):
+        x = positions[2 * i]
+        if x != MISSING:
+            yield i, x, positions[2 * i + 1]
+
+
+class SimulatedListView:
+    """内存中的 SysListView32 替身。
+
+    模拟远程内存和列表视图消息，并按 Win32 API 名称统计调用次数，
+    用于在没有 Windows 桌面的环境里测量扫描与写入的开销。
+    重绘开启时每次 LVM_SETITEMPOSITION 和每次 invalidate 都计一次重绘。
+    latency / memory_latency 为每次 SendMessage / 远程内存调用的额外耗时（秒），
+    也可以是每次调用时返回耗时的函数，用来模拟繁忙的 Explorer。
+    send_message_timeout 在耗时超过 timeout 时只等待 timeout，不处理消息并返回 None。
+    insert_item / delete_item 模拟桌面上新增或删除了文件，之后的图标索引随之移动。
+    spacing 为 LVM_GETITEMSPACING 返回的图标间距。
+    """
+
+    def __init__(
+        self,
+        positions,
+        texts=None,
+        latency=0.0,
+        memory_latency=0.0,
+        spacing=(96, 104),
+    ):
+        self.positions = [[int(x), int(y)] for x, y in positions]
+        if texts is None:
+            texts = [f"图标 {i}.lnk" for i in range(len(self.positions))]
+        self.texts = list(texts)
+        self.latency = latency
+        self.memory_latency = memory_latency
+        self.spacing = spacing
+        self.calls = Counter()
+        self.redraw = True
+        self.repaints = 0
+        self.blocks = {}  # 远程地址 -> bytearray
+        self.next_address = 0x10000
+        self.open_handles = set()
+        self.next_handle = 4
+
+    @property
+    def syscalls(self):
+        return sum(self.calls.values())
+
+    def item_count(self):
+        return self.send_message(LVM_GETITEMCOUNT, 0, 0)
+
+    def insert_item(self, index, text, x, y):
+        self.positions.insert(index, [int(x), int(y)])
+        self.texts.insert(index, text)
+
+    def delete_item(self, index):
+        del self.positions[index]
+        del self.texts[index]
+
+    def delay(self, latency):
+        """等待 latency 秒。
+
+        短于 1 ms 时忙等，因为 time.sleep 的精度不足以模拟微秒级的调用耗时；
+        更长的等待用 sleep，与真实的阻塞调用一样会释放 GIL，其他线程可以继续运行。
+        """
+        if callable(latency):
+            latency = latency()
+        if latency >= 0.001:
+            time.sleep(latency)
+        elif latency > 0:
+            deadline = time.perf_counter() + latency
+            while time.perf_counter() < deadline:
+                pass
+
+    def send_message(self, msg, wparam, lparam):
+        self.calls["SendMessage"] += 1
+        if self.latency:
+            self.delay(self.latency)
+        return self.dispatch(msg, wparam, lparam)
+
+    def send_message_timeout(self, msg, wparam, lparam, timeout):
+        self.calls["SendMessageTimeout"] += 1
+        latency = self.latency() if callable(self.latency) else self.latency
+        if latency > timeout:
+            self.delay(timeout)
+            return None
+        self.delay(latency)
+        return self.dispatch(msg, wparam, lparam)
+
+    def dispatch(self, msg, wparam, lparam):
+        if msg == LVM_GETITEMCOUNT:
+            return len(self.positions)
+        if msg == LVM_GETITEMPOSITION:
+            if not 0 <= wparam < len(self.positions):
+                return 0
+            block, offset = self.locate(lparam, POINT_SIZE)
+            x, y = self.positions[wparam]
+            struct.pack_into("<ii", block, offset, x, y)
+            return 1
+        if msg == LVM_SETITEMPOSITION:
+            if not 0 <= wparam < len(self.positions):
+                return 0
+            x = lparam & 0xFFFF
+            y = (lparam >> 16) & 0xFFFF
+            self.positions[wparam] = [x, y]
+            if self.redraw:
+                self.repaints += 1
+            return 1
+        if msg == LVM_GETITEMTEXTW:
+            if not 0 <= wparam < len(self.positions):
+                return 0
+            block, offset = self.locate(lparam, LVITEM_SIZE)
+            item = LVITEMW.from_buffer_copy(block, offset)
+            text = self.texts[wparam][: item.cchTextMax - 1]
+            data = text.encode("utf-16-le") + b"\0\0"
+            block, offset = self.locate(item.pszText, len(data))
+            block[offset : offset + len(data)] = data
+            return len(text)
+        if msg == LVM_GETITEMSPACING:
+            return make_lparam(*self.spacing)
+        if msg == WM_SETREDRAW:
+            self.redraw = bool(wparam)
+            return 0
+        return 0
+
+    def invalidate(self):
+        self.calls["InvalidateRect"] += 1
+        self.repaints += 1
+
+    def open_process(self):
+        self.calls["OpenProcess"] += 1
+        if self.memory_latency:
+            self.delay(self.memory_latency)
+        handle = self.next_handle
+        self.next_handle += 4
+        self.open_handles.add(handle)
+        return handle
+
+    def alloc(self, h_process, size):
+        self.calls["VirtualAllocEx"] += 1
+        if self.memory_latency:
+            self.delay(self.memory_latency)
+        address = self.next_address
+        # 按页对齐分配，与真实的 VirtualAllocEx 一致
+        self.next_address += (size + 0xFFFF) & ~0xFFFF
+        self.blocks[address] = bytearray(size)
+        return address
+
+    def read(self, h_process, address, size):
+        self.calls["ReadProcessMemory"] += 1
+        if self.memory_latency:
+            self.delay(self.memory_latency)
+        block, offset = self.locate(address, size)
+        return bytes(block[offset : offset + size])
+
+    def write(self, h_process, address, data):
+        self.calls["WriteProcessMemory"] += 1
+        if self.memory_latency:
+            self.delay(self.memory_latency)
+        block, offset = self.locate(address, len(data))
+        block[offset : offset + len(data)] = data
+
+    def free(self, h_process, address):
+        self.calls["VirtualFreeEx"] += 1
+        if self.memory_latency:
+            self.delay(self.memory_latency)
+        del self.blocks[address]
+
+    def close(self, h_process):
+        self.calls["CloseHandle"] += 1
+        self.open_handles.discard(h_process)
+
+    def locate(self, address, size):
+        """找到包含 [address, address + size) 的远程内存块。"""
+        for base, block in self.blocks.items():
+            if base <= address and address + size <= base + len(block):
+                return block, address - base
+        raise OSError(f"访问了未分配的远程地址 {address:#x}")
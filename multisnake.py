@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+"""多条蛇共用一个棋盘的规则引擎（本地多人和自动驾驶对手）。
+
+所有蛇共用同一个 Board 和食物池：场上同时有若干个食物，任何一条蛇都可以吃，
+吃掉一个就从边界取一个图标补上。每帧先算出所有活着的蛇的目标格子，
+再按本帧开始时的棋盘统一判定，所以结果与蛇的先后顺序无关：
+    出界、撞到边界图标、撞到任何蛇身（包括还没让开的尾巴，与单蛇规则一致）的蛇死亡；
+    两个以上的蛇头进入同一个格子时一起死亡。
+死亡的蛇身留在原地成为障碍。多条蛇时剩下不到两条就结束，最后活着的一条获胜。
+
+每个格子记录占用它的蛇（owner），判定撞到自己还是别人只要查一次表，
+每帧的开销只和蛇的数量成正比，与蛇身长度无关。
+"""
+import random
+from array import array
+from collections import deque
+
+from board import BORDER, FOOD, SNAKE, Board
+from engine import (
+    BOARD_FULL,
+    GAME_OVER_MESSAGES,
+    BORDER_HIT,
+    DOWN,
+    INITIAL_SNAKE_LEN,
+    LEFT,
+    MIN_FOOD_X,
+    RIGHT,
+    SELF,
+    UP,
+    WALL,
+    WON,
+    SnakeBody,
+    tick_interval,
+)
+
+# 多蛇模式特有的死亡和结束原因
+OTHER = "other"
+HEAD_ON = "head_on"
+LAST_ALIVE = "last_alive"
+ALL_DEAD = "all_dead"
+
+DEATH_MESSAGES = {
+    WALL: "撞到墙了",
+    SELF: "撞到自己了",
+    BORDER_HIT: "撞到边界图标了",
+    OTHER: "撞到别的蛇了",
+    HEAD_ON: "和别的蛇迎面相撞",
+}
+MULTI_GAME_OVER_MESSAGES = {
+    **GAME_OVER_MESSAGES,
+    LAST_ALIVE: "游戏结束：只剩最后一条蛇！",
+    ALL_DEAD: "游戏结束：所有的蛇同归于尽！",
+}
+
+
+class MultiEvents:
+    """一帧的结果。
+
+    cell_moves 为 (图标编号, 格子编号) 列表，所有蛇的移动合在一起，作为一帧写入；
+    ate 为本帧吃到食物的蛇，deaths 为本帧死亡的 (蛇, 原因)。
+    """
+
+    __slots__ = ("cell_moves", "ate", "deaths", "game_over", "winner")
+
+    def __init__(self):
+        self.cell_moves = []
+        self.ate = []
+        self.deaths = []
+        self.game_over = None
+        self.winner = None
+
+    @property
+    def won(self):
+        return self.game_over in (WON, BOARD_FULL)
+
+
+class MultiSnakeEngine:
+    """snakes 条蛇共用一个棋盘的状态机。
+
+    icons 的前 snakes * INITIAL_SNAKE_LEN 个图标依次组成各条蛇，其余的与单蛇模式一样排成右侧边界。
+    蛇从左侧不同的行出发向右，场上同时有 foods 个食物（默认与蛇的数量相同）。
+    """
+
+    def __init__(self, cols, rows, icons, seed=None, snakes=2, foods=None):
+        icons = list(icons)
+        if foods is None:
+            foods = snakes
+        if len(icons) < snakes * INITIAL_SNAKE_LEN + foods + 1:
+            raise ValueError("没有足够的图标来开始多蛇游戏。")
+        if rows < snakes:
+            raise ValueError("行数少于蛇的数量。")
+        self.cols = cols
+        self.rows = rows
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.board = Board(cols, rows)
+        self.snakes = snakes
+        self.ticks = 0
+        self.game_over = None
+        self.winner = None
+        self.overflow = 0
+        size = cols * rows
+        self.steps = {
+            (dx, dy): array(
+                "i",
+                (
+                    (y + dy) * cols + x + dx
+                    if 0 <= x + dx < cols and 0 <= y + dy < rows
+                    else -1
+                    for y in range(rows)
+                    for x in range(cols)
+                ),
+            )
+            for dx, dy in (UP, DOWN, LEFT, RIGHT)
+        }
+        self.owner = array("h", [-1]) * size  # 每个蛇身格子属于哪条蛇
+
+        self.bodies = [SnakeBody(size) for _ in range(snakes)]
+        self.directions = [RIGHT] * snakes
+        self.dead = [None] * snakes  # 每条蛇的死亡原因，活着为 None
+        self.alive = snakes
+        self.waiting_icons = deque(icons[snakes * INITIAL_SNAKE_LEN :])
+        self.foods = {}  # 食物格子 -> 图标编号
+        self.setup_moves = []
+
+        # 右侧边界
+        current_col, current_row = cols - 1, 0
+        for i, icon_idx in enumerate(reversed(self.waiting_icons)):
+            if current_col < 0:
+                self.overflow = len(self.waiting_icons) - i
+                break
+            self.board.push_border(current_col, current_row)
+            self.setup_moves.append((icon_idx, current_col, current_row))
+            current_row += 1
+            if current_row >= rows:
+                current_row = 0
+                current_col -= 1
+
+        # 各条蛇，蛇头在 (INITIAL_SNAKE_LEN - 1, y)
+        for k in range(snakes):
+            y = k * rows // snakes
+            first = k * INITIAL_SNAKE_LEN
+            for i in reversed(range(INITIAL_SNAKE_LEN)):
+                cell = y * cols + INITIAL_SNAKE_LEN - 1 - i
+                self.occupy(k, cell, icons[first + i])
+            for cell, icon_idx in self.bodies[k].segments():
+                self.setup_moves.append((icon_idx, *self.board.position(cell)))
+
+        # 食物
+        food_icons = [self.waiting_icons.popleft() for _ in range(foods)]
+        for _ in food_icons:
+            self.board.pop_border()
+        if self.board.update_food_zone() < MIN_FOOD_X:
+            raise ValueError("游戏区域太窄，无法安全放置食物。")
+        for icon_idx in food_icons:
+            cell = self.board.place_food_cell(self.rng)
+            self.foods[cell] = icon_idx
+            self.setup_moves.append((icon_idx, *self.board.position(cell)))
+
+    def occupy(self, k, cell, icon_idx):
+        self.board.occupy_cell(cell, SNAKE)
+        self.owner[cell] = k
+        self.bodies[k].push_head(cell, icon_idx)
+
+    def length(self, k):
+        return self.bodies[k].length
+
+    def tick_interval(self):
+        """按最长的一条活着的蛇计算节奏。"""
+        return tick_interval(
+            max(
+                (body.length for body, dead in zip(self.bodies, self.dead) if not dead),
+                default=INITIAL_SNAKE_LEN,
+            )
+        )
+
+    def step(self, actions):
+        """推进一帧。actions[k] 为第 k 条蛇的新方向，None 表示保持；180 度掉头会被忽略。"""
+        events = MultiEvents()
+        if self.game_over:
+            events.game_over = self.game_over
+            events.winner = self.winner
+            return events
+        self.ticks += 1
+        cells = self.board.cells
+        owner = self.owner
+        steps = self.steps
+
+        # 按本帧开始时的棋盘判定每条蛇的目标格子
+        targets = {}  # 目标格子 -> 蛇
+        for k in range(self.snakes):
+            if self.dead[k]:
+                continue
+            direction = self.directions[k]
+            action = actions[k]
+            if action and (action[0] != -direction[0] or action[1] != -direction[1]):
+                direction = self.directions[k] = action
+            cell = steps[direction][self.bodies[k].head_cell()]
+            if cell < 0:
+                events.deaths.append((k, WALL))
+            elif cells[cell] == SNAKE:
+                events.deaths.append((k, SELF if owner[cell] == k else OTHER))
+            elif cells[cell] == BORDER:
+                events.deaths.append((k, BORDER_HIT))
+            elif cell in targets:
+                other = targets[cell]
+                if other >= 0:
+                    events.deaths.append((other, HEAD_ON))
+                    targets[cell] = -1
+                events.deaths.append((k, HEAD_ON))
+            else:
+                targets[cell] = k
+
+        for k, reason in events.deaths:
+            self.dead[k] = reason
+            self.alive -= 1
+
+        # 移动活下来的蛇，它们的目标格子互不相同
+        for cell, k in targets.items():
+            if k < 0:
+                continue
+            body = self.bodies[k]
+            if cells[cell] == FOOD:
+                self.occupy(k, cell, self.foods.pop(cell))
+                events.ate.append(k)
+            else:
+                tail = body.tail_slot()
+                tail_icon_index = body.icons[tail]
+                tail_cell = body.cells[tail]
+                self.board.release_cell(tail_cell)
+                owner[tail_cell] = -1
+                body.pop_tail()
+                self.occupy(k, cell, tail_icon_index)
+                events.cell_moves.append((tail_icon_index, cell))
+
+        for _ in events.ate:
+            self.respawn_food(events)
+        self.check_game_over(events)
+        return events
+
+    def respawn_food(self, events):
+        """从边界取一个图标补充食物，没有图标或没有空位时不补（图标留在边界上）。"""
+        if not self.waiting_icons:
+            return
+        board = self.board
+        border = board.pop_border()
+        board.update_food_zone()
+        cell = board.place_food_cell(self.rng)
+        if cell < 0:
+            if border is not None:
+                board.push_border(*border)
+            return
+        icon_idx = self.waiting_icons.popleft()
+        self.foods[cell] = icon_idx
+        events.cell_moves.append((icon_idx, cell))
+
+    def check_game_over(self, events):
+        if not self.foods:
+            reason = WON if not self.waiting_icons else BOARD_FULL
+        elif self.snakes == 1 and self.alive == 0:
+            reason = self.dead[0]
+        elif self.snakes > 1 and self.alive <= 1:
+            reason = LAST_ALIVE if self.alive else ALL_DEAD
+        else:
+            return
+        if self.alive == 1:
+            self.winner = self.dead.index(None)
+        self.game_over = events.game_over = reason
+        events.winner = self.winner
+
+    def snake_view(self, k):
+        return SnakeView(self, k)
+
+
+class SnakeView:
+    """把 MultiSnakeEngine 中的第 k 条蛇包装成 Autopilot 需要的单蛇接口。
+
+    食物取离蛇头最近的一个，被吃掉之前保持不变，避免自动驾驶的距离场来回重建。
+    """
+
+    def __init__(self, engine, k):
+        self.engine = engine
+        self.k = k
+        self.cols = engine.cols
+        self.rows = engine.rows
+        self.steps = engine.steps
+        self.board = engine.board
+        self.body = engine.bodies[k]
+        self.target = -1
+        self.target_pos = None
+
+    @property
+    def direction(self):
+        return self.engine.directions[self.k]
+
+    @property
+    def length(self):
+        return self.body.length
+
+    @property
+    def game_over(self):
+        return self.engine.dead[self.k] or self.engine.game_over
+
+    @property
+    def food_grid_pos(self):
+        foods = self.engine.foods
+        if self.target not in foods:
+            if not foods:
+                self.target, self.target_pos = -1, None
+                return None
+            cols = self.cols
+            head_y, head_x = divmod(self.body.head_cell(), cols)
+            self.target = min(
+                foods,
+                key=lambda cell: abs(cell % cols - head_x) + abs(cell // cols - head_y),
+            )
+            self.target_pos = self.board.position(self.target)
+        return self.target_pos
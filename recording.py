@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""对局的录制与回放。
+
+引擎的随机数来自种子，每帧的结果只取决于这一帧的输入，
+所以只要记下种子、网格参数、图标编号和“哪一帧换了方向”，就能把一局完整地重放出来。
+Recorder 在游戏进行中边玩边写（带缓冲的顺序写，没有换向的帧什么也不写），
+每隔 hash_interval 帧再写一次局面摘要；replay 在无头模式下全速重放，
+或者按原来的节奏写到某个后端上，并逐个核对摘要，找出第一帧对不上的位置。
+
+文件格式（小端）：
+    头部    magic(4s) version(H) hash_interval(H) seed(Q)
+            size_x(i) size_y(i) origin_x(i) origin_y(i) cols(i) rows(i) icon_count(I)
+            icon(i) * icon_count
+    记录    tag(B) tick(I) 之后按 tag：
+            INPUT  direction(B)，DIRECTIONS 中的下标
+            HASH   state_hash(Q)
+            END    结束原因(B)，GAME_OVER_CODES 中的下标
+"""
+import struct
+from array import array
+
+from engine import (
+    BOARD_FULL,
+    BORDER_HIT,
+    DOWN,
+    LEFT,
+    RIGHT,
+    SELF,
+    UP,
+    WALL,
+    WON,
+    SnakeEngine,
+    grid_to_pixel,
+    pixel_table,
+)
+from scheduler import TickScheduler
+
+MAGIC = b"DSNR"
+VERSION = 1
+HEADER = struct.Struct("<4sHHQ6iI")
+TAG = struct.Struct("<BI")
+INPUT, HASH, END = 1, 2, 3
+PAYLOADS = {
+    INPUT: struct.Struct("<B"),
+    HASH: struct.Struct("<Q"),
+    END: struct.Struct("<B"),
+}
+
+DIRECTIONS = (UP, DOWN, LEFT, RIGHT)
+DIRECTION_CODES = {direction: code for code, direction in enumerate(DIRECTIONS)}
+GAME_OVER_CODES = (None, WALL, SELF, BORDER_HIT, WON, BOARD_FULL)
+GRID_FIELDS = ("size_x", "size_y", "origin_x", "origin_y", "cols", "rows")
+
+DEFAULT_HASH_INTERVAL = 64
+
+
+class Recorder:
+    """边玩边写录像。每调用一次 engine.step(action) 之后调用一次 record(engine, action)。"""
+
+    def __init__(
+        self, path, seed, grid_info, icons, hash_interval=DEFAULT_HASH_INTERVAL
+    ):
+        icons = array("i", icons)
+        self.file = open(path, "wb")
+        self.hash_interval = hash_interval
+        self.closed = False
+        self.file.write(
+            HEADER.pack(
+                MAGIC,
+                VERSION,
+                hash_interval,
+                seed,
+                *(grid_info[field] for field in GRID_FIELDS),
+                len(icons),
+            )
+        )
+        self.file.write(icons.tobytes())
+
+    def write(self, tag, tick, value):
+        self.file.write(TAG.pack(tag, tick) + PAYLOADS[tag].pack(value))
+
+    def record(self, engine, action):
+        if self.closed:
+            return
+        tick = engine.ticks
+        if action is not None:
+            self.write(INPUT, tick, DIRECTION_CODES[action])
+        if tick % self.hash_interval == 0:
+            self.write(HASH, tick, engine.state_hash())
+        if engine.game_over:
+            self.close(engine)
+
+    def close(self, engine=None):
+        """写入结束记录并关闭文件；engine 为 None 时（例如启动失败）只关闭文件。"""
+        if self.closed:
+            return
+        self.closed = True
+        if engine is not None:
+            if engine.ticks % self.hash_interval:
+                self.write(HASH, engine.ticks, engine.state_hash())
+            self.write(END, engine.ticks, GAME_OVER_CODES.index(engine.game_over))
+        self.file.close()
+
+
+class Recording:
+    """读入内存的录像。inputs 为 {帧号: 方向}，hashes 为 {帧号: 摘要}。"""
+
+    def __init__(self, seed, grid_info, icons, hash_interval):
+        self.seed = seed
+        self.grid_info = grid_info
+        self.icons = icons
+        self.hash_interval = hash_interval
+        self.inputs = {}
+        self.hashes = {}
+        self.end_tick = None  # 没有结束记录说明录制时程序异常退出
+        self.game_over = None
+
+    def engine(self):
+        return SnakeEngine(
+            self.grid_info["cols"], self.grid_info["rows"], self.icons, self.seed
+        )
+
+
+def load_recording(path):
+    """读取录像文件，格式不对时抛出 ValueError。末尾被截断的记录直接忽略。"""
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < HEADER.size:
+        raise ValueError(f"录像文件已损坏: {path}")
+    magic, version, hash_interval, seed, *grid, icon_count = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"无法识别的录像文件: {path}")
+    offset = HEADER.size + icon_count * 4
+    if len(data) < offset:
+        raise ValueError(f"录像文件不完整: {path}")
+    icons = array("i", data[HEADER.size : offset])
+    recording = Recording(seed, dict(zip(GRID_FIELDS, grid)), icons, hash_interval)
+
+    while offset + TAG.size <= len(data):
+        tag, tick = TAG.unpack_from(data, offset)
+        payload = PAYLOADS.get(tag)
+        if payload is None:
+            raise ValueError(f"录像文件已损坏: {path}")
+        if offset + TAG.size + payload.size > len(data):
+            break
+        (value,) = payload.unpack_from(data, offset + TAG.size)
+        offset += TAG.size + payload.size
+        if tag == INPUT:
+            recording.inputs[tick] = DIRECTIONS[value]
+        elif tag == HASH:
+            recording.hashes[tick] = value
+        else:
+            recording.end_tick = tick
+            recording.game_over = GAME_OVER_CODES[value]
+    return recording
+
+
+def replay(recording, backend=None, realtime=False, scheduler=None):
+    """重放一局，返回统计 dict。
+
+    backend 为 None 时只运行引擎；否则先布置场地，再把每帧的移动写到 backend。
+    realtime 为 True 时按游戏原来的节奏推进，否则全速运行。
+    diverged_at 为第一个摘要对不上的帧号（此时立即停止），全部一致时为 None；
+    matches 表示摘要、结束帧和结束原因都与录像一致。
+    """
+    engine = recording.engine()
+    grid_info = recording.grid_info
+    if backend is not None:
+        backend.write_positions(
+            (icon_idx, *grid_to_pixel(grid_x, grid_y, grid_info))
+            for icon_idx, grid_x, grid_y in engine.setup_moves
+        )
+        pixel_xs, pixel_ys = pixel_table(grid_info)
+    if realtime:
+        scheduler = scheduler or TickScheduler()
+        scheduler.start(engine.tick_interval())
+
+    last_tick = recording.end_tick
+    if last_tick is None:
+        last_tick = max((*recording.inputs, *recording.hashes), default=0)
+    inputs = recording.inputs
+    hashes = recording.hashes
+    checked = 0
+    diverged_at = None
+    while engine.ticks < last_tick and not engine.game_over:
+        if realtime:
+            scheduler.wait(engine.tick_interval())
+        engine.advance(inputs.get(engine.ticks + 1))
+        if backend is not None and engine.moved_icon >= 0:
+            cell = engine.moved_cell
+            backend.write_positions(
+                ((engine.moved_icon, pixel_xs[cell], pixel_ys[cell]),)
+            )
+        expected = hashes.get(engine.ticks)
+        if expected is not None:
+            checked += 1
+            if engine.state_hash() != expected:
+                diverged_at = engine.ticks
+                break
+
+    matches = diverged_at is None and (
+        recording.end_tick is None
+        or (engine.ticks, engine.game_over) == (recording.end_tick, recording.game_over)
+    )
+    return {
+        "ticks": engine.ticks,
+        "hash_checks": checked,
+        "diverged_at": diverged_at,
+        "game_over": engine.game_over,
+        "expected_game_over": recording.game_over,
+        "matches": matches,
+    }
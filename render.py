@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""把写桌面从游戏线程挪到后台的渲染线程。
+
+SendMessage 是同步调用，Explorer 忙的时候（重绘、建索引、桌面上新增了文件）会卡住调用方。
+RenderThread 让游戏线程只把每帧的目标位置发布到一个“最新值优先”的槽里就返回：
+渲染线程每次把槽里攒下的全部目标位置一次取走写入桌面，
+写入期间发布的帧会合并进同一个槽，同一图标被后来的帧覆盖的旧位置不再写入。
+所以 Explorer 再慢，游戏节奏也不受影响，只是画面会跳过一些中间帧。
+给了 tracker（identity.IconTracker）时，渲染线程在写入前检查桌面图标的索引有没有变化，
+并把游戏里的开局编号换成当前索引。
+"""
+import threading
+import time
+
+
+class RenderThread:
+    """后台写入 backend 的渲染线程。start() 之后用 publish() 发布帧，stop() 写完剩余的帧后退出。"""
+
+    def __init__(self, backend, tracker=None):
+        self.backend = backend
+        self.tracker = tracker
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="render", daemon=True)
+        self.stopping = False
+        self.error = None  # 渲染线程中发生的异常，stop() 时重新抛出
+
+        # 槽：尚未写入的目标位置，以及其中最早一帧的发布时间
+        self.pending = {}
+        self.pending_frames = 0
+        self.oldest = 0.0
+
+        self.published = 0  # 发布的帧数
+        self.rendered = 0  # 实际写入的批次数
+        self.stale = 0  # 还没写入就被后来的帧合并掉的帧数
+        self.superseded = 0  # 被后来的帧覆盖、不再写入的图标位置数
+        self.writes = 0
+        self.lag_total = 0.0  # 从发布到写完的延迟
+        self.max_lag = 0.0
+
+    def start(self):
+        self.thread.start()
+
+    def publish(self, moves):
+        """发布一帧，moves 为 (图标编号, 像素 x, 像素 y)。不会阻塞在桌面写入上。"""
+        with self.lock:
+            pending = self.pending
+            if not self.pending_frames:
+                self.oldest = time.perf_counter()
+            for index, x, y in moves:
+                if index in pending:
+                    self.superseded += 1
+                pending[index] = (x, y)
+            self.pending_frames += 1
+            self.published += 1
+        self.wake.set()
+
+    def run(self):
+        while True:
+            self.wake.wait()
+            with self.lock:
+                self.wake.clear()
+                pending, self.pending = self.pending, {}
+                frames, self.pending_frames = self.pending_frames, 0
+                oldest = self.oldest
+                stopping = self.stopping
+            if frames:
+                try:
+                    moves = ((index, x, y) for index, (x, y) in pending.items())
+                    if self.tracker is not None:
+                        self.tracker.poll()
+                        moves = self.tracker.translate(moves)
+                    self.writes += self.backend.write_positions(moves)
+                except Exception as e:  # 记下来交给 stop()，渲染线程本身不能退出
+                    self.error = e
+                lag = time.perf_counter() - oldest
+                self.rendered += 1
+                self.stale += frames - 1
+                self.lag_total += lag
+                self.max_lag = max(self.max_lag, lag)
+            if stopping:
+                break
+
+    def stop(self, timeout=None):
+        """写完已发布的帧后停止渲染线程。"""
+        with self.lock:
+            self.stopping = True
+        self.wake.set()
+        if self.thread.is_alive():
+            self.thread.join(timeout)
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def stats(self):
+        rendered = max(1, self.rendered)
+        return {
+            "published": self.published,
+            "rendered": self.rendered,
+            "stale": self.stale,
+            "superseded": self.superseded,
+            "writes": self.writes,
+            "mean_lag_ms": self.lag_total / rendered * 1000,
+            "max_lag_ms": self.max_lag * 1000,
+        }
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""基于单调时钟的固定步长调度器。
+
+TickScheduler 直接睡到下一帧的截止时间，而不是每 10 ms 醒来检查一次；
+下一个截止时间在上一个的基础上累加，所以偶尔的超时不会让节奏整体后移。
+落后太多时跳过来不及的帧并重新对齐。时钟和 sleep 可以注入，测试时用 FakeClock。
+"""
+import math
+import time
+from collections import deque
+
+DEFAULT_MAX_CATCH_UP = 2
+
+
+class TickScheduler:
+    """固定步长调度器。
+
+    wait(interval) 阻塞到下一帧，返回本次应推进的帧数：正常为 1，
+    调用方落后时最多返回 max_catch_up，更多的帧直接丢弃并计入 skipped。
+    """
+
+    def __init__(self, clock=time.monotonic, sleep=time.sleep, max_catch_up=DEFAULT_MAX_CATCH_UP, history=1000):
+        self.clock = clock
+        self.sleep = sleep
+        self.max_catch_up = max_catch_up
+        self.deadline = None
+        self.ticks = 0
+        self.skipped = 0
+        self.lateness = deque(maxlen=history)  # 最近每帧的迟到时间（秒）
+        self.max_lateness = 0.0
+
+    def start(self, interval):
+        """从现在开始计时，第一帧在 interval 之后。"""
+        self.deadline = self.clock() + interval
+
+    def wait(self, interval):
+        """睡到下一帧的截止时间。"""
+        if self.deadline is None:
+            self.start(interval)
+        while True:
+            remaining = self.deadline - self.clock()
+            if remaining <= 0:
+                break
+            self.sleep(remaining)
+
+        now = self.clock()
+        late = now - self.deadline
+        self.lateness.append(late)
+        self.max_lateness = max(self.max_lateness, late)
+
+        # 已经错过的后续截止时间
+        behind = int(late // interval) if interval > 0 else 0
+        due = 1 + min(behind, self.max_catch_up - 1)
+        self.skipped += behind + 1 - due
+        self.deadline += (behind + 1) * interval
+        self.ticks += due
+        return due
+
+    def stats(self):
+        samples = list(self.lateness)
+        count = max(1, len(samples))
+        mean = sum(samples) / count
+        jitter = math.sqrt(sum((s - mean) ** 2 for s in samples) / count)
+        ordered = sorted(samples)
+        p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] if ordered else 0.0
+        return {
+            "ticks": self.ticks,
+            "skipped": self.skipped,
+            "mean_late_ms": mean * 1000,
+            "p99_late_ms": p99 * 1000,
+            "max_late_ms": self.max_lateness * 1000,
+            "jitter_ms": jitter * 1000,
+        }
+
+
+class FakeClock:
+    """可注入 TickScheduler 的假时钟：sleep 只推进时间，不真的等待。
+
+    oversleep 模拟操作系统唤醒延迟，work(seconds) 模拟一帧内的处理耗时。
+    """
+
+    def __init__(self, start=0.0, oversleep=0.0):
+        self.now = start
+        self.oversleep = oversleep
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(0.0, seconds) + self.oversleep
+
+    def work(self, seconds):
+        self.now += seconds
@@ -1,83 +1,39 @@
 # -*- coding: utf-8 -*-
-import win32gui
-import win32con
-import win32api
-import win32process
-import commctrl
-import ctypes
-from ctypes import wintypes # 导入ctypes中的Windows类型定义
 import time
+
+START_TIME = time.perf_counter()  # 用于统计从启动到第一帧的耗时
+
+import argparse
+import contextlib
+import ctypes
+import io
 import random
-import keyboard  
-from collections import deque  # 引入双端队列
-from colorama import init as colorama_init # 引入 colorama
+import sys
 
+from colors import Colors
+from latency_profile import DEFAULT_PATH as LATENCY_PROFILE_PATH
+from latency_profile import load_profile as load_latency_profile
+from scheduler import DEFAULT_MAX_CATCH_UP
+from tracing import instrument_backend, tracer
 
-# --- 颜色定义 ---
-class Colors:
-    HEADER = "\033[95m"
-    OKBLUE = "\033[94m"
-    OKCYAN = "\033[96m"
-    OKGREEN = "\033[92m"
-    WARNING = "\033[93m"
-    FAIL = "\033[91m"
-    ENDC = "\033[0m"
-    BOLD = "\033[1m"
-    UNDERLINE = "\033[4m"
+# Win32 相关模块（pywin32、keyboard、colorama）只在真正操作桌面时才导入，
+# 所以 --help 和 --headless 不需要加载它们，也不需要 Windows。
+# 游戏、网格计算（NumPy）、自动驾驶、录像和观战服务器也在用到的地方才导入，
+# --help 只加载上面这几个轻量的模块。
 
 
 # --- 全局变量 ---
-# 定义桌面窗口的类名
-PROGMAN = "Progman"
-SHELLDLL_DEFVIEW = "SHELLDLL_DefView"
-SYS_LIST_VIEW32 = "SysListView32"
-
 # 游戏状态
 game_running = True
-initial_positions = {}  # 存储图标的初始位置
-
-# --- Win32/ctypes 定义 ---
-kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
-
-kernel32.VirtualAllocEx.restype = wintypes.LPVOID
-kernel32.VirtualAllocEx.argtypes = (
-    wintypes.HANDLE,
-    wintypes.LPVOID,
-    ctypes.c_size_t,
-    wintypes.DWORD,
-    wintypes.DWORD,
-)
-kernel32.VirtualFreeEx.argtypes = (
-    wintypes.HANDLE,
-    wintypes.LPVOID,
-    ctypes.c_size_t,
-    wintypes.DWORD,
-)
-kernel32.ReadProcessMemory.argtypes = (
-    wintypes.HANDLE,
-    wintypes.LPCVOID,
-    wintypes.LPVOID,
-    ctypes.c_size_t,
-    ctypes.POINTER(ctypes.c_size_t),
-)
-kernel32.OpenProcess.restype = wintypes.HANDLE
-kernel32.OpenProcess.argtypes = (wintypes.DWORD, wintypes.BOOL, wintypes.DWORD)
-kernel32.CloseHandle.argtypes = (wintypes.HANDLE,)
-kernel32.GetConsoleWindow = ctypes.windll.kernel32.GetConsoleWindow
-kernel32.GetConsoleWindow.restype = wintypes.HWND
-kernel32.GetConsoleWindow.argtypes = []
-
-
-class POINT(ctypes.Structure):
-    _fields_ = [("x", wintypes.LONG), ("y", wintypes.LONG)]
+initial_positions = []  # 存储图标的初始位置 (index, identity, x, y)
 
 
 # --- 核心函数 ---
 def find_desktop_listview_handle():
     try:
-        h_progman = win32gui.FindWindow(PROGMAN, None)
-        h_shelldll = win32gui.FindWindowEx(h_progman, 0, SHELLDLL_DEFVIEW, None)
-        h_listview = win32gui.FindWindowEx(h_shelldll, 0, SYS_LIST_VIEW32, None)
+        from win32_desktop import find_desktop_listview
+
+        h_listview = find_desktop_listview()
         if not h_listview:
             print(f"{Colors.FAIL}错误: 找不到'SysListView32'窗口。{Colors.ENDC}")
             return None
@@ -88,183 +44,102 @@ def find_desktop_listview_handle():
         return None
 
 
-def get_icon_count(h_listview):
-    if not h_listview:
-        return 0
-    return win32gui.SendMessage(h_listview, commctrl.LVM_GETITEMCOUNT, 0, 0)
-
-
-def get_icon_position(h_listview, index):
-    if not h_listview:
-        return None, None
-    tid, pid = win32process.GetWindowThreadProcessId(h_listview)
-    h_process = kernel32.OpenProcess(
-        win32con.PROCESS_VM_OPERATION
-        | win32con.PROCESS_VM_READ
-        | win32con.PROCESS_VM_WRITE,
-        False,
-        pid,
-    )
-    if not h_process:
-        return None, None
-    p_remote_buffer = None
-    try:
-        p_remote_buffer = kernel32.VirtualAllocEx(
-            h_process,
-            0,
-            ctypes.sizeof(POINT),
-            win32con.MEM_COMMIT | win32con.MEM_RESERVE,
-            win32con.PAGE_READWRITE,
-        )
-        if not p_remote_buffer:
-            return None, None
-        result = win32gui.SendMessage(
-            h_listview, commctrl.LVM_GETITEMPOSITION, index, p_remote_buffer
-        )
-        if result == 0:
-            return None, None
-        local_point = POINT()
-        bytes_read = ctypes.c_size_t(0)
-        kernel32.ReadProcessMemory(
-            h_process,
-            p_remote_buffer,
-            ctypes.byref(local_point),
-            ctypes.sizeof(local_point),
-            ctypes.byref(bytes_read),
-        )
-        return local_point.x, local_point.y
-    finally:
-        if p_remote_buffer:
-            kernel32.VirtualFreeEx(h_process, p_remote_buffer, 0, win32con.MEM_RELEASE)
-        if h_process:
-            kernel32.CloseHandle(h_process)
-
-
-def set_icon_position(h_listview, index, x, y):
-    if not h_listview:
-        return
-    lparam = win32api.MAKELONG(int(x), int(y))
-    win32gui.SendMessage(h_listview, commctrl.LVM_SETITEMPOSITION, index, lparam)
-
-
 # --- 游戏逻辑函数 ---
 
 
-def save_initial_positions(h_listview, icon_count):
+def save_initial_positions(positions, identities, snapshot_path):
+    """保存初始位置并写入快照文件，必须在第一次移动图标之前调用。
+
+    snapshot_path 为 None 时（无头模式）只保存在内存里。
+    """
     global initial_positions
+    from listview import iter_points
+    from snapshot import save_snapshot
+
     # print(f"{Colors.OKCYAN}正在保存图标初始位置...{Colors.ENDC}")
-    initial_positions = {}
-    for i in range(icon_count):
-        pos = get_icon_position(h_listview, i)
-        if pos and pos[0] is not None:
-            initial_positions[i] = pos
+    initial_positions = [(i, identities[i], x, y) for i, x, y in iter_points(positions)]
+    if snapshot_path:
+        save_snapshot(initial_positions, snapshot_path)
     # print(f"{Colors.OKGREEN}初始位置保存完毕。{Colors.ENDC}")
 
 
-def restore_initial_positions(h_listview):
-    global initial_positions
+def restore_initial_positions(backend, snapshot_path):
     if not initial_positions:
         return
+    from snapshot import remove_snapshot, restore_snapshot, verify_snapshot
+
     # print(f"{Colors.OKCYAN}正在恢复图标初始位置...{Colors.ENDC}")
-    for index, (x, y) in initial_positions.items():
-        set_icon_position(h_listview, index, x, y)
+    start = time.perf_counter()
+    moved = restore_snapshot(backend, initial_positions)
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"{Colors.OKCYAN}恢复了 {moved} 个图标，用时 {elapsed:.1f} ms。{Colors.ENDC}")
+    # 重新读取桌面确认每个图标都回到了原位，否则保留快照，之后可以用 --restore 再试
+    misplaced = verify_snapshot(backend, initial_positions)
+    if misplaced:
+        print(
+            f"{Colors.FAIL}有 {misplaced} 个图标没能回到原位（写入超时），"
+            f"请稍后运行 snake.py --restore。{Colors.ENDC}"
+        )
+        return
+    if snapshot_path:
+        remove_snapshot(snapshot_path)
     # print(f"{Colors.OKGREEN}位置恢复完毕。{Colors.ENDC}")
 
 
-def stop_game():
-    global game_running
-    print(f"\n{Colors.WARNING}接收到停止信号，游戏即将退出...{Colors.ENDC}")
-    game_running = False
-
+def restore_from_snapshot(backend):
+    """按快照文件恢复上一局没有恢复的桌面，没有快照时返回 False。"""
+    from snapshot import (
+        load_snapshot,
+        remove_snapshot,
+        restore_snapshot,
+        verify_snapshot,
+    )
 
-def calculate_grid_parameters(h_listview):
+    try:
+        records = load_snapshot()
+    except ValueError as e:
+        print(f"{Colors.FAIL}{e}{Colors.ENDC}")
+        return False
+    if records is None:
+        return False
+    moved = restore_snapshot(backend, records)
+    misplaced = verify_snapshot(backend, records)
+    if misplaced:
+        print(f"{Colors.FAIL}有 {misplaced} 个图标没能回到原位，快照已保留。{Colors.ENDC}")
+        return True
+    remove_snapshot()
+    print(f"{Colors.OKGREEN}已按快照恢复桌面，移动了 {moved}/{len(records)} 个图标。{Colors.ENDC}")
+    return True
+
+
+def calculate_grid_parameters(positions, screen_width, screen_height):
     """根据图标在桌面上的实际位置计算网格参数。"""
-    print(f"{Colors.OKCYAN}正在扫描桌面图标以计算网格参数...{Colors.ENDC}")
-    all_icon_pos = []
-    icon_count = get_icon_count(h_listview)
-    for i in range(icon_count):
-        pos = get_icon_position(h_listview, i)
-        if pos:
-            all_icon_pos.append(pos)
-
-    if len(all_icon_pos) < 4:
-        print(f"{Colors.FAIL}错误：桌面上可识别的图标少于4个。{Colors.ENDC}")
-        return None
+    from calibrate import calibrate
 
-    sorted_by_topleft = sorted(all_icon_pos, key=lambda p: p[0] + p[1])
-    pos0 = sorted_by_topleft[0]
-    origin_x, origin_y = pos0
-
-    # left_column_icons = sorted(
-    #     [p for p in all_icon_pos if abs(p[0] - origin_x) < 20], key=lambda p: p[1]
-    # )
-    # if len(left_column_icons) < 2:
-    #     print(
-    #         f"{Colors.FAIL}错误：无法找到左下角边界图标。请确保在左上角图标的正下方放置一个图标作为边界。{Colors.ENDC}"
-    #     )
-    #     return None
-    # pos3 = left_column_icons[-1]
-
-    pos1 = None
-    pos2 = None
-    min_dx = float("inf")
-    min_dy = float("inf")
-
-    for x, y in all_icon_pos:
-        if x == origin_x and y == origin_y:
-            continue
-        dx = x - origin_x
-        dy = y - origin_y
-        if abs(dy) < 20 and 0 < dx < min_dx:
-            min_dx = dx
-            pos1 = (x, y)
-        if abs(dx) < 20 and 0 < dy < min_dy:
-            min_dy = dy
-            pos2 = (x, y)
-
-    if not pos1 or not pos2:
-        print(f"{Colors.FAIL}错误：无法自动确定网格大小。{Colors.ENDC}")
-        print(
-            f"{Colors.FAIL}请确保在左上角图标的 正右方 和 正下方 紧邻的位置有其他图标。{Colors.ENDC}"
-        )
-        return None
-
-    grid_size_x = pos1[0] - pos0[0]
-    grid_size_y = pos2[1] - pos0[1]
-
-    if grid_size_x <= 0 or grid_size_y <= 0:
-        print(f"{Colors.FAIL}错误：网格计算失败。请检查参考图标位置。{Colors.ENDC}")
+    print(f"{Colors.OKCYAN}正在根据桌面图标计算网格参数...{Colors.ENDC}")
+    try:
+        grid_info = calibrate(positions, screen_width, screen_height)
+    except ValueError as e:
+        for line in str(e).splitlines():
+            print(f"{Colors.FAIL}错误：{line}{Colors.ENDC}")
         return None
 
-    screen_width = win32api.GetSystemMetrics(win32con.SM_CXSCREEN)
-    screen_height = win32api.GetSystemMetrics(win32con.SM_CYSCREEN)
-    cols = (screen_width - origin_x) // grid_size_x
-    rows = (screen_height - origin_y) // grid_size_y
-
-    grid_info = {
-        "size_x": grid_size_x,
-        "size_y": grid_size_y,
-        "origin_x": origin_x,
-        "origin_y": origin_y,
-        "cols": cols,
-        "rows": rows,
-    }
+    grid_size_x, grid_size_y = grid_info["size_x"], grid_info["size_y"]
+    origin_x, origin_y = grid_info["origin_x"], grid_info["origin_y"]
+    cols, rows = grid_info["cols"], grid_info["rows"]
 
     print(f"{Colors.OKGREEN}网格参数计算成功:{Colors.ENDC}")
     print(f"  - 网格大小: {grid_size_x}x{grid_size_y} 像素")
     print(f"  - 游戏区域: {cols}列 x {rows}行")
     print(f"  - 起点坐标: ({origin_x}, {origin_y})")
+    if grid_info["confidence"] < 0.8:
+        print(
+            f"{Colors.WARNING}  - 置信度较低({grid_info['confidence']:.0%})，部分图标可能不在网格上。{Colors.ENDC}"
+        )
 
     return grid_info
 
 
-def grid_to_pixel(grid_x, grid_y, grid_info):
-    """将网格坐标转换为屏幕像素坐标。"""
-    pixel_x = grid_info["origin_x"] + grid_x * grid_info["size_x"]
-    pixel_y = grid_info["origin_y"] + grid_y * grid_info["size_y"]
-    return pixel_x, pixel_y
-
-
 def set_dpi_awareness():
     """设置当前进程为 DPI-aware，以便获取真实分辨率。"""
     # 例如我的 4K 显示器，如果不设置 DPI-aware，由于有默认的150%缩放，GetSystemMetrics 获得的分辨率会是 3840/1.5=2560, 2160/1.5=1440
@@ -283,25 +158,67 @@ def set_dpi_awareness():
             )
 
 
-def main():
-    """主函数。"""
-    global game_running
+def report_tracing(path):
+    """打印耗时汇总，并把 Chrome trace 写入 path。"""
+    print(f"{Colors.OKCYAN}耗时统计:{Colors.ENDC}")
+    for line in tracer.summary():
+        print(f"  {line}")
+    tracer.export_chrome(path)
+    print(f"{Colors.OKCYAN}trace 已保存到 {path}（可用 chrome://tracing 打开）。{Colors.ENDC}")
 
-    print(f"{Colors.WARNING}重要提示：此脚本需要以管理员权限运行！{Colors.ENDC}")
+
+class StartupTimer:
+    """按阶段记录从启动到第一帧的耗时，等待用户按键的时间不计入。"""
+
+    def __init__(self, start=START_TIME, clock=time.perf_counter):
+        self.clock = clock
+        self.last = start
+        self.phases = []
+
+    def mark(self, name):
+        """记录从上一个标记到现在这一阶段的耗时。"""
+        now = self.clock()
+        self.phases.append((name, now - self.last))
+        self.last = now
+
+    def skip(self):
+        """丢弃从上一个标记到现在的时间。"""
+        self.last = self.clock()
+
+    def total(self):
+        return sum(seconds for name, seconds in self.phases)
+
+
+def latency_settings(path, send_timeout_ms=None, setup_frames=None):
+    """按延迟画像（test_winapi.py 生成）补全没有指定的参数。
+
+    返回 (send_timeout_ms, setup_frames, max_catch_up)，没有画像时使用默认值。
+    """
+    max_catch_up = DEFAULT_MAX_CATCH_UP
+    profile = load_latency_profile(path) if path else None
+    if profile is not None:
+        recommended = profile["recommended"]
+        if send_timeout_ms is None:
+            send_timeout_ms = recommended.get("send_timeout_ms")
+        if setup_frames is None:
+            setup_frames = recommended.get("setup_frames")
+        max_catch_up = recommended.get("max_catch_up", max_catch_up)
+        print(
+            f"{Colors.OKCYAN}使用延迟画像 {path}（{profile['created']} 测量）: "
+            f"写入超时 {send_timeout_ms} ms, 布置场地 {setup_frames} 帧, 最多追赶 {max_catch_up} 帧{Colors.ENDC}"
+        )
+    return send_timeout_ms, setup_frames or 1, max_catch_up
+
+
+def report_startup(timer, warm):
+    kind = "热启动，使用缓存的网格" if warm else "冷启动"
+    phases = ", ".join(f"{name} {seconds * 1000:.1f} ms" for name, seconds in timer.phases)
     print(
-        f"{Colors.WARNING}请随时按 ESC 键退出并恢复桌面。如果用 Ctrl+C 强行退出，会无法恢复桌面。{Colors.ENDC}"
+        f"{Colors.OKCYAN}启动到第一帧耗时 {timer.total() * 1000:.1f} ms（{kind}）: {phases}{Colors.ENDC}"
     )
 
-    h_desktop = find_desktop_listview_handle()
-    if not h_desktop:
-        return
-
-    icon_count = get_icon_count(h_desktop)
-    if icon_count < 5:
-        print(f"{Colors.FAIL}桌面图标太少({icon_count}个)，无法开始游戏。{Colors.ENDC}")
-        return
-    print(f"{Colors.OKCYAN}检测到 {icon_count} 个桌面图标。{Colors.ENDC}")
 
+def show_calibration_prompt():
     print(f"\n{Colors.HEADER}请按以下步骤操作，{Colors.ENDC}")
     print(
         "1. 在桌面上，右键 -> 查看 -> 勾选“将图标与网格对齐”。(windows 10/11 下默认已勾选，且无法取消)"
@@ -312,216 +229,642 @@ def main():
     print("5. 上述要求是为了计算网格大小。")
     input(f"{Colors.WARNING}完成后请按 Enter 键...{Colors.ENDC}\n")
 
-    # 最小化控制台窗口
-    print(f"{Colors.OKCYAN}正在最小化控制台窗口...{Colors.ENDC}")
-    time.sleep(0.3)
-    console_hwnd = kernel32.GetConsoleWindow()
-    if console_hwnd:
-        win32gui.ShowWindow(console_hwnd, win32con.SW_MINIMIZE)
 
-    grid_info = calculate_grid_parameters(h_desktop)
+def load_grid(backend, timer, confirm=None, profile_path=None):
+    """读取桌面布局并得到网格参数，返回 (grid_info, positions, identities, warm)，失败时返回 None。
+
+    有缓存的网格、并且抽查的图标都落在这个网格上时直接使用（热启动）；
+    否则先调用 confirm 提示用户摆好图标，再读取桌面计算网格，成功后写入缓存。
+    profile_path 为 None 时不使用缓存。读取桌面失败时抛出 OSError。
+    """
+    from grid_profile import load_profile, profile_key, save_profile, verify_profile
+
+    screen_width, screen_height = backend.screen_metrics()
+    key = None
+    if profile_path:
+        key = profile_key(
+            (screen_width, screen_height), backend.dpi(), backend.item_spacing()
+        )
+        grid_info = load_profile(key, profile_path)
+        timer.mark("profile")
+        if grid_info:
+            positions = backend.read_positions()
+            timer.mark("scan")
+            if verify_profile(grid_info, positions):
+                identities = backend.read_identities()
+                timer.mark("identities")
+                print(
+                    f"{Colors.OKGREEN}使用缓存的网格参数: {grid_info['size_x']}x{grid_info['size_y']} 像素, "
+                    f"{grid_info['cols']}列 x {grid_info['rows']}行{Colors.ENDC}"
+                )
+                return grid_info, positions, identities, True
+            print(f"{Colors.WARNING}缓存的网格参数与当前桌面不符，重新计算。{Colors.ENDC}")
+
+    if confirm is not None:
+        confirm()
+        timer.skip()
+    positions = backend.read_positions()
+    timer.mark("scan")
+    identities = backend.read_identities()
+    timer.mark("identities")
+    grid_info = calculate_grid_parameters(positions, screen_width, screen_height)
+    timer.mark("calibrate")
     if not grid_info:
-        # 在退出前尝试恢复控制台，以便用户看到错误信息
-        if console_hwnd:
-            win32gui.ShowWindow(console_hwnd, win32con.SW_RESTORE)
+        return None
+    if key:
+        save_profile(key, grid_info, profile_path)
+    return grid_info, positions, identities, False
+
+
+def advance_snakes(engine, pilots, queues, pixel_xs, pixel_ys, moves):
+    """多蛇模式推进一帧：收集每条蛇的方向后统一判定，移动追加到 moves，返回结束原因。"""
+    from multisnake import DEATH_MESSAGES
+
+    actions = []
+    for k, pilot in enumerate(pilots):
+        if engine.dead[k]:
+            actions.append(None)
+        elif pilot is not None:
+            actions.append(pilot.decide())
+        else:
+            actions.append(queues[k].next_direction(engine.directions[k]))
+    with tracer.span("engine.step"):
+        events = engine.step(actions)
+    moves.extend(
+        (icon, pixel_xs[cell], pixel_ys[cell]) for icon, cell in events.cell_moves
+    )
+    for k, reason in events.deaths:
+        print(f"{Colors.WARNING}第 {k + 1} 条蛇{DEATH_MESSAGES[reason]}。{Colors.ENDC}")
+    return events.game_over
+
+
+def publish_tick(server, engine, moves, multi, game_over):
+    """把本帧变化的格子和蛇的状态发给观战客户端。蛇头的格子在吃到食物时种类会变，一并刷新。"""
+    if multi:
+        heads = [body.head_cell() for body in engine.bodies]
+        status = {
+            "lengths": [body.length for body in engine.bodies],
+            "alive": engine.alive,
+        }
+    else:
+        heads = (engine.body.head_cell(),)
+        status = {"length": engine.length}
+    if game_over:
+        status["game_over"] = game_over
+        if multi:
+            status["winner"] = engine.winner
+    server.publish(engine.ticks, moves, heads, status)
+
+
+def main(
+    trace_path=None,
+    headless=False,
+    icons=60,
+    record_path=None,
+    seed=None,
+    autopilot=False,
+    send_timeout=None,
+    setup_frames=1,
+    snakes=1,
+    players=1,
+    max_catch_up=DEFAULT_MAX_CATCH_UP,
+    terminal=False,
+    serve=None,
+    serve_readonly=False,
+):
+    """主函数。headless 为 True 时在 icons 个图标的模拟桌面上运行，不需要 Windows。
+
+    record_path 不为空时把这一局录制到该文件，可以用 --replay 重放。
+    autopilot 为 True 时由 Autopilot 控制方向，键盘只用来按 ESC 退出。
+    send_timeout（秒）不为空时每条写入消息最多等这么久，超时的移动留到下一帧重试。
+    setup_frames 大于 1 时把场地布置分成这么多帧播放（60 帧/秒），否则一次写完。
+    snakes 大于 1 时多条蛇共用一个棋盘（见 multisnake），前 players 条由玩家控制
+    （玩家 1 用 WASD，玩家 2 用方向键），其余由 Autopilot 控制；autopilot 为 True 时全部自动。
+    max_catch_up 为调度器落后时一次最多推进的帧数（见 TickScheduler）。
+    terminal 为 True 时在终端里显示模拟桌面（见 terminal.TerminalDesktop），可以用键盘玩，
+    不需要 Windows；其余与 headless 相同。
+    serve 不为空时在这个地址（见 spectator.parse_address）上开启观战和控制服务器，
+    serve_readonly 为 True 时只允许观战。
+    """
+    global game_running
+    from backend import synthetic_desktop, write_layout
+    from controls import (
+        InputQueue,
+        KeyboardInput,
+        PlayerInputs,
+        ScriptedInput,
+        TerminalInput,
+    )
+    from engine import GAME_OVER_MESSAGES, SnakeEngine, pixel_table
+    from identity import IconTracker
+    from layout import layout_moves, plan_layout
+    from render import RenderThread
+    from scheduler import TickScheduler
+
+    timer = StartupTimer()
+    timer.mark("imports")
+    headless = headless or terminal
+    if trace_path:
+        # 后端创建后由 instrument_backend 给读写路径和 Win32 调用加上统计
+        tracer.enabled = True
+
+    if terminal:
+        from terminal import TerminalDesktop
+
+        backend = TerminalDesktop(icons, send_timeout=send_timeout)
+        snapshot_path = profile_path = confirm = None
+        print(f"{Colors.OKCYAN}终端模式：在 {icons} 个图标的模拟桌面上运行。{Colors.ENDC}")
+    elif headless:
+        backend = synthetic_desktop(icons, send_timeout=send_timeout)
+        snapshot_path = profile_path = confirm = None
+        print(f"{Colors.OKCYAN}无头模式：在 {icons} 个图标的模拟桌面上运行。{Colors.ENDC}")
+    else:
+        print(f"{Colors.WARNING}重要提示：此脚本需要以管理员权限运行！{Colors.ENDC}")
+        print(
+            f"{Colors.WARNING}请随时按 ESC 键退出并恢复桌面。如果用 Ctrl+C 强行退出，可以运行 snake.py --restore 恢复桌面。{Colors.ENDC}"
+        )
+
+        h_desktop = find_desktop_listview_handle()
+        if not h_desktop:
+            return
+        from grid_profile import DEFAULT_PATH as PROFILE_PATH
+        from snapshot import DEFAULT_PATH as SNAPSHOT_PATH
+        from win32_desktop import Win32Desktop
+
+        backend = Win32Desktop(h_desktop, send_timeout)
+        snapshot_path, profile_path = SNAPSHOT_PATH, PROFILE_PATH
+        confirm = show_calibration_prompt
+    instrument_backend(tracer, backend)
+    timer.mark("backend")
+
+    # 上一局没有正常恢复时快照文件还在，先恢复再开始
+    if snapshot_path and restore_from_snapshot(backend):
+        print(f"{Colors.WARNING}检测到上一局没有恢复桌面，已自动恢复。{Colors.ENDC}")
+
+    icon_count = backend.icon_count()
+    if icon_count < 5:
+        print(f"{Colors.FAIL}桌面图标太少({icon_count}个)，无法开始游戏。{Colors.ENDC}")
+        return
+    print(f"{Colors.OKCYAN}检测到 {icon_count} 个桌面图标。{Colors.ENDC}")
+
+    # 只扫描一次桌面，网格计算和初始位置保存共用同一份结果
+    try:
+        loaded = load_grid(backend, timer, confirm, profile_path)
+    except OSError as e:
+        print(f"{Colors.FAIL}读取图标位置失败: {e}{Colors.ENDC}")
+        backend.close()
+        return
+    if not loaded:
         print(f"{Colors.FAIL}初始化失败，程序退出。{Colors.ENDC}")
+        backend.close()
         return
+    grid_info, positions, identities, warm = loaded
 
-    keyboard.add_hotkey("esc", stop_game)
+    # 最小化控制台窗口
+    console_hwnd = None
+    if not headless:
+        from win32_desktop import minimize_console, restore_console
+
+        print(f"{Colors.OKCYAN}正在最小化控制台窗口...{Colors.ENDC}")
+        console_hwnd = minimize_console()
+
+    multi = snakes > 1
+    if multi and record_path:
+        print(f"{Colors.WARNING}多蛇模式暂不支持录制，忽略 --record。{Colors.ENDC}")
+        record_path = None
+    controls = PlayerInputs(players) if multi else InputQueue()
+    if terminal:
+        input_source = TerminalInput(controls)
+    elif headless:
+        input_source = ScriptedInput(controls, {})
+    else:
+        input_source = KeyboardInput(controls)
+        tracer.instrument(input_source, "_on_press", "input.key_hook")
+    for queue in controls.queues if multi else (controls,):
+        tracer.instrument(queue, "next_direction", "input.next_direction")
+    input_source.start()
+    recorder = pilot = renderer = server = None
+    pilots = []
     # 最小化后，这些信息在后台打印，用户看不到，但对于调试有用
     print(
         f"\n{Colors.OKGREEN}游戏初始化完成。{Colors.ENDC}"
     )
 
     try:
-        save_initial_positions(h_desktop, icon_count)
+        save_initial_positions(positions, identities, snapshot_path)
 
         # print("正在准备游戏场地...")
+        if seed is None:
+            seed = random.getrandbits(64)
+        try:
+            cols, rows = grid_info["cols"], grid_info["rows"]
+            if multi:
+                from multisnake import MULTI_GAME_OVER_MESSAGES, MultiSnakeEngine
 
-        all_available_icons = list(initial_positions.keys())
-        initial_snake_len = 3
-        if len(all_available_icons) < initial_snake_len + 2:
-            print(
-                f"{Colors.FAIL}错误：没有足够的图标来开始游戏（需要至少5个）。{Colors.ENDC}"
-            )
-            restore_initial_positions(h_desktop)
-            return
+                def make_engine(icons):
+                    return MultiSnakeEngine(cols, rows, icons, seed, snakes)
 
-        snake_indices = deque(all_available_icons[:initial_snake_len])
-        waiting_icons = all_available_icons[initial_snake_len:]
+            else:
 
-        snake_grid_pos = deque([(2, 0), (1, 0), (0, 0)])
-        border_grid_pos = []
+                def make_engine(icons):
+                    return SnakeEngine(cols, rows, icons, seed)
 
-        # print("正在布置右侧边界...")
-        current_col = grid_info["cols"] - 1
-        current_row = 0
-        for icon_idx in reversed(waiting_icons):
-            if current_col < 0:
-                print(
-                    f"{Colors.WARNING}警告：图标过多，无法在网格内完全展示。{Colors.ENDC}"
-                )
-                break
-            px, py = grid_to_pixel(current_col, current_row, grid_info)
-            set_icon_position(h_desktop, icon_idx, px, py)
-            border_grid_pos.append((current_col, current_row))
-            current_row += 1
-            if current_row >= grid_info["rows"]:
-                current_row = 0
-                current_col -= 1
-            time.sleep(0.01)
-
-        # print("正在放置贪吃蛇...")
-        for i, icon_idx in enumerate(snake_indices):
-            px, py = grid_to_pixel(
-                snake_grid_pos[i][0], snake_grid_pos[i][1], grid_info
+            # 按图标现在的位置分配角色，已经在目标格子上的图标不动
+            current = {index: (x, y) for index, _, x, y in initial_positions}
+            icons, plan = plan_layout(
+                make_engine, list(current), list(current.values()), grid_info
             )
-            set_icon_position(h_desktop, icon_idx, px, py)
-            time.sleep(0.01)
-
-        # print("正在放置食物...")
-        food_index = waiting_icons.pop(0)
-        border_grid_pos.pop()
+            engine = make_engine(icons)
+        except ValueError as e:
+            print(f"{Colors.FAIL}错误：{e}{Colors.ENDC}")
+            return
+        if multi:
+            from autopilot import Autopilot
+
+            humans = 0 if autopilot else len(controls.queues)
+            pilots = [
+                None if k < humans else Autopilot(engine.snake_view(k))
+                for k in range(snakes)
+            ]
+            print(
+                f"{Colors.OKCYAN}多蛇模式: {snakes} 条蛇, {humans} 个玩家（WASD / 方向键）, "
+                f"其余由自动驾驶控制。{Colors.ENDC}"
+            )
+        elif autopilot:
+            from autopilot import Autopilot
 
-        border_x_boundary = grid_info["cols"]
-        if border_grid_pos:
-            border_x_boundary = min(p[0] for p in border_grid_pos)
+            pilot = Autopilot(engine)
+            tracer.instrument(pilot, "decide", "autopilot.decide")
+        if record_path:
+            from recording import Recorder
 
-        max_food_x = border_x_boundary - 3
-        if max_food_x < 5:
-            print(f"{Colors.FAIL}错误：游戏区域太窄，无法安全放置食物。{Colors.ENDC}")
-            restore_initial_positions(h_desktop)
-            return
+            recorder = Recorder(record_path, seed, grid_info, icons)
+            print(f"{Colors.OKCYAN}正在录制到 {record_path}（种子 {seed}）。{Colors.ENDC}")
+        if engine.overflow:
+            print(f"{Colors.WARNING}警告：图标过多，无法在网格内完全展示。{Colors.ENDC}")
 
-        food_grid_pos = (
-            random.randint(5, max_food_x),
-            random.randint(1, grid_info["rows"] - 2),
+        print(
+            f"{Colors.OKCYAN}布局规划: 移动 {plan['moves']} 个图标（按编号顺序需要 {plan['baseline_moves']} 个）, "
+            f"{plan['kept']} 个留在原地, 总位移 {plan['displacement']} 像素"
+            f"（按编号顺序 {plan['baseline_displacement']} 像素）, "
+            f"{'精确解' if plan['exact'] else '分块求解'}, 用时 {plan['elapsed_ms']:.1f} ms{Colors.ENDC}"
         )
-        while food_grid_pos in snake_grid_pos:
-            food_grid_pos = (
-                random.randint(0, max_food_x),
-                random.randint(0, grid_info["rows"] - 1),
-            )
+        layout = write_layout(
+            backend, layout_moves(engine.setup_moves, current, grid_info), setup_frames
+        )
+        timer.mark("setup")
+        print(
+            f"{Colors.OKCYAN}布置场地: {layout['moves']} 个图标, {layout['frames']} 帧, "
+            f"写入 {layout['writes']} 次, 用时 {layout['elapsed_ms']:.1f} ms{Colors.ENDC}"
+        )
+        report_startup(timer, warm)
 
-        px, py = grid_to_pixel(food_grid_pos[0], food_grid_pos[1], grid_info)
-        set_icon_position(h_desktop, food_index, px, py)
+        if serve:
+            from spectator import BoardMirror, GameServer
+
+            server = GameServer(
+                serve,
+                BoardMirror(engine.board, grid_info, engine.setup_moves),
+                controls,
+                control=not serve_readonly,
+            )
+            try:
+                server.start()
+            except OSError as e:
+                print(f"{Colors.FAIL}无法在 {serve} 上开启观战服务器: {e}{Colors.ENDC}")
+                server = None
+            else:
+                print(
+                    f"{Colors.OKCYAN}观战服务器: {server.describe()}"
+                    f"{'（只读）' if serve_readonly else ''}{Colors.ENDC}"
+                )
 
         # print("游戏开始！请用 WASD 或方向键控制。")
 
-        direction = (1, 0)
-        last_move_time = time.time()
+        # 写桌面交给渲染线程，Explorer 卡顿时游戏线程照常推进
+        # 游戏中桌面有图标增删或重新排序时，由 tracker 把开局编号换成当前索引
+        tracker = IconTracker(backend, identities)
+        renderer = RenderThread(backend, tracker)
+        renderer.start()
+        pixel_xs, pixel_ys = pixel_table(grid_info)
+        scheduler = TickScheduler(max_catch_up=max_catch_up)
+        scheduler.start(engine.tick_interval())
 
         while game_running:
-            # --- 1. 键盘输入 ---
-            new_direction = direction
-            if keyboard.is_pressed("w") or keyboard.is_pressed("up"):
-                if direction != (0, 1):
-                    new_direction = (0, -1)
-            elif keyboard.is_pressed("s") or keyboard.is_pressed("down"):
-                if direction != (0, -1):
-                    new_direction = (0, 1)
-            elif keyboard.is_pressed("a") or keyboard.is_pressed("left"):
-                if direction != (1, 0):
-                    new_direction = (-1, 0)
-            elif keyboard.is_pressed("d") or keyboard.is_pressed("right"):
-                if direction != (-1, 0):
-                    new_direction = (1, 0)
-            direction = new_direction
-
-            # --- 2. 游戏节拍器 ---
-            current_time = time.time()
-            base_speed = 0.3
-            speed_increase = len(snake_indices) * 0.005
-            game_speed = max(0.05, base_speed - speed_increase)
-
-            if current_time - last_move_time >= game_speed:
-                last_move_time = current_time
-
-                current_head_pos = snake_grid_pos[0]
-                new_head_pos = (
-                    current_head_pos[0] + direction[0],
-                    current_head_pos[1] + direction[1],
-                )
-
-                game_over_message = ""
-                if not (
-                    0 <= new_head_pos[0] < grid_info["cols"]
-                    and 0 <= new_head_pos[1] < grid_info["rows"]
-                ):
-                    game_over_message = "游戏结束：撞到墙了！"
-                elif new_head_pos in snake_grid_pos:
-                    game_over_message = "游戏结束：撞到自己了！"
-                elif new_head_pos in border_grid_pos:
-                    game_over_message = "游戏结束：撞到边界图标了！"
-
-                if game_over_message:
-                    print(f"{Colors.FAIL}{game_over_message}{Colors.ENDC}")
-                    game_running = False
-                    continue
-
-                if new_head_pos == food_grid_pos:
-                    snake_grid_pos.appendleft(new_head_pos)
-                    snake_indices.appendleft(food_index)
-
-                    if not waiting_icons:
-                        print(
-                            f"{Colors.BOLD}{Colors.OKGREEN}恭喜你吃完了所有图标，游戏胜利！{Colors.ENDC}"
-                        )
-                        game_running = False
-                        continue
-
-                    food_index = waiting_icons.pop(0)
-                    if border_grid_pos:
-                        border_grid_pos.pop()
-
-                    border_x_boundary = grid_info["cols"]
-                    if border_grid_pos:
-                        border_x_boundary = min(p[0] for p in border_grid_pos)
-                    max_food_x = max(0, border_x_boundary - 3)
-
-                    while True:
-                        food_grid_pos = (
-                            random.randint(0, max_food_x),
-                            random.randint(0, grid_info["rows"] - 1),
+            due = scheduler.wait(engine.tick_interval())
+            if controls.stopped:
+                print(f"\n{Colors.WARNING}接收到停止信号，游戏即将退出...{Colors.ENDC}")
+                break
+            if server is not None and server.paused:
+                continue
+
+            with tracer.span("tick"):
+                # 落后时一次推进多帧，只把最终位置写入桌面
+                moves = []
+                for _ in range(due):
+                    input_source.poll(engine.ticks)
+                    first = len(moves)
+                    if multi:
+                        # 所有蛇的移动合在同一批里写入
+                        game_over = advance_snakes(
+                            engine, pilots, controls.queues, pixel_xs, pixel_ys, moves
                         )
-                        if (
-                            food_grid_pos not in snake_grid_pos
-                            and food_grid_pos not in border_grid_pos
-                        ):
-                            break
-
-                    px, py = grid_to_pixel(
-                        food_grid_pos[0], food_grid_pos[1], grid_info
+                    else:
+                        if pilot is not None:
+                            action = pilot.decide()
+                        else:
+                            action = controls.next_direction(engine.direction)
+                        with tracer.span("engine.advance"):
+                            game_over = engine.advance(action)
+                        if recorder is not None:
+                            recorder.record(engine, action)
+                        if engine.moved_icon >= 0:
+                            cell = engine.moved_cell
+                            moves.append(
+                                (engine.moved_icon, pixel_xs[cell], pixel_ys[cell])
+                            )
+                    if server is not None:
+                        publish_tick(server, engine, moves[first:], multi, game_over)
+                    if game_over:
+                        break
+                renderer.publish(moves)
+            tracer.count("icon_moves", len(moves))
+            tracer.count("catch_up_ticks", due - 1)
+            if game_over and multi:
+                winner = engine.winner
+                color = Colors.FAIL if winner is None else f"{Colors.BOLD}{Colors.OKGREEN}"
+                print(f"{color}{MULTI_GAME_OVER_MESSAGES[game_over]}{Colors.ENDC}")
+                if winner is not None:
+                    print(
+                        f"{color}第 {winner + 1} 条蛇获胜，长度 {engine.length(winner)}。{Colors.ENDC}"
                     )
-                    set_icon_position(h_desktop, food_index, px, py)
-
-                else:
-                    snake_grid_pos.pop()
-                    tail_icon_index = snake_indices.pop()
-
-                    snake_grid_pos.appendleft(new_head_pos)
-                    snake_indices.appendleft(tail_icon_index)
-
-                    px, py = grid_to_pixel(new_head_pos[0], new_head_pos[1], grid_info)
-                    set_icon_position(h_desktop, tail_icon_index, px, py)
-
-            time.sleep(0.01)
+                game_running = False
+            elif game_over:
+                color = f"{Colors.BOLD}{Colors.OKGREEN}" if engine.won else Colors.FAIL
+                print(f"{color}{GAME_OVER_MESSAGES[game_over]}{Colors.ENDC}")
+                game_running = False
 
     except Exception as e:
-        if "console_hwnd" in locals() and console_hwnd:
-            win32gui.ShowWindow(console_hwnd, win32con.SW_RESTORE)
+        if console_hwnd:
+            restore_console(console_hwnd)
         print(f"{Colors.FAIL}游戏主循环发生错误: {e}{Colors.ENDC}")
     finally:
-        if "console_hwnd" in locals() and console_hwnd:
-            win32gui.ShowWindow(console_hwnd, win32con.SW_RESTORE)
+        input_source.stop()
+        if server is not None:
+            server.stop()
+            stats = server.stats()
+            print(
+                f"{Colors.OKCYAN}观战统计: 最多 {stats['peak_clients']} 个客户端, 广播 {stats['frames']} 帧"
+                f"（关键帧 {stats['keyframes']} 个）, 发送 {stats['bytes_sent']} 字节, "
+                f"因客户端太慢丢弃 {stats['dropped']} 帧、重新同步 {stats['resyncs']} 次, "
+                f"收到 {stats['commands']} 条命令, 每帧发布 {stats['mean_publish_us']:.1f} us{Colors.ENDC}"
+            )
+        if recorder is not None:
+            recorder.close(engine)
+        if console_hwnd:
+            restore_console(console_hwnd)
+        if renderer is not None:
+            try:
+                renderer.stop()
+            except Exception as e:
+                print(f"{Colors.FAIL}渲染线程发生错误: {e}{Colors.ENDC}")
+            stats = renderer.stats()
+            print(
+                f"{Colors.OKCYAN}渲染统计: 发布 {stats['published']} 帧, 写入 {stats['rendered']} 批, "
+                f"合并 {stats['stale']} 帧, 覆盖 {stats['superseded']} 次移动, "
+                f"平均延迟 {stats['mean_lag_ms']:.2f} ms (最大 {stats['max_lag_ms']:.2f} ms){Colors.ENDC}"
+            )
+            stats = renderer.tracker.stats()
+            if stats["resyncs"]:
+                print(
+                    f"{Colors.WARNING}游戏中桌面图标发生了 {stats['resyncs']} 次变化"
+                    f"（其中 {stats['full_resyncs']} 次完整重读），重新读取了 {stats['identity_reads']} 个图标名称，"
+                    f"{stats['lost']} 个游戏图标已被删除。{Colors.ENDC}"
+                )
+        stats = backend.writer.stats()
+        print(
+            f"{Colors.OKCYAN}写入统计: {stats['ticks']} 帧, "
+            f"平均每帧 {stats['writes_per_tick']:.2f} 次写入, "
+            f"跳过 {stats['dropped']} 次无效移动, 超时 {stats['timeouts']} 次, "
+            f"平均刷新 {stats['mean_flush_ms']:.2f} ms (最大 {stats['max_flush_ms']:.2f} ms){Colors.ENDC}"
+        )
+        if terminal:
+            stats = backend.view.stats()
+            print(
+                f"{Colors.OKCYAN}终端渲染: {stats['frames']} 帧, "
+                f"平均每帧重画 {stats['cells_per_frame']:.1f} 格、输出 {stats['bytes_per_frame']:.0f} 字节, "
+                f"平均 {stats['mean_render_us']:.0f} us (最大 {stats['max_render_us']:.0f} us){Colors.ENDC}"
+            )
+        if "scheduler" in locals():
+            stats = scheduler.stats()
+            print(
+                f"{Colors.OKCYAN}节拍统计: {stats['ticks']} 帧, 跳过 {stats['skipped']} 帧, "
+                f"平均迟到 {stats['mean_late_ms']:.2f} ms (p99 {stats['p99_late_ms']:.2f} ms), "
+                f"抖动 {stats['jitter_ms']:.2f} ms{Colors.ENDC}"
+            )
         print(f"{Colors.WARNING}游戏结束，正在恢复桌面...{Colors.ENDC}")
-        time.sleep(2)
-        restore_initial_positions(h_desktop)
+        restore_initial_positions(backend, snapshot_path)
+        backend.close()
         print(f"{Colors.OKGREEN}桌面已恢复。{Colors.ENDC}")
+        if trace_path:
+            report_tracing(trace_path)
+
+
+def replay_main(path, realtime=False):
+    """重放录像并核对局面摘要。realtime 为 True 时按原来的节奏写到模拟桌面上。"""
+    from backend import synthetic_desktop
+    from recording import load_recording, replay
+
+    try:
+        recording = load_recording(path)
+    except (OSError, ValueError) as e:
+        print(f"{Colors.FAIL}{e}{Colors.ENDC}")
+        return 1
+    backend = None
+    if realtime:
+        backend = synthetic_desktop(max(recording.icons) + 1)
+    start = time.perf_counter()
+    result = replay(recording, backend, realtime)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{Colors.OKCYAN}回放 {result['ticks']} 帧，用时 {elapsed:.3f} s"
+        f"（{result['ticks'] / max(elapsed, 1e-9):.0f} 帧/秒），核对了 {result['hash_checks']} 个摘要。{Colors.ENDC}"
+    )
+    if result["diverged_at"] is not None:
+        print(f"{Colors.FAIL}第 {result['diverged_at']} 帧的局面与录像不一致。{Colors.ENDC}")
+    elif not result["matches"]:
+        print(
+            f"{Colors.FAIL}结束状态与录像不一致：录像在第 {recording.end_tick} 帧以"
+            f" {recording.game_over} 结束，回放在第 {result['ticks']} 帧以 {result['game_over']} 结束。{Colors.ENDC}"
+        )
+    else:
+        print(f"{Colors.OKGREEN}回放与录像完全一致。{Colors.ENDC}")
+    return 0 if result["matches"] else 1
+
+
+def restore_main():
+    """只按快照恢复桌面，不开始游戏。"""
+    h_desktop = find_desktop_listview_handle()
+    if not h_desktop:
+        return
+    from win32_desktop import Win32Desktop
+
+    backend = Win32Desktop(h_desktop)
+    try:
+        if not restore_from_snapshot(backend):
+            print(f"{Colors.OKCYAN}没有需要恢复的快照。{Colors.ENDC}")
+    finally:
+        backend.close()
+
+
+def seed_argument(text):
+    """--seed 的类型：录像里按 64 位无符号整数保存种子，所以只接受 0 到 2**64 - 1。"""
+    seed = int(text)
+    if not 0 <= seed < 1 << 64:
+        raise argparse.ArgumentTypeError(f"种子必须在 0 到 2**64 - 1 之间: {text}")
+    return seed
 
 
 if __name__ == "__main__":
-    # 初始化 colorama，让颜色在 exe 中也能生效
-    colorama_init(autoreset=True)
-    set_dpi_awareness()
-    main()
+    parser = argparse.ArgumentParser(description="用桌面图标玩贪吃蛇。")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--restore",
+        action="store_true",
+        help="按快照恢复上一局没有正常恢复的桌面后退出",
+    )
+    mode.add_argument(
+        "--headless",
+        action="store_true",
+        help="不操作真实桌面，在内存中的模拟桌面上运行（不需要 Windows）",
+    )
+    mode.add_argument(
+        "--terminal",
+        action="store_true",
+        help="在终端里显示模拟桌面并用键盘游玩（WASD / 方向键，ESC 或 q 退出），不需要 Windows",
+    )
+    mode.add_argument(
+        "--replay",
+        metavar="PATH",
+        help="无头重放 PATH 处的录像并核对每隔若干帧的局面摘要，不一致时退出码为 1",
+    )
+    parser.add_argument(
+        "--realtime",
+        action="store_true",
+        help="与 --replay 一起使用：按原来的节奏把回放写到模拟桌面上，而不是全速运行",
+    )
+    parser.add_argument(
+        "--autopilot",
+        action="store_true",
+        help="自动驾驶（演示模式）：由程序寻路吃食物，按 ESC 退出",
+    )
+    parser.add_argument(
+        "--record",
+        metavar="PATH",
+        help="把这一局（种子、网格参数和每次换向）录制到 PATH",
+    )
+    parser.add_argument(
+        "--seed",
+        type=seed_argument,
+        help="食物位置的随机种子，默认每局随机",
+    )
+    parser.add_argument(
+        "--icons",
+        type=int,
+        default=60,
+        help="无头模式下模拟桌面的图标数量（默认 60）",
+    )
+    parser.add_argument(
+        "--send-timeout",
+        type=float,
+        metavar="MS",
+        help="每条写入消息最多等待的毫秒数，Explorer 无响应时跳过并在下一帧重试（默认一直等待）",
+    )
+    parser.add_argument(
+        "--setup-frames",
+        type=int,
+        metavar="N",
+        help="把场地布置分成 N 帧播放成动画（60 帧/秒），默认一次写完",
+    )
+    parser.add_argument(
+        "--latency-profile",
+        metavar="PATH",
+        help="按 test_winapi.py 测出的延迟画像选择写入超时、布置帧数和追赶帧数"
+        f"（默认读取 {LATENCY_PROFILE_PATH}，无头模式默认不读取）",
+    )
+    parser.add_argument(
+        "--snakes",
+        type=int,
+        default=1,
+        metavar="N",
+        help="多蛇模式：N 条蛇共用一个棋盘，玩家以外的蛇由自动驾驶控制（默认 1）",
+    )
+    parser.add_argument(
+        "--players",
+        type=int,
+        default=1,
+        choices=(1, 2),
+        help="多蛇模式下由玩家控制的蛇数：玩家 1 用 WASD，玩家 2 用方向键（默认 1）",
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="PATH",
+        help="记录 Win32 调用、输入和每帧的耗时，退出时打印汇总并把 Chrome trace 写入 PATH",
+    )
+    parser.add_argument(
+        "--serve",
+        metavar="ADDR",
+        help="开启观战和控制服务器：端口、主机:端口 或 unix:路径（TCP 默认只监听 127.0.0.1）",
+    )
+    parser.add_argument(
+        "--serve-readonly",
+        action="store_true",
+        help="与 --serve 一起使用：只允许观战，不接受方向、暂停和停止命令",
+    )
+    args = parser.parse_args()
+    if args.players > args.snakes:
+        parser.error(f"--players {args.players} 需要至少 {args.players} 条蛇（--snakes）")
+
+    if args.replay:
+        sys.exit(replay_main(args.replay, args.realtime))
+    simulated = args.headless or args.terminal
+    if not simulated:
+        # 初始化 colorama，让颜色在 exe 中也能生效
+        from colorama import init as colorama_init
+
+        colorama_init(autoreset=True)
+        set_dpi_awareness()
+    if args.restore:
+        restore_main()
+    else:
+        send_timeout_ms, setup_frames, max_catch_up = latency_settings(
+            args.latency_profile or (None if simulated else LATENCY_PROFILE_PATH),
+            args.send_timeout,
+            args.setup_frames,
+        )
+        options = (
+            args.trace,
+            args.headless,
+            args.icons,
+            args.record,
+            args.seed,
+            args.autopilot,
+            send_timeout_ms / 1000 if send_timeout_ms else None,
+            setup_frames,
+            args.snakes,
+            args.players,
+            max_catch_up,
+            args.terminal,
+            args.serve,
+            args.serve_readonly,
+        )
+        if args.terminal:
+            # 游戏期间终端用来显示棋盘，其他输出先收集起来，退出后再打印
+            log = io.StringIO()
+            try:
+                with contextlib.redirect_stdout(log):
+                    main(*options)
+            finally:
+                print(log.getvalue(), end="")
+        else:
+            main(*options)
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""图标初始位置的二进制快照。
+
+游戏开始移动图标之前，把每个图标的 (索引, 标识, x, y) 写入快照文件，
+经 mmap 写入并 fsync 落盘；正常结束并恢复桌面后删除快照。
+因此只要快照文件还在，就说明上一局没有正常恢复（Ctrl+C、被杀掉或崩溃），
+可以用 `python snake.py --restore` 恢复。
+
+文件格式（小端）：
+    头部    magic(4s) version(H) record_size(H) count(I)
+    记录    index(i) identity(I) x(i) y(i)，共 count 条
+"""
+import mmap
+import os
+import struct
+
+from backend import write_layout
+
+MAGIC = b"DSNK"
+VERSION = 1
+HEADER = struct.Struct("<4sHHI")
+RECORD = struct.Struct("<iIii")
+
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".desktop_snake", "snapshot.bin")
+
+
+def save_snapshot(records, path=DEFAULT_PATH):
+    """写入快照，records 为 (index, identity, x, y) 序列。
+
+    先写临时文件并 fsync，再原子替换，任何时刻磁盘上都是一份完整的快照。
+    """
+    records = list(records)
+    size = HEADER.size + RECORD.size * len(records)
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = path + ".tmp"
+
+    with open(tmp_path, "w+b") as f:
+        f.truncate(size)
+        with mmap.mmap(f.fileno(), size) as view:
+            HEADER.pack_into(view, 0, MAGIC, VERSION, RECORD.size, len(records))
+            offset = HEADER.size
+            for record in records:
+                RECORD.pack_into(view, offset, *record)
+                offset += RECORD.size
+            view.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+    # 目录项也要落盘，否则断电后 rename 可能丢失（Windows 上不支持也不需要）
+    if hasattr(os, "O_DIRECTORY"):
+        fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def load_snapshot(path=DEFAULT_PATH):
+    """读取快照，返回 (index, identity, x, y) 列表；文件不存在时返回 None。"""
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return None
+    with f:
+        size = os.fstat(f.fileno()).st_size
+        if size < HEADER.size:
+            raise ValueError(f"快照文件已损坏: {path}")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            magic, version, record_size, count = HEADER.unpack_from(view, 0)
+            if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+                raise ValueError(f"无法识别的快照文件: {path}")
+            if size < HEADER.size + count * RECORD.size:
+                raise ValueError(f"快照文件不完整: {path}")
+            return [
+                RECORD.unpack_from(view, HEADER.size + i * RECORD.size)
+                for i in range(count)
+            ]
+
+
+def remove_snapshot(path=DEFAULT_PATH):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def snapshot_moves(records, positions, identities):
+    """把图标放回快照位置所需的移动 (当前索引, x, y)，已经在快照位置上的图标不移动。
+
+    如果某个索引上的图标已经不是快照里的那个（有图标增删或重新排序），按标识找回它现在的索引；
+    已经不在桌面上的图标跳过。
+    """
+    current_index = None
+    moves = []
+    for index, identity, x, y in records:
+        if index >= len(identities) or identities[index] != identity:
+            if current_index is None:
+                current_index = {ident: i for i, ident in enumerate(identities)}
+            index = current_index.get(identity)
+            if index is None:
+                continue  # 图标已经不在桌面上
+        if positions[2 * index] != x or positions[2 * index + 1] != y:
+            moves.append((index, x, y))
+    return moves
+
+
+def restore_snapshot(backend, records):
+    """把桌面恢复到快照中的布局，返回实际移动的图标数。
+
+    只读取一次当前布局，只重写位置确实变了的图标，并且一次写完（见 backend.write_layout）。
+    """
+    moves = snapshot_moves(records, backend.read_positions(), backend.read_identities())
+    return write_layout(backend, moves)["writes"]
+
+
+def verify_snapshot(backend, records):
+    """重新读取桌面，返回还不在快照位置上的图标数；为 0 时才可以删除快照。"""
+    return len(
+        snapshot_moves(records, backend.read_positions(), backend.read_identities())
+    )
@@ -0,0 +1,423 @@
+# -*- coding: utf-8 -*-
+"""本地观战和控制服务器（asyncio，Unix socket 或本机 TCP）。
+
+游戏线程每帧调用 GameServer.publish()，只把本帧变化的格子交给服务器的事件循环线程就返回，
+编码和发送都在事件循环里进行，连上多少个客户端都不会拖慢游戏节奏。
+
+协议是按行分隔的 JSON（UTF-8）。服务器发给客户端的消息：
+    {"t": "hello", "cols": .., "rows": .., "kinds": {..}, "control": true}   连接后的第一条
+    {"t": "key", "seq": .., "tick": .., "cells": [[格子, 种类, 图标], ..], "status": {..}}
+        关键帧：全部有图标或非空的格子，连接时、每 keyframe_interval 帧以及客户端追不上时发送
+    {"t": "delta", "seq": .., "tick": .., "cells": [[格子, 种类, 图标], ..], "status": {..}}
+        只包含本帧变化的格子，种类为 EMPTY 且图标为 -1 表示格子空了
+    {"t": "ok", "cmd": ..} / {"t": "error", "message": ..}   对控制命令的回复
+客户端可以发送的命令：
+    {"cmd": "turn", "direction": "up", "player": 0}    direction 为 up / down / left / right
+    {"cmd": "pause"} / {"cmd": "resume"} / {"cmd": "stop"}
+    {"cmd": "keyframe"}                                 重新同步
+control 为 False 时只允许 keyframe。
+
+背压：每个连接的发送缓冲超过上限时 asyncio 会暂停写入（pause_writing），
+之后的帧先放进这个连接自己的有界队列；队列也满了就清空它，改为在恢复写入时发送一个新的关键帧。
+慢的客户端只会丢掉中间帧，既不会让服务器的内存无限增长，也不会阻塞其他客户端和游戏线程。
+"""
+import asyncio
+import json
+import os
+import socket
+import threading
+import time
+from collections import deque
+
+from board import BORDER, EMPTY, FOOD, SNAKE
+from controls import KEY_DIRECTIONS
+
+KEYFRAME_INTERVAL = 50  # 每隔多少帧广播一次关键帧
+MAX_BACKLOG = 64  # 发送缓冲满了以后每个连接最多排队的帧数
+WRITE_BUFFER_LIMIT = 64 * 1024  # 每个连接的发送缓冲上限（字节）
+MAX_LINE = 4096  # 客户端一条命令的最大长度
+KINDS = {"empty": EMPTY, "snake": SNAKE, "border": BORDER, "food": FOOD}
+DIRECTION_NAMES = ("up", "down", "left", "right")
+
+
+def parse_address(text):
+    """"unix:/tmp/snake.sock" -> ("unix", 路径)；"8765" 或 "127.0.0.1:8765" -> ("tcp", 主机, 端口)。
+
+    TCP 没有给出主机时只监听 127.0.0.1。
+    """
+    if text.startswith("unix:"):
+        return ("unix", text[len("unix:") :])
+    host, _, port = text.rpartition(":")
+    return ("tcp", host or "127.0.0.1", int(port))
+
+
+def encode(message):
+    return json.dumps(message, separators=(",", ":")).encode() + b"\n"
+
+
+class BoardMirror:
+    """在游戏线程里跟踪每个格子上的图标，把一帧的移动换算成变化的 (格子, 种类, 图标) 列表。
+
+    placed 为已经摆好的 (图标编号, 网格 x, 网格 y)，例如引擎的 setup_moves（同一图标以最后一次为准）。
+    种类直接读 board.cells，所以只需要知道哪些格子变了：图标离开和到达的格子，
+    以及调用方另外给出的格子（例如吃到食物后种类从 FOOD 变成 SNAKE 的蛇头）。
+    """
+
+    def __init__(self, board, grid_info, placed):
+        self.kinds = board.cells
+        self.cols = grid_info["cols"]
+        self.rows = grid_info["rows"]
+        self.origin_x, self.origin_y = grid_info["origin_x"], grid_info["origin_y"]
+        self.size_x, self.size_y = grid_info["size_x"], grid_info["size_y"]
+        self.cell_icons = {}
+        self.icon_cells = {}
+        for icon_idx, grid_x, grid_y in placed:
+            self.place(icon_idx, grid_y * self.cols + grid_x, set())
+
+    def cell_of(self, x, y):
+        col = (x - self.origin_x) // self.size_x
+        row = (y - self.origin_y) // self.size_y
+        if 0 <= col < self.cols and 0 <= row < self.rows:
+            return row * self.cols + col
+        return -1
+
+    def place(self, icon_idx, cell, touched):
+        old = self.icon_cells.pop(icon_idx, -1)
+        if old >= 0:
+            if self.cell_icons.get(old) == icon_idx:
+                del self.cell_icons[old]
+            touched.add(old)
+        if cell >= 0:
+            self.cell_icons[cell] = icon_idx
+            self.icon_cells[icon_idx] = cell
+            touched.add(cell)
+
+    def changes(self, moves, cells=()):
+        """moves 为 (图标编号, 像素 x, 像素 y)，cells 为另外需要刷新的格子。"""
+        touched = set(cells)
+        for icon_idx, x, y in moves:
+            self.place(icon_idx, self.cell_of(x, y), touched)
+        kinds = self.kinds
+        icons = self.cell_icons
+        return [(cell, kinds[cell], icons.get(cell, -1)) for cell in touched]
+
+    def snapshot(self):
+        """全部非空的格子。"""
+        kinds = self.kinds
+        icons = self.cell_icons
+        cells = {cell for cell in range(len(kinds)) if kinds[cell] != EMPTY}
+        cells.update(icons)
+        return [(cell, kinds[cell], icons.get(cell, -1)) for cell in sorted(cells)]
+
+
+class ClientConnection(asyncio.Protocol):
+    """一个客户端连接。发送缓冲满时帧进入 backlog，backlog 也满了就改为下次发送关键帧。"""
+
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+        self.paused = False
+        self.backlog = deque()
+        self.resync = False
+        self.buffer = b""
+
+    def connection_made(self, transport):
+        self.transport = transport
+        sock = transport.get_extra_info("socket")
+        if sock is not None and sock.family != socket.AF_UNIX:
+            # 不让内核替卡住的客户端攒下几 MB 数据，背压尽早生效
+            sock.setsockopt(
+                socket.SOL_SOCKET, socket.SO_SNDBUF, self.server.write_buffer_limit
+            )
+        transport.set_write_buffer_limits(high=self.server.write_buffer_limit)
+        self.server.connected(self)
+
+    def connection_lost(self, exc):
+        self.server.disconnected(self)
+
+    def pause_writing(self):
+        self.paused = True
+
+    def resume_writing(self):
+        self.paused = False
+        self.flush()
+
+    def send(self, data):
+        if not self.paused:
+            self.transport.write(data)
+            self.server.bytes_sent += len(data)
+        elif self.resync:
+            self.server.dropped += 1
+        elif len(self.backlog) >= self.server.max_backlog:
+            self.server.dropped += len(self.backlog) + 1
+            self.server.resyncs += 1
+            self.backlog.clear()
+            self.resync = True
+        else:
+            self.backlog.append(data)
+
+    def flush(self):
+        if self.resync:
+            self.resync = False
+            self.send(self.server.keyframe())
+        while self.backlog and not self.paused:
+            self.send(self.backlog.popleft())
+
+    def data_received(self, data):
+        self.buffer += data
+        *lines, self.buffer = self.buffer.split(b"\n")
+        if len(self.buffer) > MAX_LINE:
+            self.transport.close()
+            return
+        for line in lines:
+            if line.strip():
+                reply = self.server.command(self, line)
+                if reply is not None:
+                    self.send(encode(reply))
+
+
+class GameServer:
+    """在后台线程里运行 asyncio 事件循环的观战和控制服务器。
+
+    address 见 parse_address；mirror 为 BoardMirror；controls 为 InputQueue 或 PlayerInputs，
+    control 为 False 时不接受控制命令。start() 之后游戏线程每帧调用 publish()，
+    paused 为客户端请求的暂停状态，由游戏循环检查。
+    """
+
+    def __init__(
+        self,
+        address,
+        mirror,
+        controls=None,
+        control=True,
+        keyframe_interval=KEYFRAME_INTERVAL,
+        max_backlog=MAX_BACKLOG,
+        write_buffer_limit=WRITE_BUFFER_LIMIT,
+    ):
+        self.address = parse_address(address) if isinstance(address, str) else address
+        self.mirror = mirror
+        self.controls = controls
+        self.control = control and controls is not None
+        self.keyframe_interval = keyframe_interval
+        self.max_backlog = max_backlog
+        self.write_buffer_limit = write_buffer_limit
+        self.paused = False
+
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.ready = threading.Event()
+        self.error = None
+        self.clients = set()
+
+        # 事件循环线程里的局面，用来生成关键帧
+        self.cells = {cell: (kind, icon) for cell, kind, icon in mirror.snapshot()}
+        self.tick = 0
+        self.status = {}
+        self.seq = 0
+        self.cached_keyframe = (-1, b"")
+        self.hello = encode(
+            {
+                "t": "hello",
+                "cols": mirror.cols,
+                "rows": mirror.rows,
+                "kinds": KINDS,
+                "keyframe_interval": keyframe_interval,
+                "control": self.control,
+            }
+        )
+
+        self.published = 0
+        self.publish_time = 0.0
+        self.max_publish_time = 0.0
+        self.frames = 0
+        self.keyframes = 0
+        self.bytes_sent = 0
+        self.dropped = 0  # 因为客户端太慢而没有发出的帧
+        self.resyncs = 0
+        self.commands = 0
+        self.peak_clients = 0
+
+    # --- 游戏线程 ---
+    def start(self):
+        """在后台线程里开始监听，绑定失败时抛出 OSError。"""
+        self.thread = threading.Thread(target=self.run, name="spectator", daemon=True)
+        self.thread.start()
+        self.ready.wait()
+        if self.error is not None:
+            self.thread.join()
+            raise self.error
+
+    def publish(self, tick, moves, cells=(), status=None):
+        """发布一帧：moves 为 (图标编号, 像素 x, 像素 y)，cells 为另外需要刷新的格子。
+
+        只在游戏线程里算出变化的格子，然后交给事件循环，不等待任何发送。
+        """
+        start = time.perf_counter()
+        changes = self.mirror.changes(moves, cells)
+        loop = self.loop
+        if loop is not None and not loop.is_closed():
+            try:
+                loop.call_soon_threadsafe(self.broadcast, tick, changes, status)
+            except RuntimeError:  # 事件循环正在关闭
+                pass
+        elapsed = time.perf_counter() - start
+        self.published += 1
+        self.publish_time += elapsed
+        self.max_publish_time = max(self.max_publish_time, elapsed)
+
+    def stop(self):
+        loop = self.loop
+        if loop is not None and self.thread.is_alive():
+            loop.call_soon_threadsafe(loop.stop)
+            self.thread.join()
+
+    def stats(self):
+        published = max(1, self.published)
+        return {
+            "clients": len(self.clients),
+            "peak_clients": self.peak_clients,
+            "frames": self.frames,
+            "keyframes": self.keyframes,
+            "bytes_sent": self.bytes_sent,
+            "dropped": self.dropped,
+            "resyncs": self.resyncs,
+            "commands": self.commands,
+            "mean_publish_us": self.publish_time / published * 1e6,
+            "max_publish_us": self.max_publish_time * 1e6,
+        }
+
+    # --- 事件循环线程 ---
+    def run(self):
+        loop = self.loop = asyncio.new_event_loop()
+        try:
+            self.server = loop.run_until_complete(self.listen())
+        except OSError as e:
+            self.error = e
+            self.ready.set()
+            loop.close()
+            return
+        self.ready.set()
+        try:
+            loop.run_forever()
+        finally:
+            self.server.close()
+            for client in list(self.clients):
+                client.transport.abort()
+            loop.run_until_complete(self.server.wait_closed())
+            loop.close()
+            if self.address[0] == "unix":
+                try:
+                    os.unlink(self.address[1])
+                except OSError:
+                    pass
+
+    async def listen(self):
+        if self.address[0] == "unix":
+            server = await self.loop.create_unix_server(
+                lambda: ClientConnection(self), self.address[1]
+            )
+        else:
+            _, host, port = self.address
+            server = await self.loop.create_server(
+                lambda: ClientConnection(self), host, port
+            )
+            # 端口为 0 时换成系统分配的端口
+            self.address = ("tcp", host, server.sockets[0].getsockname()[1])
+        return server
+
+    def describe(self):
+        if self.address[0] == "unix":
+            return f"unix:{self.address[1]}"
+        return f"{self.address[1]}:{self.address[2]}"
+
+    def connected(self, client):
+        self.clients.add(client)
+        self.peak_clients = max(self.peak_clients, len(self.clients))
+        client.send(self.hello)
+        client.send(self.keyframe())
+
+    def disconnected(self, client):
+        self.clients.discard(client)
+
+    def broadcast(self, tick, changes, status):
+        cells = self.cells
+        for cell, kind, icon in changes:
+            if kind == EMPTY and icon < 0:
+                cells.pop(cell, None)
+            else:
+                cells[cell] = (kind, icon)
+        self.tick = tick
+        if status is not None:
+            self.status = status
+        self.seq += 1
+        self.frames += 1
+        if self.seq % self.keyframe_interval == 0:
+            data = self.keyframe()
+        else:
+            data = encode(
+                {
+                    "t": "delta",
+                    "seq": self.seq,
+                    "tick": tick,
+                    "cells": changes,
+                    "status": self.current_status(),
+                }
+            )
+        for client in self.clients:
+            client.send(data)
+
+    def current_status(self):
+        return {**self.status, "paused": self.paused}
+
+    def keyframe(self):
+        """当前局面的关键帧，同一帧内只编码一次。"""
+        seq, data = self.cached_keyframe
+        if seq != self.seq:
+            self.keyframes += 1
+            data = encode(
+                {
+                    "t": "key",
+                    "seq": self.seq,
+                    "tick": self.tick,
+                    "cells": [
+                        (cell, kind, icon)
+                        for cell, (kind, icon) in sorted(self.cells.items())
+                    ],
+                    "status": self.current_status(),
+                }
+            )
+            self.cached_keyframe = (self.seq, data)
+        return data
+
+    def command(self, client, line):
+        """执行 client 发来的一条控制命令，返回回复（keyframe 命令直接回复关键帧，返回 None）。"""
+        self.commands += 1
+        try:
+            message = json.loads(line)
+            name = message["cmd"]
+        except (ValueError, KeyError, TypeError):
+            return {"t": "error", "message": "命令格式应为 {\"cmd\": ...}"}
+        if name == "keyframe":
+            client.send(self.keyframe())
+            return None
+        if not self.control:
+            return {"t": "error", "message": "只读连接，不接受控制命令"}
+        if name == "turn":
+            direction = message.get("direction")
+            if direction not in DIRECTION_NAMES:
+                return {"t": "error", "message": f"未知的方向: {direction}"}
+            queues = getattr(self.controls, "queues", [self.controls])
+            player = message.get("player", 0)
+            if not isinstance(player, int) or not 0 <= player < len(queues):
+                return {"t": "error", "message": f"没有玩家 {player}"}
+            queues[player].push(KEY_DIRECTIONS[direction])
+        elif name in ("pause", "resume"):
+            self.paused = name == "pause"
+            # 暂停期间游戏不发布新帧，单独广播一次状态
+            self.broadcast(self.tick, [], None)
+        elif name == "stop":
+            self.controls.request_stop()
+        else:
+            return {"t": "error", "message": f"未知的命令: {name}"}
+        return {"t": "ok", "cmd": name}
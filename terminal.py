@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""在终端里显示桌面的后端，不需要 Windows。
+
+TerminalDesktop 与 MemoryDesktop 一样把图标保存在模拟 ListView 里，
+另外用 TerminalView 把每个图标画成终端里的一个彩色方块（一个网格占两列字符）。
+每次写入只重画坐标变化的图标离开和到达的格子：脏格子按行列排序，
+同一行上相邻的格子省去光标移动，颜色不变时不重复输出颜色，整帧拼成一个字符串一次写出。
+最后一行是状态栏，显示帧数、本帧重画的格子数、输出字节数和渲染耗时。
+颜色沿用 Colors 的调色板；只用 ANSI 转义序列，不依赖 curses。
+"""
+import shutil
+import sys
+import time
+
+from backend import MemoryDesktop, column_layout
+from colors import Colors
+
+CELL_WIDTH = 2  # 每个网格占的字符列数，终端字符大约是 1:2 的长方形
+GLYPH = "██"
+BLANK = "  "
+PALETTE = (
+    Colors.OKGREEN,
+    Colors.OKCYAN,
+    Colors.OKBLUE,
+    Colors.WARNING,
+    Colors.HEADER,
+    Colors.FAIL,
+)
+
+ENTER_SCREEN = "\033[?1049h\033[?25l\033[2J"  # 切换到备用屏幕、隐藏光标、清屏
+LEAVE_SCREEN = Colors.ENDC + "\033[?25h\033[?1049l"
+CLEAR_LINE = "\033[2K"
+
+
+def move_to(row, col):
+    """把光标移到第 row 行第 col 列（从 0 开始）。"""
+    return f"\033[{row + 1};{col + 1}H"
+
+
+class TerminalView:
+    """按网格把图标画到终端上，只重画变化的格子。
+
+    spacing 为一个网格对应的像素，size 为可见的 (列数, 行数)，超出范围的图标不显示。
+    同一格有多个图标时显示最后到达的一个。stream 默认为进程真正的标准输出，
+    这样游戏期间的 print 被重定向时棋盘仍然可以画出来。
+    """
+
+    def __init__(self, spacing, size, stream=None, status=True):
+        self.size_x, self.size_y = spacing
+        self.cols, self.rows = size
+        self.stream = stream or sys.__stdout__
+        self.status = status
+        self.cells = {}  # 格子 -> 该格上的图标，最后一个在最上面
+        self.icon_cells = {}  # 图标编号 -> 格子
+        self.opened = False
+
+        self.frames = 0
+        self.cells_drawn = 0
+        self.bytes_written = 0
+        self.render_time = 0.0
+        self.max_render_time = 0.0
+
+    def cell_of(self, x, y):
+        col, row = x // self.size_x, y // self.size_y
+        if 0 <= col < self.cols and 0 <= row < self.rows:
+            return row * self.cols + col
+        return -1
+
+    def place(self, icon, x, y, dirty):
+        old = self.icon_cells.get(icon, -1)
+        new = self.cell_of(x, y)
+        if old == new:
+            return
+        if old >= 0:
+            icons = self.cells[old]
+            icons.remove(icon)
+            if not icons:
+                del self.cells[old]
+            dirty.add(old)
+        if new >= 0:
+            self.cells.setdefault(new, []).append(icon)
+            self.icon_cells[icon] = new
+            dirty.add(new)
+        else:
+            self.icon_cells.pop(icon, None)
+
+    def update(self, moves):
+        """按 (图标编号, 像素 x, 像素 y) 更新，只重画变化的格子。"""
+        dirty = set()
+        for icon, x, y in moves:
+            self.place(icon, x, y, dirty)
+        if self.opened:
+            self.draw(dirty)
+
+    def remap(self, mapping):
+        """图标索引变化后按 mapping[旧索引] = 新索引（-1 为已删除）更新，见 FrameWriter.remap。"""
+        size = len(mapping)
+        dirty = set()
+        cells = {}
+        icon_cells = {}
+        for cell, icons in self.cells.items():
+            kept = [mapping[i] for i in icons if i < size and mapping[i] >= 0]
+            if len(kept) != len(icons) or kept[-1:] != icons[-1:]:
+                dirty.add(cell)
+            if kept:
+                cells[cell] = kept
+                for icon in kept:
+                    icon_cells[icon] = cell
+        self.cells = cells
+        self.icon_cells = icon_cells
+        if self.opened:
+            self.draw(dirty)
+
+    def draw(self, dirty):
+        start = time.perf_counter()
+        cols = self.cols
+        cells = self.cells
+        parts = []
+        color = None
+        previous = -2
+        for cell in sorted(dirty):
+            row, col = divmod(cell, cols)
+            if cell != previous + 1 or col == 0:
+                parts.append(move_to(row, col * CELL_WIDTH))
+            icons = cells.get(cell)
+            if icons:
+                icon_color = PALETTE[icons[-1] % len(PALETTE)]
+                if icon_color != color:
+                    parts.append(icon_color)
+                    color = icon_color
+                parts.append(GLYPH)
+            else:
+                parts.append(BLANK)
+            previous = cell
+        if color is not None:
+            parts.append(Colors.ENDC)
+        self.frames += 1
+        self.cells_drawn += len(dirty)
+        elapsed = time.perf_counter() - start
+        if self.status:
+            parts.append(self.status_line(len(dirty), elapsed))
+        data = "".join(parts)
+        self.stream.write(data)
+        self.stream.flush()
+
+        elapsed = time.perf_counter() - start
+        self.bytes_written += len(data)
+        self.render_time += elapsed
+        self.max_render_time = max(self.max_render_time, elapsed)
+
+    def status_line(self, cells, elapsed):
+        return (
+            f"{move_to(self.rows, 0)}{CLEAR_LINE}{Colors.OKCYAN}"
+            f"帧 {self.frames}  重画 {cells} 格  渲染 {elapsed * 1e6:.0f} us  "
+            f"共 {len(self.icon_cells)} 个图标  ESC 退出{Colors.ENDC}"
+        )
+
+    def redraw(self):
+        """清屏后重画全部格子。"""
+        self.stream.write("\033[2J")
+        self.draw(set(self.cells))
+
+    def open(self):
+        """切换到备用屏幕并画出全部图标。"""
+        self.stream.write(ENTER_SCREEN)
+        self.opened = True
+        self.redraw()
+
+    def close(self):
+        if self.opened:
+            self.stream.write(LEAVE_SCREEN)
+            self.stream.flush()
+            self.opened = False
+
+    def stats(self):
+        frames = max(self.frames, 1)
+        return {
+            "frames": self.frames,
+            "cells_per_frame": self.cells_drawn / frames,
+            "bytes_per_frame": self.bytes_written / frames,
+            "mean_render_us": self.render_time / frames * 1e6,
+            "max_render_us": self.max_render_time * 1e6,
+        }
+
+
+class TerminalDesktop(MemoryDesktop):
+    """显示在终端里的模拟桌面：count 个图标按桌面默认的竖向排列摆好，屏幕大小由终端大小决定。
+
+    size 为可见的 (列数, 行数)，默认按当前终端大小（留出最后一行作为状态栏）。
+    其余参数见 MemoryDesktop。
+    """
+
+    def __init__(
+        self, count, spacing=(96, 104), size=None, stream=None, status=True, **kwargs
+    ):
+        if size is None:
+            terminal = shutil.get_terminal_size()
+            size = (max(1, terminal.columns // CELL_WIDTH), max(1, terminal.lines - 1))
+        screen_size = (size[0] * spacing[0], size[1] * spacing[1])
+        super().__init__(
+            column_layout(count, screen_size, spacing),
+            screen_size,
+            spacing=spacing,
+            **kwargs,
+        )
+        self.view = TerminalView(spacing, size, stream, status)
+        self.view.update(
+            (i, x, y) for i, (x, y) in enumerate(self.listview.positions)
+        )
+        self.view.open()
+
+    def write_positions(self, moves):
+        moves = list(moves)
+        # 上一帧超时、这一帧重试的移动也要重画
+        indices = [index for index, _, _ in moves]
+        indices.extend(self.writer.pending)
+        writes = super().write_positions(moves)
+        positions = self.listview.positions
+        self.view.update(
+            (index, *positions[index]) for index in indices if index < len(positions)
+        )
+        return writes
+
+    def remap_indices(self, mapping):
+        super().remap_indices(mapping)
+        self.view.remap(mapping)
+
+    def close(self):
+        super().close()
+        self.view.close()
@@ -1,97 +1,334 @@
-import win32gui
-import win32api
-import win32con
-import win32process
-import commctrl
-import ctypes #  提供与C语言兼容的数据类型和函数调用
-from ctypes import wintypes
-
-# 定义一些需要的Win32函数和结构体，因为pywin32没有完全封装它们
-kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
-
-# 定义API函数的参数和返回类型
-kernel32.VirtualAllocEx.restype = wintypes.LPVOID #  VirtualAllocEx函数的返回值类型设置为LPVOID（指向void的指针）
-kernel32.VirtualAllocEx.argtypes = (wintypes.HANDLE, wintypes.LPVOID, ctypes.c_size_t, wintypes.DWORD, wintypes.DWORD) #  VirtualAllocEx函数的参数类型设置：进程句柄、分配基址、大小、分配类型、保护属性
-kernel32.VirtualFreeEx.argtypes = (wintypes.HANDLE, wintypes.LPVOID, ctypes.c_size_t, wintypes.DWORD) #  VirtualFreeEx函数的参数类型设置：进程句柄、要释放的内存地址、大小、释放类型
-kernel32.ReadProcessMemory.argtypes = (wintypes.HANDLE, wintypes.LPCVOID, wintypes.LPVOID, ctypes.c_size_t, ctypes.POINTER(ctypes.c_size_t)) #  ReadProcessMemory函数的参数类型设置：进程句柄、要读取的内存地址、存储数据的缓冲区、要读取的字节数、实际读取字节数的指针
-
-# 定义POINT结构体
-class POINT(ctypes.Structure):
-    _fields_ = [("x", wintypes.LONG),
-                ("y", wintypes.LONG)]
-
-def get_icon_position(h_listview, index):
-    """获取指定索引的图标的位置（使用跨进程内存方法）。"""
-    if not h_listview:
-        return None, None
-
-    # 1. 获取目标进程句柄
-    tid, pid = win32process.GetWindowThreadProcessId(h_listview) #  获取explorer的线程ID和进程ID
-    h_process = kernel32.OpenProcess(
-        win32con.PROCESS_VM_OPERATION | win32con.PROCESS_VM_READ | win32con.PROCESS_VM_WRITE, #  请求进程访问权限（内存操作、读取、写入）
-        False,
-        pid
-    )
-    if not h_process:
-        print(f"打开进程失败: {ctypes.get_last_error()}")
-        return None, None
+# -*- coding: utf-8 -*-
+"""桌面后端的往返延迟探测。
+
+逐个测量游戏用到的 Win32 原语的耗时：
+    find_window          FindWindow / FindWindowEx 查找桌面 ListView
+    item_count           LVM_GETITEMCOUNT
+    read_position        旧的逐个读取：打开进程、分配远程内存、LVM_GETITEMPOSITION、读取、释放
+    read_all_positions   IconPositionReader 一次读取全部坐标（复用进程句柄和远程内存）
+    set_position         单独一条 LVM_SETITEMPOSITION（不暂停重绘）
+    set_position_frame   FrameWriter 暂停重绘后写入一帧 --frame-moves 个移动
+    alloc_free           VirtualAllocEx + VirtualFreeEx
+写入时把图标写回它当前的位置，桌面不会有可见的变化。
+--load 指定后台负载线程数（不停地发送 LVM_GETITEMCOUNT，与游戏争用 Explorer），
+每个负载分别统计分位数，结果和由此推荐的游戏参数写入延迟画像（见 latency_profile）。
+
+没有 Windows 时用 --simulate 在模拟桌面上运行，消息和远程内存调用的耗时由分布描述：
+    50us                      固定耗时
+    uniform:20us,200us        均匀分布
+    lognormal:40us,0.6        对数正态分布（中位数, sigma）
+    spiky:20us,30ms,0.05      大多数耗时 20us，5% 的调用卡顿 30ms
+
+用法:
+    python test_winapi.py                                  # 探测真实桌面（需要 Windows）
+    python test_winapi.py --simulate --latency lognormal:40us,0.6 --load 0,2,4
+"""
+import argparse
+import math
+import random
+import threading
+import time
+
+from backend import synthetic_desktop
+from latency_profile import DEFAULT_PATH, make_profile, save_profile, summarize
+from listview import (
+    LVM_GETITEMCOUNT,
+    LVM_GETITEMPOSITION,
+    LVM_SETITEMPOSITION,
+    POINT_SIZE,
+    FrameWriter,
+    IconPositionReader,
+    iter_points,
+    make_lparam,
+)
+
+PRIMITIVES = (
+    "find_window",
+    "item_count",
+    "read_position",
+    "read_all_positions",
+    "set_position",
+    "set_position_frame",
+    "alloc_free",
+)
+FRAME_MOVES = 4  # 一帧典型的移动数（蛇头、蛇尾和食物）
+UNITS = {"us": 1e-6, "ms": 1e-3, "s": 1.0}
+
+
+# --- 模拟耗时分布 ---
+def parse_duration(text):
+    """"50us" / "2.5ms" / "0.1s" -> 秒，没有单位时按秒。"""
+    text = text.strip()
+    for unit in ("us", "ms", "s"):
+        if text.endswith(unit):
+            return float(text[: -len(unit)]) * UNITS[unit]
+    return float(text)
+
+
+def latency_distribution(spec, seed=0):
+    """按 spec（格式见模块说明）返回每次调用时给出耗时的函数，固定耗时直接返回秒数。"""
+    kind, _, args = spec.partition(":")
+    if not args:
+        return parse_duration(kind)
+    args = args.split(",")
+    rng = random.Random(seed)
+    if kind == "fixed":
+        return parse_duration(args[0])
+    if kind == "uniform":
+        low, high = parse_duration(args[0]), parse_duration(args[1])
+        return lambda: rng.uniform(low, high)
+    if kind == "lognormal":
+        mu, sigma = math.log(parse_duration(args[0])), float(args[1])
+        return lambda: rng.lognormvariate(mu, sigma)
+    if kind == "spiky":
+        base, spike = parse_duration(args[0]), parse_duration(args[1])
+        rate = float(args[2])
+        return lambda: spike if rng.random() < rate else base
+    raise ValueError(f"未知的耗时分布: {spec}")
+
+
+class SimulatedWindows:
+    """模拟桌面的窗口查找：FindWindow 加两次 FindWindowEx，每次按消息耗时计。"""
+
+    def __init__(self, listview):
+        self.listview = listview
+
+    def find_listview(self):
+        for name in ("FindWindow", "FindWindowEx", "FindWindowEx"):
+            self.listview.calls[name] += 1
+            if self.listview.latency:
+                self.listview.delay(self.listview.latency)
+        return self.listview
+
 
+class Win32Windows:
+    def find_listview(self):
+        from win32_desktop import find_desktop_listview
+
+        return find_desktop_listview()
+
+
+# --- 探测 ---
+def read_position_per_icon(listview, index):
+    """旧实现的调用模式：为一个图标单独打开进程、分配远程内存。"""
+    h_process = listview.open_process()
+    p_buffer = listview.alloc(h_process, POINT_SIZE)
     try:
-        # 2. 在远程进程中分配内存
-        p_remote_buffer = kernel32.VirtualAllocEx( #  在explorer进程中分配内存
-            h_process,
-            0, #  让系统决定内存分配地址
-            ctypes.sizeof(POINT), #  分配的内存大小（POINT结构体的大小）
-            win32con.MEM_COMMIT | win32con.MEM_RESERVE, #  内存分配标志：提交和保留内存
-            win32con.PAGE_READWRITE #  内存页权限可读可写
-        )
-        if not p_remote_buffer:
-            print(f"远程内存分配失败: {ctypes.get_last_error()}")
-            return None, None
-
-        # 3. 发送消息，lParam是远程内存的地址
-        result = win32gui.SendMessage(h_listview, commctrl.LVM_GETITEMPOSITION, index, p_remote_buffer)
-        
-        if result == 0: # 返回值为布尔型，0代表失败
-            print(f"SendMessage LVM_GETITEMPOSITION for icon {index} failed.")
-            return None, None
-
-        # 4. 从远程进程读取数据
-        local_point = POINT()
-        bytes_read = ctypes.c_size_t(0)
-        
-        if not kernel32.ReadProcessMemory(
-            h_process,
-            p_remote_buffer,
-            ctypes.byref(local_point),
-            ctypes.sizeof(local_point),
-            ctypes.byref(bytes_read)
-        ):
-            print(f"读取远程内存失败: {ctypes.get_last_error()}")
-            return None, None
-            
-        return local_point.x, local_point.y
+        listview.send_message(LVM_GETITEMPOSITION, index, p_buffer)
+        return listview.read(h_process, p_buffer, POINT_SIZE)
+    finally:
+        listview.free(h_process, p_buffer)
+        listview.close(h_process)
+
+
+def timed(call, samples):
+    """调用 samples 次，返回每次的耗时（秒）。"""
+    clock = time.perf_counter
+    durations = []
+    for i in range(samples):
+        start = clock()
+        call(i)
+        durations.append(clock() - start)
+    return durations
+
 
+class LoadThreads:
+    """后台不停发送 LVM_GETITEMCOUNT 的线程，模拟与游戏争用 Explorer 的负载。"""
+
+    def __init__(self, listview, threads):
+        self.listview = listview
+        self.stopping = threading.Event()
+        self.threads = [
+            threading.Thread(target=self.run, name=f"probe-load-{i}", daemon=True)
+            for i in range(threads)
+        ]
+
+    def run(self):
+        while not self.stopping.is_set():
+            self.listview.send_message(LVM_GETITEMCOUNT, 0, 0)
+
+    def __enter__(self):
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopping.set()
+        for thread in self.threads:
+            thread.join()
+        return False
+
+
+def probe(windows, listview, samples, frame_moves=FRAME_MOVES):
+    """测量全部原语，返回 {原语: summarize 的结果}。"""
+    reader = IconPositionReader(listview)
+    try:
+        count = listview.item_count()
+        points = list(iter_points(reader.read_all_positions(count)))
+        if not points:
+            raise OSError("桌面上没有可以读取坐标的图标")
+        h_process = reader.h_process
+
+        def set_position(i):
+            index, x, y = points[i % len(points)]
+            listview.send_message(LVM_SETITEMPOSITION, index, make_lparam(x, y))
+
+        def set_position_frame(i):
+            # 新的 FrameWriter 不知道图标的当前位置，写回原位也会真正发送
+            writer = FrameWriter(listview)
+            for k in range(frame_moves):
+                writer.move(*points[(i * frame_moves + k) % len(points)])
+            writer.flush()
+
+        def alloc_free(i):
+            listview.free(h_process, listview.alloc(h_process, POINT_SIZE))
+
+        return {
+            "find_window": summarize(timed(lambda i: windows.find_listview(), samples)),
+            "item_count": summarize(timed(lambda i: listview.item_count(), samples)),
+            "read_position": summarize(
+                timed(lambda i: read_position_per_icon(listview, i % count), samples)
+            ),
+            "read_all_positions": summarize(
+                timed(
+                    lambda i: reader.read_all_positions(count), max(5, samples // 20)
+                )
+            ),
+            "set_position": summarize(timed(set_position, samples)),
+            "set_position_frame": summarize(timed(set_position_frame, samples)),
+            "alloc_free": summarize(timed(alloc_free, samples)),
+        }
     finally:
-        # 5. 释放远程内存和进程句柄
-        if 'p_remote_buffer' in locals() and p_remote_buffer:
-            kernel32.VirtualFreeEx(h_process, p_remote_buffer, 0, win32con.MEM_RELEASE)
-        if h_process:
-            kernel32.CloseHandle(h_process)
-
-
-# --- 测试代码 ---
-def test_positions():
-    h_progman = win32gui.FindWindow("Progman", None)
-    h_shelldll = win32gui.FindWindowEx(h_progman, 0, "SHELLDLL_DefView", None)
-    h_listview = win32gui.FindWindowEx(h_shelldll, 0, "SysListView32", "FolderView")
-    
-    icon_count = win32gui.SendMessage(h_listview, commctrl.LVM_GETITEMCOUNT, 0, 0)
-    print(f"找到 {icon_count} 个图标。")
-
-    for i in range(icon_count):
-        pos = get_icon_position(h_listview, i)
-        print(f"图标 {i} 的位置是: {pos}")
+        reader.close()
+
+
+def run_probe(windows, listview, loads=(0,), samples=200, frame_moves=FRAME_MOVES):
+    """在每种负载下分别探测，返回 {负载线程数: probe 的结果}。"""
+    results = {}
+    for threads in loads:
+        with LoadThreads(listview, threads):
+            results[threads] = probe(windows, listview, samples, frame_moves)
+    return results
+
+
+def print_results(loads, count):
+    for threads, stats in loads.items():
+        print(f"[负载 {threads} 个线程]")
+        for name in PRIMITIVES:
+            s = stats[name]
+            print(
+                f"  {name:<20} p50 {s['p50_us']:9.1f} us  p90 {s['p90_us']:9.1f} us  "
+                f"p99 {s['p99_us']:9.1f} us  max {s['max_us']:9.1f} us  "
+                f"(n={s['count']})"
+            )
+        scan = stats["read_all_positions"]["mean_us"]
+        print(f"  批量读取平均每个图标 {scan / max(count, 1):.2f} us")
+
+
+def print_recommended(recommended):
+    print("推荐的游戏参数:")
+    print(f"  --send-timeout {recommended['send_timeout_ms']}")
+    print(
+        f"  --setup-frames {recommended['setup_frames']}"
+        f"（整个场地预计写入 {recommended['layout_ms']:.1f} ms）"
+    )
+    print(
+        f"  最多追赶 {recommended['max_catch_up']} 帧"
+        f"（一帧写入 p99 {recommended['frame_p99_ms']:.2f} ms）"
+    )
+    speedup = recommended["scan_speedup"]
+    if speedup >= 1:
+        print(f"  批量读取比逐个读取快 {speedup:.1f} 倍")
+    else:
+        print(f"  批量读取比逐个读取慢 {1 / speedup:.1f} 倍")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="测量桌面后端各个 Win32 原语的往返耗时。")
+    parser.add_argument(
+        "--simulate",
+        action="store_true",
+        help="在模拟桌面上运行（不需要 Windows）",
+    )
+    parser.add_argument(
+        "--icons", type=int, default=200, help="模拟桌面的图标数量（默认 200）"
+    )
+    parser.add_argument(
+        "--latency",
+        default="0",
+        metavar="SPEC",
+        help="模拟桌面每条消息的耗时分布，例如 50us、lognormal:40us,0.6（默认 0）",
+    )
+    parser.add_argument(
+        "--memory-latency",
+        default="0",
+        metavar="SPEC",
+        help="模拟桌面每次远程内存调用的耗时分布（默认 0）",
+    )
+    parser.add_argument(
+        "--load",
+        default="0",
+        metavar="N,N",
+        help="后台负载线程数，逗号分隔时依次在每种负载下测量（默认 0）",
+    )
+    parser.add_argument(
+        "--samples", type=int, default=200, help="每个原语的测量次数（默认 200）"
+    )
+    parser.add_argument(
+        "--frame-moves",
+        type=int,
+        default=FRAME_MOVES,
+        help=f"set_position_frame 每帧的移动数（默认 {FRAME_MOVES}）",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="模拟耗时分布的随机种子（默认 0）"
+    )
+    parser.add_argument(
+        "--output",
+        default=DEFAULT_PATH,
+        metavar="PATH",
+        help="延迟画像的保存位置，snake.py 默认从这里读取（--simulate 时默认不保存）",
+    )
+    args = parser.parse_args()
+    loads = [int(n) for n in args.load.split(",")]
+
+    if args.simulate:
+        backend = synthetic_desktop(
+            args.icons,
+            latency=latency_distribution(args.latency, args.seed),
+            memory_latency=latency_distribution(args.memory_latency, args.seed + 1),
+        )
+        listview = backend.listview
+        windows = SimulatedWindows(listview)
+        output = None if args.output == DEFAULT_PATH else args.output
+    else:
+        from win32_desktop import Win32ListView
+
+        windows = Win32Windows()
+        h_listview = windows.find_listview()
+        if not h_listview:
+            print("错误: 找不到'SysListView32'窗口。")
+            return 1
+        listview = Win32ListView(h_listview)
+        output = args.output
+
+    count = listview.item_count()
+    print(f"找到 {count} 个图标，每个原语测量 {args.samples} 次。")
+    results = run_probe(windows, listview, loads, args.samples, args.frame_moves)
+    print_results(results, count)
+    profile = make_profile(
+        "simulated" if args.simulate else "win32",
+        results,
+        count,
+        args.samples,
+        args.frame_moves,
+    )
+    print_recommended(profile["recommended"])
+    if output:
+        save_profile(profile, output)
+        print(f"延迟画像已保存到 {output}")
+    return 0
+
 
 if __name__ == "__main__":
-    test_positions()
\ No newline at end of file
+    raise SystemExit(main())
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""热路径的耗时统计与 Chrome trace 导出。
+
+关闭时（默认）instrument() 什么都不替换，span() 返回一个共享的空上下文，
+因此几乎没有开销。打开后每个 span 记录一个延迟直方图（按 2 的幂分桶，单位微秒），
+并保留最近的若干事件，可以导出为 chrome://tracing / Perfetto 能打开的 JSON。
+"""
+import functools
+import json
+import threading
+import time
+from collections import Counter, deque
+
+
+class SpanStats:
+    """一个 span 的计数、总耗时、最大耗时和对数直方图。"""
+
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = Counter()  # 桶 k 表示 [2^(k-1), 2^k) 微秒
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[int(seconds * 1e6).bit_length()] += 1
+
+    def percentile(self, fraction):
+        """按直方图估计分位数（取桶的上界），单位秒。"""
+        target = self.count * fraction
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= target:
+                return min(self.max, (1 << bucket) / 1e6)
+        return self.max
+
+
+class NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class Span:
+    __slots__ = ("tracer", "name", "start")
+
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.tracer.record(self.name, self.start, time.perf_counter())
+        return False
+
+
+class Tracer:
+    def __init__(self, enabled=False, max_events=200000):
+        self.enabled = enabled
+        self.epoch = time.perf_counter()
+        self.spans = {}
+        self.counters = Counter()
+        self.events = deque(maxlen=max_events)
+        self.lock = threading.Lock()
+
+    def span(self, name):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name)
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self.counters[name] += n
+
+    def record(self, name, start, end):
+        with self.lock:
+            stats = self.spans.get(name)
+            if stats is None:
+                stats = self.spans[name] = SpanStats()
+            stats.add(end - start)
+            self.events.append((name, start, end - start, threading.get_ident()))
+
+    def wrap(self, func, name):
+        """返回记录 name span 的 func 包装。"""
+
+        @functools.wraps(func)
+        def traced(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.record(name, start, time.perf_counter())
+
+        return traced
+
+    def instrument(self, target, attribute, name=None):
+        """把 target 上的函数或方法替换为带统计的版本；关闭时不做任何替换。"""
+        if not self.enabled:
+            return
+        func = getattr(target, attribute)
+        setattr(target, attribute, self.wrap(func, name or attribute))
+
+    def chrome_trace(self):
+        """Chrome trace-event 格式的 dict。"""
+        with self.lock:
+            events = [
+                {
+                    "name": name,
+                    "ph": "X",
+                    "ts": (start - self.epoch) * 1e6,
+                    "dur": duration * 1e6,
+                    "pid": 0,
+                    "tid": tid,
+                }
+                for name, start, duration, tid in self.events
+            ]
+        for name, value in self.counters.items():
+            events.append(
+                {
+                    "name": name,
+                    "ph": "C",
+                    "ts": (time.perf_counter() - self.epoch) * 1e6,
+                    "pid": 0,
+                    "args": {"value": value},
+                }
+            )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export_chrome(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(), f)
+
+    def summary(self):
+        """每个 span 一行的文字汇总，按总耗时降序。"""
+        lines = []
+        for name, stats in sorted(
+            self.spans.items(), key=lambda item: item[1].total, reverse=True
+        ):
+            lines.append(
+                f"{name:<28} {stats.count:>8} 次  "
+                f"平均 {stats.total / stats.count * 1e6:9.1f} us  "
+                f"p50 {stats.percentile(0.5) * 1e6:9.1f} us  "
+                f"p99 {stats.percentile(0.99) * 1e6:9.1f} us  "
+                f"最大 {stats.max * 1e6:9.1f} us"
+            )
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"{name:<28} {value:>8}")
+        return lines
+
+
+def instrument_backend(tracer, backend):
+    """给一个 ListViewDesktop 的读写路径和底层 Win32 调用加上统计。"""
+    for attribute in (
+        "icon_count",
+        "read_positions",
+        "read_identities",
+        "write_positions",
+    ):
+        tracer.instrument(backend, attribute, f"backend.{attribute}")
+    listview = backend.listview
+    for attribute, name in (
+        ("send_message", "SendMessage"),
+        ("send_message_timeout", "SendMessage"),
+        ("open_process", "OpenProcess"),
+        ("alloc", "VirtualAllocEx"),
+        ("read", "ReadProcessMemory"),
+        ("write", "WriteProcessMemory"),
+        ("free", "VirtualFreeEx"),
+        ("invalidate", "InvalidateRect"),
+    ):
+        if hasattr(listview, attribute):
+            tracer.instrument(listview, attribute, f"win32.{name}")
+
+
+tracer = Tracer()
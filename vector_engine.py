@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+"""用 NumPy 同步推进成千上万局独立的对局。
+
+VectorEngine 的规则与 SnakeEngine 完全相同，同样的种子和输入得到逐帧相同的局面：
+每一局的初始状态直接取自对应种子的 SnakeEngine，之后所有局的占用网格、蛇头、方向、
+蛇身环形缓冲区和空闲格集合都放在二维数组里，移动、碰撞检测和变长按整批数组运算完成。
+
+只有吃到食物的那些局要逐个处理边界和食物区，并用各自的 random.Random 抽取新的食物位置
+（必须与 SnakeEngine 调用同一个随机数生成器才能得到相同的结果）；吃到食物的帧很少，
+这部分不影响整体吞吐量。
+
+需要 NumPy。
+"""
+import hashlib
+from array import array
+
+import numpy as np
+
+from board import BORDER, EMPTY, FOOD, FOOD_MARGIN, SNAKE
+from engine import SnakeEngine
+from recording import DIRECTIONS, GAME_OVER_CODES
+
+DX = np.array([dx for dx, dy in DIRECTIONS], dtype=np.int32)
+DY = np.array([dy for dx, dy in DIRECTIONS], dtype=np.int32)
+OPPOSITE = np.array(
+    [DIRECTIONS.index((-dx, -dy)) for dx, dy in DIRECTIONS], dtype=np.int8
+)
+NO_ACTION = -1  # actions 中表示保持当前方向
+
+WALL_CODE, SELF_CODE, BORDER_CODE, WON_CODE, FULL_CODE = range(1, 6)
+
+
+class VectorEngine:
+    """len(seeds) 局同步进行的贪吃蛇，每局的参数与 SnakeEngine(cols, rows, icons, seed) 相同。
+
+    方向和结束原因都用编号表示：方向为 recording.DIRECTIONS 中的下标，
+    结束原因为 recording.GAME_OVER_CODES 中的下标（0 表示还在进行）。
+    """
+
+    def __init__(self, cols, rows, icons, seeds):
+        icons = list(icons)
+        seeds = list(seeds)
+        count = len(seeds)
+        size = cols * rows
+        self.cols = cols
+        self.rows = rows
+        self.count = count
+
+        self.cells = np.zeros((count, size), dtype=np.uint8)
+        self.body = np.zeros((count, size), dtype=np.int32)  # 蛇身格子的环形缓冲区
+        self.body_icons = np.zeros((count, size), dtype=np.int32)
+        self.head_slot = np.zeros(count, dtype=np.int64)  # 蛇头在环形缓冲区中的位置
+        self.length = np.zeros(count, dtype=np.int64)
+        self.direction = np.zeros(count, dtype=np.int8)
+        self.ticks = np.zeros(count, dtype=np.int64)
+        self.game_over = np.zeros(count, dtype=np.int8)
+        self.food = np.zeros(count, dtype=np.int64)  # 食物所在格子，没有食物时为 -1
+        self.food_index = np.zeros(count, dtype=np.int64)
+        self.max_food_x = np.zeros(count, dtype=np.int64)  # 食物区最右一列
+
+        # 空闲格集合，与 FreeCellSet 相同的紧凑数组 + 反向下标，保证抽样结果一致
+        self.free_cells = np.zeros((count, size), dtype=np.int32)
+        self.free_slots = np.full((count, size), -1, dtype=np.int32)
+        self.free_count = np.zeros(count, dtype=np.int64)
+
+        # 场地布局与种子无关，所以每局的边界栈和等待成为食物的图标都相同，
+        # 只需各自记录已经取走了多少个
+        self.border_top = np.zeros(count, dtype=np.int64)  # 边界栈中剩余的数量
+        self.border_counts = np.zeros((count, cols + 1), dtype=np.int64)
+        self.border_x_boundary = np.zeros(count, dtype=np.int64)
+        self.waiting_next = np.zeros(count, dtype=np.int64)  # 下一个成为食物的图标
+        self.rngs = []
+
+        for b, seed in enumerate(seeds):
+            engine = SnakeEngine(cols, rows, icons, seed)
+            board = engine.board
+            self.cells[b] = np.frombuffer(board.cells, dtype=np.uint8)
+            free = np.frombuffer(board.free.cells, dtype=np.int32)
+            self.free_cells[b, : len(free)] = free
+            self.free_slots[b] = np.frombuffer(board.free.slots, dtype=np.int32)
+            self.free_count[b] = len(free)
+            length = engine.length
+            for i, (cell, icon_idx) in enumerate(engine.body.segments()):
+                self.body[b, length - 1 - i] = cell
+                self.body_icons[b, length - 1 - i] = icon_idx
+            self.head_slot[b] = length - 1
+            self.length[b] = length
+            self.direction[b] = DIRECTIONS.index(engine.direction)
+            self.food[b] = engine.food_cell
+            self.food_index[b] = engine.food_index
+            self.border_top[b] = len(board.border_stack)
+            self.border_counts[b] = board.border_counts
+            self.border_x_boundary[b] = board.border_x_boundary
+            self.max_food_x[b] = board.max_food_x
+            self.rngs.append(engine.rng)
+        self.border_stack = np.array(
+            [y * cols + x for x, y in board.border_stack], dtype=np.int64
+        )
+        self.waiting_icons = np.array(engine.waiting_icons, dtype=np.int64)
+
+    def free_add(self, boards, cells):
+        """把 cells 加入各自局的空闲格集合（boards 互不相同），已在集合中的跳过。"""
+        keep = self.free_slots[boards, cells] < 0
+        boards, cells = boards[keep], cells[keep]
+        slots = self.free_count[boards]
+        self.free_cells[boards, slots] = cells
+        self.free_slots[boards, cells] = slots
+        self.free_count[boards] += 1
+
+    def free_discard(self, boards, cells):
+        """从各自局的空闲格集合中删除 cells（boards 互不相同），用最后一个元素填补空位。"""
+        slots = self.free_slots[boards, cells]
+        keep = slots >= 0
+        boards, cells, slots = boards[keep], cells[keep], slots[keep]
+        last_slots = self.free_count[boards] - 1
+        last = self.free_cells[boards, last_slots]
+        self.free_cells[boards, slots] = last
+        self.free_slots[boards, last] = slots
+        self.free_slots[boards, cells] = -1
+        self.free_count[boards] = last_slots
+
+    def step(self, actions=None):
+        """所有未结束的局推进一帧。actions 为每局的方向编号，NO_ACTION 表示保持方向。"""
+        cols, rows = self.cols, self.rows
+        live = np.flatnonzero(self.game_over == 0)
+        if live.size == 0:
+            return
+        self.ticks[live] += 1
+
+        if actions is not None:
+            action = np.asarray(actions)[live]
+            turn = (action >= 0) & (action != OPPOSITE[self.direction[live]])
+            self.direction[live[turn]] = action[turn]
+
+        direction = self.direction[live]
+        head = self.body[live, self.head_slot[live]]
+        x = head % cols + DX[direction]
+        y = head // cols + DY[direction]
+
+        wall = (x < 0) | (x >= cols) | (y < 0) | (y >= rows)
+        self.game_over[live[wall]] = WALL_CODE
+        inside = ~wall
+        live = live[inside]
+        new_head = (y * cols + x)[inside]
+
+        state = self.cells[live, new_head]
+        self.game_over[live[state == SNAKE]] = SELF_CODE
+        self.game_over[live[state == BORDER]] = BORDER_CODE
+        moving = (state == EMPTY) | (state == FOOD)
+        live, new_head, state = live[moving], new_head[moving], state[moving]
+
+        # 没吃到食物：尾巴移到新的蛇头位置
+        ate = state == FOOD
+        boards, target = live[~ate], new_head[~ate]
+        capacity = self.cells.shape[1]
+        tail_slot = (self.head_slot[boards] - self.length[boards] + 1) % capacity
+        tail = self.body[boards, tail_slot]
+        tail_icon = self.body_icons[boards, tail_slot]
+        self.cells[boards, tail] = EMPTY
+        in_zone = tail % cols <= self.max_food_x[boards]
+        self.free_add(boards[in_zone], tail[in_zone])
+        self.cells[boards, target] = SNAKE
+        self.free_discard(boards, target)
+        self.push_head(boards, target, tail_icon)
+
+        # 吃到食物：蛇头前进一格，蛇身变长，食物图标成为新的蛇头
+        boards, target = live[ate], new_head[ate]
+        self.cells[boards, target] = SNAKE
+        self.free_discard(boards, target)
+        self.push_head(boards, target, self.food_index[boards])
+        self.length[boards] += 1
+        self.respawn_food(boards)
+
+    def push_head(self, boards, cells, icons):
+        slots = (self.head_slot[boards] + 1) % self.cells.shape[1]
+        self.head_slot[boards] = slots
+        self.body[boards, slots] = cells
+        self.body_icons[boards, slots] = icons
+
+    def respawn_food(self, boards):
+        """吃到食物的各局：取下一个图标作为食物，移走一个边界图标，扩大食物区，放置食物。
+
+        每一步都对所有这些局整批执行，各局内部的先后顺序与 SnakeEngine 相同。
+        """
+        cols, rows = self.cols, self.rows
+        won = self.waiting_next[boards] >= len(self.waiting_icons)
+        self.game_over[boards[won]] = WON_CODE
+        boards = boards[~won]
+        self.food_index[boards] = self.waiting_icons[self.waiting_next[boards]]
+        self.waiting_next[boards] += 1
+
+        # 移走最后摆放的边界图标，最左侧边界列随之右移
+        popping = boards[self.border_top[boards] > 0]
+        self.border_top[popping] -= 1
+        cells = self.border_stack[self.border_top[popping]]
+        x = cells % cols
+        self.cells[popping, cells] = EMPTY
+        in_zone = x <= self.max_food_x[popping]
+        self.free_add(popping[in_zone], cells[in_zone])
+        self.border_counts[popping, x] -= 1
+        while popping.size:
+            boundary = self.border_x_boundary[popping]
+            advance = (boundary < cols) & (self.border_counts[popping, boundary] == 0)
+            popping = popping[advance]
+            self.border_x_boundary[popping] += 1
+
+        # 新纳入食物区的列中的空格按列、再按行的顺序加入空闲格集合（每 rows 次才有一次）
+        max_food_x = np.clip(self.border_x_boundary[boards] - FOOD_MARGIN, 0, cols - 1)
+        for b, new_max in zip(boards.tolist(), max_food_x.tolist()):
+            first = int(self.max_food_x[b]) + 1
+            if new_max < first:
+                continue
+            columns = np.arange(first, new_max + 1)
+            ids = (np.arange(rows)[None, :] * cols + columns[:, None]).ravel()
+            ids = ids[self.cells[b, ids] == EMPTY]
+            start = self.free_count[b]
+            self.free_cells[b, start : start + len(ids)] = ids
+            self.free_slots[b, ids] = np.arange(start, start + len(ids))
+            self.free_count[b] = start + len(ids)
+            self.max_food_x[b] = new_max
+
+        # 各局用自己的随机数生成器抽取食物位置
+        counts = self.free_count[boards]
+        full = counts == 0
+        self.food[boards[full]] = -1
+        self.game_over[boards[full]] = FULL_CODE
+        boards, counts = boards[~full], counts[~full]
+        rngs = self.rngs
+        picks = np.array(
+            [rngs[b].randrange(n) for b, n in zip(boards.tolist(), counts.tolist())],
+            dtype=np.int64,
+        )
+        cells = self.free_cells[boards, picks]
+        self.cells[boards, cells] = FOOD
+        self.free_discard(boards, cells)
+        self.food[boards] = cells
+
+    def snake_cells(self, b):
+        """第 b 局从蛇头到蛇尾的格子编号和图标编号。"""
+        slots = (self.head_slot[b] - np.arange(self.length[b])) % self.cells.shape[1]
+        return self.body[b, slots], self.body_icons[b, slots]
+
+    def game_over_reason(self, b):
+        return GAME_OVER_CODES[self.game_over[b]]
+
+    def state_hash(self, b):
+        """与 SnakeEngine.state_hash 相同的摘要，用于逐局比对。"""
+        dx, dy = DIRECTIONS[self.direction[b]]
+        state = array("i", (int(self.ticks[b]), dx, dy, int(self.food_index[b])))
+        food = int(self.food[b])
+        state.extend(divmod(food, self.cols)[::-1] if food >= 0 else (-1, -1))
+        cells, icons = self.snake_cells(b)
+        for cell, icon_idx in zip(cells.tolist(), icons.tolist()):
+            state.extend((cell % self.cols, cell // self.cols, icon_idx))
+        digest = hashlib.blake2b(state.tobytes(), digest_size=8).digest()
+        return int.from_bytes(digest, "little")
+
+
+def greedy_actions(engine):
+    """整批计算的简单策略：在不会立即撞上的方向里选离食物曼哈顿距离最近的一个。"""
+    cols, rows = engine.cols, engine.rows
+    boards = np.arange(engine.count)
+    head = engine.body[boards, engine.head_slot]
+    x = (head % cols)[:, None] + DX[None, :]
+    y = (head // cols)[:, None] + DY[None, :]
+    inside = (x >= 0) & (x < cols) & (y >= 0) & (y < rows)
+    cell = np.where(inside, y * cols + x, 0)
+    state = engine.cells[boards[:, None], cell]
+    safe = inside & ((state == EMPTY) | (state == FOOD))
+    safe &= np.arange(len(DIRECTIONS))[None, :] != OPPOSITE[engine.direction][:, None]
+
+    food = np.maximum(engine.food, 0)
+    distance = np.abs(x - (food % cols)[:, None]) + np.abs(y - (food // cols)[:, None])
+    distance = np.where(safe, distance, np.iinfo(np.int64).max)
+    actions = np.argmin(distance, axis=1).astype(np.int8)
+    actions[~safe.any(axis=1)] = NO_ACTION
+    return actions
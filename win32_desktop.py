@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""真实桌面的 Win32 实现。
+
+依赖 pywin32，只在需要操作真实桌面时由 snake.py 导入，
+因此 --help 和无头模式不会加载 Win32 相关模块。
+"""
+import ctypes
+from ctypes import wintypes  # 导入ctypes中的Windows类型定义
+
+import commctrl
+import pywintypes
+import win32api
+import win32con
+import win32gui
+import win32process
+
+from backend import ListViewDesktop
+
+# 定义桌面窗口的类名
+PROGMAN = "Progman"
+SHELLDLL_DEFVIEW = "SHELLDLL_DefView"
+SYS_LIST_VIEW32 = "SysListView32"
+
+# --- Win32/ctypes 定义 ---
+kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+
+kernel32.VirtualAllocEx.restype = wintypes.LPVOID
+kernel32.VirtualAllocEx.argtypes = (
+    wintypes.HANDLE,
+    wintypes.LPVOID,
+    ctypes.c_size_t,
+    wintypes.DWORD,
+    wintypes.DWORD,
+)
+kernel32.VirtualFreeEx.argtypes = (
+    wintypes.HANDLE,
+    wintypes.LPVOID,
+    ctypes.c_size_t,
+    wintypes.DWORD,
+)
+kernel32.ReadProcessMemory.argtypes = (
+    wintypes.HANDLE,
+    wintypes.LPCVOID,
+    wintypes.LPVOID,
+    ctypes.c_size_t,
+    ctypes.POINTER(ctypes.c_size_t),
+)
+kernel32.WriteProcessMemory.argtypes = (
+    wintypes.HANDLE,
+    wintypes.LPVOID,
+    wintypes.LPCVOID,
+    ctypes.c_size_t,
+    ctypes.POINTER(ctypes.c_size_t),
+)
+kernel32.OpenProcess.restype = wintypes.HANDLE
+kernel32.OpenProcess.argtypes = (wintypes.DWORD, wintypes.BOOL, wintypes.DWORD)
+kernel32.CloseHandle.argtypes = (wintypes.HANDLE,)
+kernel32.GetConsoleWindow = ctypes.windll.kernel32.GetConsoleWindow
+kernel32.GetConsoleWindow.restype = wintypes.HWND
+kernel32.GetConsoleWindow.argtypes = []
+user32 = ctypes.WinDLL("user32", use_last_error=True)
+gdi32 = ctypes.WinDLL("gdi32", use_last_error=True)
+LOGPIXELSX = 88
+
+
+class POINT(ctypes.Structure):
+    _fields_ = [("x", wintypes.LONG), ("y", wintypes.LONG)]
+
+
+# --- 核心函数 ---
+def find_desktop_listview():
+    """桌面 SysListView32 的句柄，找不到时返回 0。"""
+    h_progman = win32gui.FindWindow(PROGMAN, None)
+    h_shelldll = win32gui.FindWindowEx(h_progman, 0, SHELLDLL_DEFVIEW, None)
+    return win32gui.FindWindowEx(h_shelldll, 0, SYS_LIST_VIEW32, None)
+
+
+def get_icon_count(h_listview):
+    if not h_listview:
+        return 0
+    return win32gui.SendMessage(h_listview, commctrl.LVM_GETITEMCOUNT, 0, 0)
+
+
+def get_icon_position(h_listview, index):
+    if not h_listview:
+        return None, None
+    tid, pid = win32process.GetWindowThreadProcessId(h_listview)
+    h_process = kernel32.OpenProcess(
+        win32con.PROCESS_VM_OPERATION
+        | win32con.PROCESS_VM_READ
+        | win32con.PROCESS_VM_WRITE,
+        False,
+        pid,
+    )
+    if not h_process:
+        return None, None
+    p_remote_buffer = None
+    try:
+        p_remote_buffer = kernel32.VirtualAllocEx(
+            h_process,
+            0,
+            ctypes.sizeof(POINT),
+            win32con.MEM_COMMIT | win32con.MEM_RESERVE,
+            win32con.PAGE_READWRITE,
+        )
+        if not p_remote_buffer:
+            return None, None
+        result = win32gui.SendMessage(
+            h_listview, commctrl.LVM_GETITEMPOSITION, index, p_remote_buffer
+        )
+        if result == 0:
+            return None, None
+        local_point = POINT()
+        bytes_read = ctypes.c_size_t(0)
+        kernel32.ReadProcessMemory(
+            h_process,
+            p_remote_buffer,
+            ctypes.byref(local_point),
+            ctypes.sizeof(local_point),
+            ctypes.byref(bytes_read),
+        )
+        return local_point.x, local_point.y
+    finally:
+        if p_remote_buffer:
+            kernel32.VirtualFreeEx(h_process, p_remote_buffer, 0, win32con.MEM_RELEASE)
+        if h_process:
+            kernel32.CloseHandle(h_process)
+
+
+class Win32ListView:
+    """桌面 SysListView32 的 Win32 实现，供 IconPositionReader 使用。"""
+
+    def __init__(self, h_listview):
+        self.h_listview = h_listview
+
+    def item_count(self):
+        return get_icon_count(self.h_listview)
+
+    def send_message(self, msg, wparam, lparam):
+        return win32gui.SendMessage(self.h_listview, msg, wparam, lparam)
+
+    def send_message_timeout(self, msg, wparam, lparam, timeout):
+        """最多等待 timeout 秒，Explorer 无响应时立即返回；超时返回 None。"""
+        try:
+            _, result = win32gui.SendMessageTimeout(
+                self.h_listview,
+                msg,
+                wparam,
+                lparam,
+                win32con.SMTO_ABORTIFHUNG,
+                max(1, int(timeout * 1000)),
+            )
+        except pywintypes.error:
+            return None
+        return result
+
+    def invalidate(self):
+        win32gui.InvalidateRect(self.h_listview, None, True)
+
+    def open_process(self):
+        tid, pid = win32process.GetWindowThreadProcessId(self.h_listview)
+        return kernel32.OpenProcess(
+            win32con.PROCESS_VM_OPERATION
+            | win32con.PROCESS_VM_READ
+            | win32con.PROCESS_VM_WRITE,
+            False,
+            pid,
+        )
+
+    def alloc(self, h_process, size):
+        return kernel32.VirtualAllocEx(
+            h_process,
+            0,
+            size,
+            win32con.MEM_COMMIT | win32con.MEM_RESERVE,
+            win32con.PAGE_READWRITE,
+        )
+
+    def read(self, h_process, address, size):
+        buffer = ctypes.create_string_buffer(size)
+        bytes_read = ctypes.c_size_t(0)
+        if not kernel32.ReadProcessMemory(
+            h_process, address, buffer, size, ctypes.byref(bytes_read)
+        ):
+            raise ctypes.WinError(ctypes.get_last_error())
+        return buffer.raw[: bytes_read.value]
+
+    def write(self, h_process, address, data):
+        bytes_written = ctypes.c_size_t(0)
+        if not kernel32.WriteProcessMemory(
+            h_process, address, data, len(data), ctypes.byref(bytes_written)
+        ):
+            raise ctypes.WinError(ctypes.get_last_error())
+
+    def free(self, h_process, address):
+        kernel32.VirtualFreeEx(h_process, address, 0, win32con.MEM_RELEASE)
+
+    def close(self, h_process):
+        kernel32.CloseHandle(h_process)
+
+
+class Win32Desktop(ListViewDesktop):
+    """真实桌面的 DesktopBackend 实现。"""
+
+    def __init__(self, h_listview, send_timeout=None):
+        super().__init__(Win32ListView(h_listview), None, send_timeout)
+        self.h_listview = h_listview
+
+    def screen_metrics(self):
+        return (
+            win32api.GetSystemMetrics(win32con.SM_CXSCREEN),
+            win32api.GetSystemMetrics(win32con.SM_CYSCREEN),
+        )
+
+    def dpi(self):
+        try:
+            # Windows 10 1607 起才有 GetDpiForWindow
+            return user32.GetDpiForWindow(self.h_listview) or 96
+        except AttributeError:
+            hdc = user32.GetDC(0)
+            try:
+                return gdi32.GetDeviceCaps(hdc, LOGPIXELSX)
+            finally:
+                user32.ReleaseDC(0, hdc)
+
+
+def set_icon_position(h_listview, index, x, y):
+    if not h_listview:
+        return
+    lparam = win32api.MAKELONG(int(x), int(y))
+    win32gui.SendMessage(h_listview, commctrl.LVM_SETITEMPOSITION, index, lparam)
+
+
+def minimize_console():
+    """最小化控制台窗口，返回它的句柄（没有控制台时为 None）。"""
+    console_hwnd = kernel32.GetConsoleWindow()
+    if console_hwnd:
+        win32gui.ShowWindow(console_hwnd, win32con.SW_MINIMIZE)
+    return console_hwnd
+
+
+def restore_console(console_hwnd):
+    if console_hwnd:
+        win32gui.ShowWindow(console_hwnd, win32con.SW_RESTORE)